@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -11,7 +13,69 @@ class Settings(BaseSettings):
         "video/x-msvideo": "video"
     }
     max_file_size: int = 100 * 1024 * 1024  # 100 MB
+    upload_chunk_size: int = 1024 * 1024  # read size for streamed uploads
+    upload_part_size: int = 5 * 1024 * 1024  # multipart part size (Vercel minimum)
+    upload_batch_max_files: int = 50  # files per POST /media/upload/batch
+    upload_batch_concurrency: int = 8  # parallel blob uploads per batch
+    resumable_max_file_size: int = 2 * 1024 * 1024 * 1024  # 2 GB, resumable uploads only
+    resumable_chunk_size: int = 4 * 1024 * 1024  # below serverless request body limits
+    resumable_session_ttl: float = 24 * 3600.0  # seconds before an unfinished session is discarded
+    blob_max_concurrency: int = 16  # worker threads reserved for blocking blob calls
+    blob_delete_batch_size: int = 100  # URLs per request when the backend deletes in batches
+    storage_backend: str = "vercel"  # "vercel", "local" or "memory"
+    storage_local_root: str = "uploads"  # directory used by the local backend
+    storage_memory_latency: float = 0.0  # seconds added to each memory backend call (benchmarks)
     aria_url: str = "http://aria.onrender.com"
+    auth_mode: str = "off"  # "off", "aria" (remote validation) or "jwt" (local signature check)
+    aria_validate_path: str = "/validate"
+    aria_timeout: float = 5.0
+    aria_pool_size: int = 16  # pooled keep-alive connections to ARIA, also the concurrent validations
+    auth_cache_max_bytes: int = 4 * 1024 * 1024
+    auth_cache_ttl: float = 300.0  # upper bound on caching a valid token, even when it expires later
+    auth_cache_negative_ttl: float = 10.0  # rejected tokens
+    jwt_algorithm: str = "HS256"  # HS256/384/512 with jwt_secret, RS256/384/512 with jwt_public_key (PEM)
+    jwt_secret: Optional[str] = None
+    jwt_public_key: Optional[str] = None
+    jwt_leeway: float = 30.0  # seconds of clock skew tolerated on exp/nbf
+    database_path: Optional[str] = None  # defaults to media.db (/tmp/media.db on Vercel)
+    db_pool_size: int = 8
+    db_pool_timeout: float = 10.0  # seconds to wait for a free connection
+    db_busy_timeout_ms: int = 10000
+    db_mmap_size: int = 256 * 1024 * 1024
+    db_cache_size_kb: int = 16 * 1024  # per connection
+    db_statement_cache_size: int = 256
+    db_executor_threads: int = 4  # threads running the SQLite work of requests, each with its own connection
+    db_group_commit: bool = True  # metadata writes committed in groups by one writer thread
+    db_group_commit_window: float = 0.002  # seconds the writer waits for more writes to join a group
+    db_group_commit_max_ops: int = 256  # writes per group
+    thumbnail_cache_max_bytes: int = 16 * 1024 * 1024  # approximate memory bound
+    thumbnail_cache_ttl: float = 300.0  # seconds; bounds staleness across workers
+    thumbnail_cache_negative_ttl: float = 30.0  # for products without a thumbnail
+    thumbnail_batch_max_ids: int = 200  # product ids per POST /thumbnail/batch
+    media_page_max_limit: int = 1000  # largest `limit` accepted by GET /media/, and rows read per batch without one
+    # Cache-Control of GET /media/ and GET /thumbnail; clients and CDNs revalidate with the ETag
+    read_cache_control: str = "public, max-age=0, s-maxage=5, stale-while-revalidate=30"
+    rendition_widths: List[int] = [128, 256, 512, 1024]  # empty list disables renditions
+    rendition_formats: List[str] = ["webp"]  # webp, avif, jpeg or png
+    rendition_quality: int = 80
+    rendition_workers: int = 2  # rendering processes; 0 renders in a thread instead
+    video_poster_enabled: bool = True  # extract a poster frame (needs ffmpeg on PATH)
+    video_poster_at: float = 1.0  # seconds into the video (clamped to its duration)
+    ffmpeg_path: str = "ffmpeg"
+    video_poster_timeout: float = 60.0  # seconds before ffmpeg is killed (no poster)
+    image_cache_dir: Optional[str] = None  # defaults to image-cache (/tmp/image-cache on Vercel)
+    image_cache_max_bytes: int = 512 * 1024 * 1024
+    image_max_dimension: int = 4096  # largest w/h accepted by GET /media/{id}/image
+    image_cache_max_age: int = 86400  # Cache-Control max-age of resized images
+    metrics_enabled: bool = True  # GET /metrics and the instrumentation feeding it
+    outbox_worker_enabled: bool = True  # drain the outbox from the API process
+    outbox_poll_interval: float = 5.0  # seconds between polls when idle
+    outbox_batch_size: int = 100  # jobs claimed per round
+    outbox_lease_seconds: float = 300.0  # a claimed job is retried after this if its worker died
+    outbox_backoff_base: float = 2.0  # seconds before the first retry, doubled after each failure
+    outbox_backoff_max: float = 3600.0
+    orphan_gc_grace_period: float = 24 * 3600.0  # seconds; younger unreferenced blobs may be mid-upload
+    orphan_gc_page_size: int = 1000  # blobs listed per storage request
 
     class Config:
         env_file = ".env"
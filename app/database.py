@@ -1,37 +1,484 @@
+import asyncio
+import queue
 import sqlite3
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
 from contextlib import contextmanager
+from typing import Any, Callable, List, Tuple
+
+from . import instrumentation
+from .config import settings
+from .migrations import migrate
+
+def database_path() -> str:
+    if settings.database_path:
+        return settings.database_path
+    return "/tmp/media.db" if os.environ.get('VERCEL') else "media.db"
+
+# Histogram child per SQL text (statements are mostly constants, so this stays small)
+_statement_series = {}
+
+def _statement_kind(sql: str) -> str:
+    words = sql.split(None, 2)[:2]
+    kind = words[0].lower() if words else "other"
+    if kind == "begin" and len(words) > 1 and words[1].upper() == "IMMEDIATE":
+        return "begin_immediate"
+    if kind not in ("select", "insert", "update", "delete", "begin", "pragma", "with", "create", "alter", "drop"):
+        return "other"
+    return kind
+
+def _statement_series_for(sql: str):
+    series = _statement_series.get(sql)
+    if series is None:
+        kind = _statement_kind(sql)
+        series = (instrumentation.DB_SECONDS.labels(kind), kind == "begin_immediate")
+        if len(_statement_series) < 4096:
+            _statement_series[sql] = series
+    return series
+
+def _count_busy(e: sqlite3.OperationalError):
+    if "locked" in str(e):
+        instrumentation.DB_BUSY_ERRORS.inc()
+
+_execute = sqlite3.Connection.execute
+_executemany = sqlite3.Connection.executemany
+_commit = sqlite3.Connection.commit
+_COMMIT_SECONDS = instrumentation.DB_SECONDS.labels("commit")
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection timing execute()/executemany()/commit() into the DB metrics (settings.metrics_enabled)."""
+
+    # Every statement goes through here: one dict lookup and one observe(), nothing else
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return _execute(self, sql, parameters)
+        except sqlite3.OperationalError as e:
+            _count_busy(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            series, lock_wait = _statement_series_for(sql)
+            series.observe(elapsed)
+            if lock_wait:
+                instrumentation.DB_LOCK_WAIT_SECONDS.observe(elapsed)
+
+    def executemany(self, sql, parameters):
+        start = time.perf_counter()
+        try:
+            return _executemany(self, sql, parameters)
+        except sqlite3.OperationalError as e:
+            _count_busy(e)
+            raise
+        finally:
+            _statement_series_for(sql)[0].observe(time.perf_counter() - start)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            _commit(self)
+        except sqlite3.OperationalError as e:
+            _count_busy(e)
+            raise
+        finally:
+            _COMMIT_SECONDS.observe(time.perf_counter() - start)
 
 def get_db_connection():
-    db_path = "/tmp/media.db" if os.environ.get('VERCEL') else "media.db"
-    conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+    """Open a new connection with the service's PRAGMAs applied (done once per connection)."""
+    conn = sqlite3.connect(
+        database_path(),
+        timeout=settings.db_busy_timeout_ms / 1000,
+        check_same_thread=False,
+        cached_statements=settings.db_statement_cache_size,
+        factory=InstrumentedConnection if settings.metrics_enabled else sqlite3.Connection,
+    )
     conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={int(settings.db_mmap_size)}")
+    conn.execute(f"PRAGMA cache_size=-{int(settings.db_cache_size_kb)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA busy_timeout={int(settings.db_busy_timeout_ms)}")
     conn.row_factory = sqlite3.Row
+    _ensure_schema(conn)
     return conn
 
+# Database files already migrated by this process
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+def _ensure_schema(conn: sqlite3.Connection):
+    """
+    Migrate the database the first time this process connects to it, instead
+    of at import: a cold start pays for it on its first query, with a
+    connection the pool keeps, and later connections skip the check.
+    """
+    path = database_path()
+    if path in _migrated:
+        return
+    with _migrate_lock:
+        if path not in _migrated:
+            migrate(conn)
+            _migrated.add(path)
+
+class PoolTimeout(sqlite3.OperationalError):
+    pass
+
+class ConnectionPool:
+    """
+    Bounded pool of configured SQLite connections.
+
+    A thread gets back the connection it used last when that one is idle, which
+    keeps SQLite's page cache and statement cache warm for that thread.
+    """
+
+    def __init__(self, size: int, timeout: float):
+        self.size = size
+        self.timeout = timeout
+        self._idle = deque()
+        self._created = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        # metrics
+        self.acquisitions = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _take_idle(self):
+        preferred = getattr(self._local, "conn", None)
+        if preferred is not None and preferred in self._idle:
+            self._idle.remove(preferred)
+            return preferred
+        return self._idle.pop() if self._idle else None
+
+    def acquire(self) -> sqlite3.Connection:
+        start = time.perf_counter()
+        waited = False
+        with self._cond:
+            while True:
+                conn = self._take_idle()
+                if conn is not None:
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                remaining = self.timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+
+            elapsed = time.perf_counter() - start
+            self.acquisitions += 1
+            if waited:
+                self.waits += 1
+            self.total_wait += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+
+        if conn is None:
+            try:
+                conn = get_db_connection()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+        self._local.conn = conn
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Unusable connection: drop it and let the pool open a fresh one
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            conn.close()
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "idle": len(self._idle),
+                "in_use": self._created - len(self._idle),
+                "acquisitions": self.acquisitions,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": (self.total_wait / self.acquisitions * 1000) if self.acquisitions else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+    def close(self):
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._created -= 1
+
+pool = ConnectionPool(settings.db_pool_size, settings.db_pool_timeout)
+
 @contextmanager
 def get_db():
-    conn = get_db_connection()
+    if executor.on_db_thread():
+        # A DB thread has a connection of its own and never waits for the pool
+        with executor.connected() as conn:
+            yield conn
+        return
+    conn = pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.release(conn)
+
+class GroupCommitWriter:
+    """
+    Single writer thread that commits metadata writes in groups.
+
+    A write is a function of a connection, run inside a transaction it must
+    not commit or roll back. Submitted writes queue up while the writer is
+    busy; it then runs up to max_ops of them, waiting at most `window`
+    seconds for more, in one BEGIN IMMEDIATE ... COMMIT. So a burst pays for
+    one commit and one write lock acquisition per group rather than per
+    write, and request threads never wait on each other for the lock.
+
+    Each write runs under its own SAVEPOINT: one that raises is rolled back
+    alone and its caller gets the exception, the others still commit. If the
+    commit itself fails, every write of the group gets that error.
+    """
+
+    def __init__(self, window: float, max_ops: int):
+        self.window = window
+        self.max_ops = max_ops
+        self._queue: "queue.Queue[Tuple[Callable[[sqlite3.Connection], Any], Future]]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # metrics
+        self.groups = 0
+        self.writes = 0
+        self.failed = 0
+        self.max_group = 0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                # Started on first use: a serverless cold start does not pay for it
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, write: Callable[[sqlite3.Connection], Any]) -> Future:
+        if self._thread is None:
+            self._start()
+        future = Future()
+        self._queue.put((write, future))
+        return future
+
+    def _next_group(self) -> List[Tuple[Callable, Future]]:
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(group) < self.max_ops:
+            remaining = deadline - time.monotonic()
+            try:
+                group.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        conn, path = None, None
+        while True:
+            # A write whose caller was cancelled (client gone) is dropped, not run
+            group = [(write, future) for write, future in self._next_group() if future.set_running_or_notify_cancel()]
+            if not group:
+                continue
+            try:
+                if conn is None or path != database_path():
+                    if conn is not None:
+                        conn.close()
+                    conn, path = get_db_connection(), database_path()
+                outcomes = self._commit(conn, group)
+            except Exception as e:
+                # BEGIN or COMMIT failed: nothing of the group was written
+                try:
+                    if conn is not None and conn.in_transaction:
+                        conn.rollback()
+                except sqlite3.Error:
+                    conn.close()
+                    conn = None
+                outcomes = [(False, e)] * len(group)
+            self.groups += 1
+            self.writes += len(group)
+            self.max_group = max(self.max_group, len(group))
+            for (_, future), (ok, value) in zip(group, outcomes):
+                if not ok:
+                    self.failed += 1
+                try:
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+                except InvalidStateError:
+                    # Cannot happen once running, but must never stop the writer
+                    pass
+
+    @staticmethod
+    def _commit(conn: sqlite3.Connection, group) -> List[Tuple[bool, Any]]:
+        outcomes = []
+        conn.execute("BEGIN IMMEDIATE")
+        for write, _ in group:
+            conn.execute("SAVEPOINT write")
+            try:
+                outcomes.append((True, write(conn)))
+            except Exception as e:
+                conn.execute("ROLLBACK TO write")
+                outcomes.append((False, e))
+            conn.execute("RELEASE write")
+        conn.commit()
+        return outcomes
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "groups": self.groups,
+            "writes": self.writes,
+            "failed": self.failed,
+            "avg_group": self.writes / self.groups if self.groups else 0.0,
+            "max_group": self.max_group,
+        }
+
+writer = GroupCommitWriter(settings.db_group_commit_window, settings.db_group_commit_max_ops)
+
+class DBExecutor:
+    """
+    Small pool of threads running the SQLite work of async code, so a slow
+    query or a lock wait blocks one of these threads instead of the event
+    loop and every request on it.
+
+    Each thread opens a connection of its own on first use and keeps it
+    (get_db() on a DB thread yields it too): work run there never waits for
+    the pool, and the thread's page and statement caches stay warm. A call
+    must leave no transaction open; one that raises is rolled back.
+    """
+
+    def __init__(self, threads: int):
+        self.threads = threads
+        self._executor = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # metrics
+        self.calls = 0
+        self.pending = 0
+        self.max_pending = 0
+
+    def _start(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Started on first use: a serverless cold start does not pay for it
+                self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix="db", initializer=self._init_thread)
+        return self._executor
+
+    def _init_thread(self):
+        self._local.conn = None
+
+    def on_db_thread(self) -> bool:
+        return hasattr(self._local, "conn")
+
+    def _done(self, future: Future):
+        with self._lock:
+            self.pending -= 1
+
+    def submit(self, func: Callable, *args) -> Future:
+        """Run func(*args) on a DB thread."""
+        executor = self._executor or self._start()
+        with self._lock:
+            self.calls += 1
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+        future = executor.submit(func, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def connection(self) -> sqlite3.Connection:
+        """The calling DB thread's own connection, reopened if database_path() changed."""
+        local = self._local
+        path = database_path()
+        if local.conn is None or local.path != path:
+            if local.conn is not None:
+                local.conn.close()
+            local.conn, local.path = get_db_connection(), path
+        return local.conn
+
+    @contextmanager
+    def connected(self):
+        conn = self.connection()
+        try:
+            yield conn
+        finally:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                # Unusable connection: the next call opens a fresh one
+                self._local.conn = None
+                conn.close()
+
+    def _with_connection(self, func: Callable, *args):
+        with self.connected() as conn:
+            return func(conn, *args)
+
+    def call(self, func: Callable, *args) -> Future:
+        """Run func(conn, *args) on a DB thread, with that thread's connection."""
+        return self.submit(self._with_connection, func, *args)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "threads": self.threads,
+                "calls": self.calls,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+            }
+
+executor = DBExecutor(settings.db_executor_threads)
+
+async def run(func: Callable[..., Any], *args) -> Any:
+    """Await func(conn, *args), run on a DB thread with its own connection."""
+    return await asyncio.wrap_future(executor.call(func, *args))
+
+async def run_sync(func: Callable[..., Any], *args) -> Any:
+    """Await func(*args) run on a DB thread, for work on a connection of the caller's."""
+    return await asyncio.wrap_future(executor.submit(func, *args))
+
+def _transaction(conn: sqlite3.Connection, func: Callable[[sqlite3.Connection], Any]) -> Any:
+    conn.execute("BEGIN IMMEDIATE")
+    result = func(conn)
+    conn.commit()
+    return result
+
+async def write(func: Callable[[sqlite3.Connection], Any]) -> Any:
+    """
+    Run func(conn) in a write transaction and return its result (or raise
+    its exception). With db_group_commit, the writer thread commits it along
+    with the other pending writes; otherwise it runs on a DB thread, in a
+    transaction of its own.
+    """
+    if settings.db_group_commit:
+        return await asyncio.wrap_future(writer.submit(func))
+    return await run(_transaction, func)
 
 def init_db():
+    """Migrate now rather than on first use (worker, scripts); the app does not need it."""
     if os.environ.get('VERCEL'):
         os.makedirs("/tmp", exist_ok=True)
     with get_db() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS medias (
-                id TEXT PRIMARY KEY,
-                product_id TEXT NOT NULL,
-                file_name TEXT NOT NULL,
-                file_url TEXT NOT NULL,
-                file_type TEXT CHECK(file_type IN ('image', 'video')),
-                is_thumbnail INTEGER DEFAULT 0 CHECK(
-                    (file_type = 'image' AND is_thumbnail IN (0, 1)) OR
-                    (file_type = 'video' AND is_thumbnail = 0)
-                ),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
\ No newline at end of file
+        migrate(conn)
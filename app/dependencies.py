@@ -1,7 +1,29 @@
-from .database import get_db as _get_db
-from fastapi import Depends
-from contextlib import contextmanager
+from typing import Optional
 
-def get_db():
-    with _get_db() as conn:
-        yield conn
\ No newline at end of file
+from .config import settings
+from .models import ValidationResult
+from .services import auth
+from fastapi import Depends, Header, HTTPException
+
+async def require_auth(authorization: Optional[str] = Header(None)) -> Optional[ValidationResult]:
+    """
+    The validated bearer token of the request (see services/auth.py), or None
+    when auth_mode is "off". Raises 401 without a valid token.
+    """
+    if settings.auth_mode == "off":
+        return None
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise HTTPException(401, detail="Token manquant", headers={"WWW-Authenticate": "Bearer"})
+    result = await auth.validate(token.strip())
+    if not result.valid:
+        raise HTTPException(401, detail="Token invalide ou expiré", headers={"WWW-Authenticate": "Bearer"})
+    return result
+
+def require_role(role: str):
+    """Dependency requiring a valid token that carries `role` (no check when auth is off)."""
+    async def check(claims: Optional[ValidationResult] = Depends(require_auth)) -> Optional[ValidationResult]:
+        if claims is not None and role not in claims.roles:
+            raise HTTPException(403, detail="Permissions insuffisantes")
+        return claims
+    return check
@@ -0,0 +1,75 @@
+"""
+Service metrics, exported by GET /metrics (see app/utils/metrics.py).
+
+- http_request_duration_seconds: per method, route template and status,
+  until the last byte of the response (streamed bodies included)
+- stage_duration_seconds: steps inside uploads, updates and deletions
+- blob_request_duration_seconds / blob_errors_total: storage backend calls
+- db_statement_duration_seconds: execute() and commit() per statement kind;
+  db_lock_wait_seconds: BEGIN IMMEDIATE (waiting for the write lock);
+  db_busy_errors_total: statements that gave up on a locked database
+"""
+import time
+from contextlib import nullcontext
+
+from .config import settings
+from .utils import metrics
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+)
+STAGE_SECONDS = metrics.histogram(
+    "stage_duration_seconds", "Latency of a step of an operation", ("operation", "stage")
+)
+BLOB_SECONDS = metrics.histogram(
+    "blob_request_duration_seconds", "Storage backend call latency", ("op",)
+)
+BLOB_ERRORS = metrics.counter("blob_errors_total", "Failed storage backend calls", ("op",))
+DB_SECONDS = metrics.histogram(
+    "db_statement_duration_seconds", "SQLite execute()/commit() latency", ("kind",),
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+DB_LOCK_WAIT_SECONDS = metrics.histogram(
+    "db_lock_wait_seconds", "Time to take the SQLite write lock (BEGIN IMMEDIATE)",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+DB_BUSY_ERRORS = metrics.counter("db_busy_errors_total", "Statements that failed with 'database is locked'")
+
+def stage(operation: str, name: str):
+    """Context manager timing one step of an operation (a no-op when metrics are disabled)."""
+    if not settings.metrics_enabled:
+        return nullcontext()
+    return STAGE_SECONDS.labels(operation, name).time()
+
+def observe_receive(operation: str, scope: dict):
+    """Record the time from the start of the request to the handler: reading and parsing the body."""
+    start = scope.get("metrics.start")
+    if start is not None:
+        STAGE_SECONDS.labels(operation, "receive").observe(time.perf_counter() - start)
+
+class MetricsMiddleware:
+    """ASGI middleware (not BaseHTTPMiddleware, which costs a task per request) timing every request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = scope["metrics.start"] = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The route template (set once routed) keeps the label set bounded
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                scope["method"], route.path if route is not None else "unmatched", str(status)
+            ).observe(time.perf_counter() - start)
@@ -1,23 +1,39 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import media  # , thumbnail (if you separate)
-from .database import init_db
+from . import models
+from .config import settings
+from .routers import admin, files, media, metrics, thumbnail, uploads
+from .instrumentation import MetricsMiddleware
+from .services import outbox
 
-init_db()  # ensure table exists
-
-app = FastAPI(title="Scena Media Service")
+# The schema is migrated on the first database connection (app/database.py),
+# not here: importing the app stays cheap on a serverless cold start.
+app = FastAPI(title="Scena Media Service", lifespan=outbox.worker_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
     allow_credentials=True,
 )
 
 app.include_router(media.router)
-# app.include_router(thumbnail.router) if split
+app.include_router(uploads.router)
+app.include_router(thumbnail.router)
+app.include_router(files.router)
+app.include_router(admin.router)
+
+# POST /upload predates the /media prefix (contrat.yaml); same handler as POST /media/upload
+app.add_api_route(
+    "/upload", media.upload_file, methods=["POST"], response_model=models.UploadResponse, tags=["media"]
+)
+
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
-    return {"message": "scena service"}
\ No newline at end of file
+    return {"message": "scena service"}
@@ -0,0 +1,228 @@
+"""
+Versioned schema migrations.
+
+The schema version is stored in SQLite's `PRAGMA user_version`. Each entry of
+MIGRATIONS brings the database from version N-1 to N; pending migrations run
+in order, each in its own transaction together with the version bump.
+Append new migrations, never edit one that has shipped.
+"""
+import sqlite3
+from typing import List, Tuple
+
+# Unix epoch seconds, the unit of REAL time columns
+_NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+def _bump_versions(products: str) -> str:
+    """Trigger statement incrementing the version of each product id selected by `products`."""
+    return f"""
+        INSERT INTO product_versions (product_id, version, updated_at)
+        SELECT product_id, 1, {_NOW} FROM ({products}) WHERE true
+        ON CONFLICT(product_id) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;
+    """
+
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "create medias", [
+        """
+        CREATE TABLE IF NOT EXISTS medias (
+            id TEXT PRIMARY KEY,
+            product_id TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            file_url TEXT NOT NULL,
+            file_type TEXT CHECK(file_type IN ('image', 'video')),
+            is_thumbnail INTEGER DEFAULT 0 CHECK(
+                (file_type = 'image' AND is_thumbnail IN (0, 1)) OR
+                (file_type = 'video' AND is_thumbnail = 0)
+            ),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (2, "index medias by product, one thumbnail per product", [
+        # Databases created before the unique index may hold several
+        # thumbnails per product: keep the most recently inserted one.
+        """
+        UPDATE medias SET is_thumbnail = 0
+        WHERE is_thumbnail = 1 AND rowid NOT IN (
+            SELECT MAX(rowid) FROM medias WHERE is_thumbnail = 1 GROUP BY product_id
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_medias_product_created ON medias(product_id, created_at)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_medias_product_thumbnail ON medias(product_id) WHERE is_thumbnail = 1",
+    ]),
+    (3, "keyset order (created_at, id) for media listings", [
+        "DROP INDEX IF EXISTS idx_medias_product_created",
+        "CREATE INDEX IF NOT EXISTS idx_medias_product_listing ON medias(product_id, created_at, id)",
+    ]),
+    (4, "content hash for deduplication, blob reference lookups", [
+        "ALTER TABLE medias ADD COLUMN content_hash TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_medias_content_hash ON medias(content_hash) WHERE content_hash IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS idx_medias_file_url ON medias(file_url)",
+    ]),
+    (5, "queue of blobs left to delete", [
+        """
+        CREATE TABLE IF NOT EXISTS blob_deletions (
+            url TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (6, "transactional outbox for blob side effects", [
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            available_at REAL NOT NULL
+        )
+        """,
+        # One pending job per side effect: enqueueing it twice is a no-op
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_job ON outbox(kind, payload)",
+        "CREATE INDEX IF NOT EXISTS idx_outbox_available ON outbox(available_at)",
+        # Times are Unix epoch seconds
+        """
+        INSERT OR IGNORE INTO outbox (kind, payload, attempts, last_error, created_at, available_at)
+        SELECT 'delete_blob', json_object('url', url), attempts, last_error,
+               (julianday(created_at) - 2440587.5) * 86400.0,
+               (julianday('now') - 2440587.5) * 86400.0
+        FROM blob_deletions
+        """,
+        "DROP TABLE blob_deletions",
+    ]),
+    (7, "image renditions", [
+        # Keyed by the source blob so deduplicated medias share renditions
+        """
+        CREATE TABLE IF NOT EXISTS media_renditions (
+            source_url TEXT NOT NULL,
+            format TEXT NOT NULL,
+            width INTEGER NOT NULL,
+            height INTEGER NOT NULL,
+            file_url TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (source_url, format, width)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (8, "video metadata", [
+        "ALTER TABLE medias ADD COLUMN duration REAL",
+        "ALTER TABLE medias ADD COLUMN width INTEGER",
+        "ALTER TABLE medias ADD COLUMN height INTEGER",
+        "ALTER TABLE medias ADD COLUMN video_codec TEXT",
+        "ALTER TABLE medias ADD COLUMN audio_codec TEXT",
+        "ALTER TABLE medias ADD COLUMN bitrate INTEGER",
+    ]),
+    (9, "resumable uploads", [
+        # Times are Unix epoch seconds, as in outbox
+        """
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            id TEXT PRIMARY KEY,
+            product_id TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            file_type TEXT NOT NULL,
+            is_thumbnail BOOLEAN NOT NULL DEFAULT 0,
+            size INTEGER NOT NULL,
+            chunk_size INTEGER NOT NULL,
+            sha256 TEXT,
+            media_id TEXT,
+            file_url TEXT,
+            completing_until REAL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS upload_chunks (
+            session_id TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            file_url TEXT NOT NULL,
+            PRIMARY KEY (session_id, idx)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (10, "product versions", [
+        # Bumped by triggers on every change to a product's medias or to the
+        # renditions they show, so reads can answer conditional requests
+        # (ETag / 304) with a primary key lookup
+        """
+        CREATE TABLE IF NOT EXISTS product_versions (
+            product_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+        f"INSERT OR IGNORE INTO product_versions SELECT DISTINCT product_id, 1, {_NOW} FROM medias",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS medias_version_insert AFTER INSERT ON medias BEGIN
+            {_bump_versions("SELECT NEW.product_id AS product_id")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS medias_version_update AFTER UPDATE ON medias BEGIN
+            {_bump_versions("SELECT NEW.product_id AS product_id UNION SELECT OLD.product_id")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS medias_version_delete AFTER DELETE ON medias BEGIN
+            {_bump_versions("SELECT OLD.product_id AS product_id")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS renditions_version_insert AFTER INSERT ON media_renditions BEGIN
+            {_bump_versions("SELECT DISTINCT product_id FROM medias WHERE file_url = NEW.source_url")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS renditions_version_delete AFTER DELETE ON media_renditions BEGIN
+            {_bump_versions("SELECT DISTINCT product_id FROM medias WHERE file_url = OLD.source_url")}
+        END
+        """,
+    ]),
+    (11, "blob reference lookups", [
+        # Orphan collection checks listed blobs against every column holding a blob URL
+        "CREATE INDEX IF NOT EXISTS idx_renditions_file_url ON media_renditions(file_url)",
+        "CREATE INDEX IF NOT EXISTS idx_upload_chunks_file_url ON upload_chunks(file_url)",
+    ]),
+    (12, "sniffed content type", [
+        # Format detected from the file's first bytes; width/height also hold image dimensions
+        "ALTER TABLE medias ADD COLUMN mime_type TEXT",
+        # Declared type, then what the first chunk turned out to be
+        "ALTER TABLE upload_sessions ADD COLUMN content_type TEXT",
+        "ALTER TABLE upload_sessions ADD COLUMN mime_type TEXT",
+        "ALTER TABLE upload_sessions ADD COLUMN width INTEGER",
+        "ALTER TABLE upload_sessions ADD COLUMN height INTEGER",
+    ]),
+]
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn: sqlite3.Connection, target: int = None) -> int:
+    """Apply pending migrations up to target (default: latest) and return the resulting version."""
+    target = MIGRATIONS[-1][0] if target is None else target
+    current = schema_version(conn)
+    if current >= target:
+        return current  # up to date: no write lock taken
+    for version, _name, statements in MIGRATIONS:
+        if version > target:
+            break
+        # IMMEDIATE takes the write lock first, so concurrent workers starting
+        # together apply each migration exactly once.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return schema_version(conn)
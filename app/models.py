@@ -1,5 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Dict, List, Optional
+
+class Rendition(BaseModel):
+    width: int
+    height: int
+    format: str
+    url: str
 
 class MediaItem(BaseModel):
     id: str
@@ -9,6 +16,16 @@ class MediaItem(BaseModel):
     file_type: str
     is_thumbnail: bool
     created_at: datetime
+    renditions: List[Rendition] = []
+    # Sniffed from the first bytes of the upload, as are the width/height of images
+    mime_type: Optional[str] = None
+    # Filled in after upload for videos
+    duration: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    bitrate: Optional[int] = None
 
 class UploadResponse(BaseModel):
     id: str
@@ -17,9 +34,60 @@ class UploadResponse(BaseModel):
     file_type: str
     is_thumbnail: bool
 
-# Optional for validation endpoint
+class BatchUploadItem(BaseModel):
+    filename: str
+    # created | invalid | failed | rolled_back | not_uploaded
+    status: str
+    id: Optional[str] = None
+    file_url: Optional[str] = None
+    file_type: Optional[str] = None
+    is_thumbnail: bool = False
+    deduplicated: bool = False
+    error: Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    product_id: str
+    results: List[BatchUploadItem]
+
+class UploadSessionCreate(BaseModel):
+    product_id: str
+    filename: str
+    content_type: str
+    size: int = Field(..., gt=0)
+    is_thumbnail: bool = False
+    sha256: Optional[str] = None  # of the whole file, checked on completion
+
+class UploadSession(BaseModel):
+    id: str
+    product_id: str
+    filename: str
+    file_type: str
+    is_thumbnail: bool
+    size: int
+    chunk_size: int
+    chunk_count: int
+    received_bytes: int
+    missing_chunks: List[int]
+    media_id: Optional[str] = None  # set once completed
+    expires_at: datetime
+
+class UploadChunk(BaseModel):
+    index: int
+    offset: int
+    size: int
+    sha256: str
+
+class ThumbnailBatchRequest(BaseModel):
+    product_ids: List[str] = Field(..., min_length=1)
+
+class ThumbnailBatchResponse(BaseModel):
+    thumbnails: Dict[str, MediaItem]
+    missing: List[str]
+
+# Answer of the ARIA validation endpoint, or of the local JWT check
 class ValidationResult(BaseModel):
     valid: bool
-    userId: str
-    email: str
-    expiresAt: str
\ No newline at end of file
+    userId: Optional[str] = None
+    email: Optional[str] = None
+    roles: List[str] = []
+    expiresAt: Optional[datetime] = None
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends
+
+from ..database import executor, pool, run_sync, writer
+from ..dependencies import require_role
+from ..services import auth, image_service, media_service, outbox
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_role("admin"))])
+
+@router.get("/db-pool")
+async def db_pool_stats():
+    """
+    Statistiques du pool de connexions SQLite (taille, connexions en cours,
+    nombre d'attentes et temps d'attente moyen/maximum) et de l'écrivain
+    unique (écritures en attente, transactions groupées et leur taille) et
+    des threads exécutant les requêtes SQL (appels en attente ou en cours).
+    """
+    return {**pool.stats(), "writer": writer.stats(), "executor": executor.stats()}
+
+@router.get("/cache")
+async def cache_stats():
+    """
+    Compteurs des caches: miniatures (mémoire), images redimensionnées (disque),
+    tokens validés, et transformations d'images / validations en cours / partagées.
+    """
+    return {
+        "thumbnail": media_service.thumbnail_cache.stats(),
+        "image": image_service.get_image_cache().stats(),
+        "auth": auth.cache.stats(),
+        "image_transforms": image_service.flights.stats(),
+        "auth_validations": auth.flights.stats(),
+    }
+
+@router.get("/outbox")
+async def outbox_stats():
+    """
+    File des effets de bord (suppressions de blobs): profondeur, jobs dus,
+    en reprise, retard (âge du plus ancien job) et dernière erreur.
+    """
+    return await run_sync(outbox.stats)
+
+@router.post("/outbox/retry")
+async def retry_outbox():
+    """Rend immédiatement exécutables les jobs en échec (sans attendre le backoff)."""
+    return {"rescheduled": await outbox.retry_now()}
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+import os
+
+from ..services.storage import get_storage
+
+router = APIRouter(prefix="/files", tags=["files"])
+
+@router.get("/{key:path}")
+async def get_file(key: str):
+    """
+    Sert un fichier du stockage local (storage_backend = "local").
+    Les requêtes HTTP Range sont prises en charge (lecture partielle des vidéos).
+    """
+    storage = get_storage()
+    if not hasattr(storage, "path_for"):
+        raise HTTPException(404, detail="Fichier non trouvé")
+    try:
+        path = storage.path_for(key)
+    except FileNotFoundError:
+        raise HTTPException(404, detail="Fichier non trouvé")
+    if not os.path.isfile(path):
+        raise HTTPException(404, detail="Fichier non trouvé")
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
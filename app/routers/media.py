@@ -1,26 +1,30 @@
 import sqlite3
-from typing import List
-import uuid
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, HTTPException
-from .. import models, services
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Header, Query, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from .. import models
 from ..config import settings
-from ..dependencies import get_db
-from ..services import blob_storage, media_service
+from ..database import run
+from ..instrumentation import observe_receive, stage
+from ..dependencies import require_auth, require_role
+from ..services import blob_storage, image_service, media_service, outbox
+from ..services.renditions import InvalidImage
+from ..utils import http_cache
 import os
 
-from vercel_blob import put
-from vercel_blob import list, delete, put
-
 router = APIRouter(prefix="/media", tags=["media"])
 allowed_types = settings.allowed_types
 
 @router.post("/upload", response_model=models.UploadResponse)
 async def upload_file(
+    request: Request,
     product_id: str = Form(...),
     file: UploadFile = File(...),
-    is_thumbnail: bool = Query(False)
+    is_thumbnail: bool = Query(False),
+    claims: Optional[models.ValidationResult] = Depends(require_auth),
 ):
+    observe_receive("upload", request.scope)
     # Validate file type
     if file.content_type not in allowed_types:
         raise HTTPException(400, detail=f"Unsupported type. Allowed: {list(allowed_types.keys())}")
@@ -30,21 +34,12 @@ async def upload_file(
     if file_type == 'video' and is_thumbnail:
         raise HTTPException(400, detail="Videos cannot be thumbnails")
 
-    # Read content
-    content = await file.read()
-    if len(content) > settings.max_file_size:
-        raise HTTPException(413, detail="File too large (>100MB)")
-
-    # Upload to blob
-    file_ext = os.path.splitext(file.filename)[1]
-    blob_url = await blob_storage.upload_blob(content, file.filename, file_ext)
-
-    # Save to DB
-    media_id = await media_service.create_media(
+    # Identical content is stored once; otherwise stream to blob in bounded chunks
+    media_id, blob_url = await media_service.store_media(
+        file,
         product_id=product_id,
         file_type=file_type,
         is_thumbnail=is_thumbnail,
-        blob_url=blob_url,
         filename=file.filename
     )
 
@@ -56,11 +51,56 @@ async def upload_file(
         is_thumbnail=is_thumbnail and file_type == 'image'
     )
 
+@router.post("/upload/batch", response_model=models.BatchUploadResponse)
+async def upload_files(
+    product_id: str = Form(...),
+    files: List[UploadFile] = File(...),
+    thumbnail_index: Optional[int] = Query(None, ge=0, description="Index du fichier à utiliser comme miniature"),
+    claims: Optional[models.ValidationResult] = Depends(require_auth),
+):
+    """
+    Téléverse plusieurs fichiers d'un produit en une requête, tout ou rien:
+    chaque fichier est validé avant tout envoi, les fichiers sont envoyés en
+    parallèle (upload_batch_concurrency) puis toutes les métadonnées sont
+    insérées dans une seule transaction. En cas d'échec, les fichiers déjà
+    envoyés sont supprimés et le détail de l'erreur contient le résultat de
+    chaque fichier.
+    """
+    if len(files) > settings.upload_batch_max_files:
+        raise HTTPException(400, detail=f"Too many files (max {settings.upload_batch_max_files})")
+
+    results = []
+    for i, file in enumerate(files):
+        error = None
+        if file.content_type not in allowed_types:
+            error = f"Unsupported type. Allowed: {list(allowed_types.keys())}"
+        elif i == thumbnail_index and allowed_types[file.content_type] == 'video':
+            error = "Videos cannot be thumbnails"
+        results.append({
+            "filename": file.filename,
+            "status": "invalid" if error else "not_uploaded",
+            "file_type": allowed_types.get(file.content_type),
+            "error": error,
+        })
+    if thumbnail_index is not None and thumbnail_index >= len(files):
+        raise HTTPException(400, detail="thumbnail_index out of range")
+    if any(result["error"] for result in results):
+        raise HTTPException(400, detail={"message": "Invalid files, nothing uploaded", "product_id": product_id, "results": results})
+
+    results = await media_service.store_media_batch(
+        files,
+        [result["file_type"] for result in results],
+        product_id=product_id,
+        thumbnail_index=thumbnail_index
+    )
+    return models.BatchUploadResponse(product_id=product_id, results=results)
+
 @router.put("/update", response_model=models.UploadResponse)
 async def update_media(
+    request: Request,
     media_id: str = Query(..., alias="id_media", description="ID du media"),
     file: UploadFile = File(..., description="Nouveau fichier média"),
-    # authorization: str = Header(...)  # Décommentez quand JWT sera actif
+    claims: Optional[models.ValidationResult] = Depends(require_auth),
 ):
     """
     Met à jour un média existant en remplaçant son fichier tout en conservant:
@@ -69,223 +109,259 @@ async def update_media(
 
     Processus:
     1. Récupère le product_id du média existant
-    2. Supprime l'ancien fichier physique
-    3. Téléverse le nouveau fichier
-    4. Met à jour les métadonnées en base de données
+    2. Téléverse le nouveau fichier (ou réutilise un blob au contenu identique)
+    3. Met à jour les métadonnées en base de données
+    4. Met en file la suppression de l'ancien fichier physique (exécutée en
+       arrière-plan s'il n'est plus référencé)
 
     Attention: Le type du nouveau fichier doit être le même que l'original!
     """
+    observe_receive("update", request.scope)
     if file.content_type not in allowed_types:
         raise HTTPException(400, detail=f"Type non supporté. Types autorisés: {', '.join(allowed_types.keys())}")
 
-    conn = None
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT product_id, file_url, file_type, is_thumbnail FROM medias WHERE id = ?",
-            (media_id,)
-        )
-        existing = cursor.fetchone()
-
-        if not existing:
-            raise HTTPException(404, detail="Média non trouvé")
-
-        new_file_type = allowed_types[file.content_type]
-        if new_file_type != existing["file_type"]:
-            raise HTTPException(400,
-                detail=f"Le type du fichier doit rester '{existing['file_type']}'. Type reçu: '{new_file_type}'")
-
-        # Generate new filename
-        file_ext = os.path.splitext(file.filename)[1]
-        new_filename = f"{uuid.uuid4().hex}{file_ext}"
-
-        # Upload new file to Blob
-        content = await file.read()
-        if len(content) > 100 * 1024 * 1024:
-            raise HTTPException(413, detail="Fichier trop volumineux (>100MB)")
-
-        put_result = put(
-            path=new_filename,
-            data=content,
-            options={
-                "access": 'public'
-            }
-        )
-        new_blob_url = put_result['url']
+        existing = await media_service.get_media(media_id)
+    except sqlite3.Error as e:
+        raise HTTPException(500, detail=f"Erreur BDD: {str(e)}")
 
-        # Delete old blob
-        try:
-            delete(existing["file_url"])
-        except Exception as e:
-            print(f"Warning: Failed to delete old blob {existing['file_url']}: {str(e)}")
-
-        # Update database
-        cursor.execute(
-            "UPDATE medias SET file_name = ?, file_url = ?, created_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (new_filename, new_blob_url, media_id)
-        )
-        conn.commit()
+    if not existing:
+        raise HTTPException(404, detail="Média non trouvé")
 
-        return {
-            "id": media_id,
-            "file_url": new_blob_url,
-            "product_id": existing["product_id"],
-            "file_type": new_file_type,
-            "is_thumbnail": bool(existing["is_thumbnail"])
-        }
+    new_file_type = allowed_types[file.content_type]
+    if new_file_type != existing["file_type"]:
+        raise HTTPException(400,
+            detail=f"Le type du fichier doit rester '{existing['file_type']}'. Type reçu: '{new_file_type}'")
 
+    # Reuse the blob of identical content, else stream the new file to Blob
+    # (content of another type is rejected while hashing, before any transfer)
+    try:
+        with stage("update", "hash"):
+            content_hash, info = await blob_storage.inspect_upload(file, file.content_type)
+        with stage("update", "dedup_lookup"):
+            new_blob_url = await media_service.update_media_file(media_id, content_hash, info=info)
+        if new_blob_url is None:
+            file_ext = os.path.splitext(file.filename)[1]
+            with stage("update", "blob_put"):
+                uploaded_url = await blob_storage.upload_file(file, file_ext)
+            try:
+                with stage("update", "db_update"):
+                    new_blob_url = await media_service.update_media_file(media_id, content_hash, uploaded_url, info)
+            except sqlite3.Error:
+                await blob_storage.delete_blob(uploaded_url)
+                raise
     except sqlite3.Error as e:
-        if conn:
-            conn.rollback()
         raise HTTPException(500, detail=f"Erreur BDD: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
+
+    # The old blob (or, for a media deleted meanwhile, the new one) was queued for deletion
+    outbox.notify()
+    if new_blob_url is None:
+        raise HTTPException(404, detail="Média non trouvé")
+    media_service.thumbnail_cache.invalidate(existing["product_id"])
+
+    return {
+        "id": media_id,
+        "file_url": new_blob_url,
+        "product_id": existing["product_id"],
+        "file_type": new_file_type,
+        "is_thumbnail": bool(existing["is_thumbnail"])
+    }
 
 
 @router.delete("/all")
 async def delete_all_media_for_product(
     id_product: str = Query(..., alias="id_product", description="ID du produit"),
-    # authorization: str = Header(...)  # Uncomment when JWT is ready
+    claims: Optional[models.ValidationResult] = Depends(require_role("admin")),
 ):
     """
     Supprime TOUS les médias associés à un produit spécifique.
 
+    Réservé au rôle `admin` quand l'authentification est active.
+
     Process:
     1. Récupère tous les médias liés au product_id
-    2. Supprime chaque fichier du stockage Blob
-    3. Supprime toutes les entrées en base de données
+    2. Supprime toutes les entrées en base de données
+    3. Met en file la suppression des fichiers Blob: le worker de l'outbox
+       supprime en arrière-plan ceux qui ne sont plus référencés, avec
+       reprises en cas d'échec (`/admin/outbox`)
 
     Attention : Opération irréversible !
     """
-    # 1. Vérification du token (à décommentez)
-    # claims = verify_token(authorization)
-    # if "admin" not in claims.get("roles", []):
-    #    raise HTTPException(403, "Permissions insuffisantes")
-
-    conn = None
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-
-        # Récupérer tous les médias du produit
-        cursor.execute(
-            "SELECT id, file_url FROM medias WHERE product_id = ?",
-            (id_product,)
-        )
-        medias = cursor.fetchall()
-
-        if not medias:
-            raise HTTPException(404, f"Aucun média trouvé pour le produit {id_product}")
-
-        deleted_files = 0
-        errors = []
-
-        # Collect all blob URLs to delete
-        blob_urls = [media["file_url"] for media in medias]
-
-        # Supprimer les fichiers du stockage Blob
-        if blob_urls:
-            try:
-                # Delete all blobs in a single batch
-                for url in blob_urls:
-                    delete(url)
-            except Exception as e:
-                # Handle partial failures
-                errors.append(f"Erreur suppression Blob: {str(e)}")
-
-        # Supprimer les entrées en base
-        cursor.execute("DELETE FROM medias WHERE product_id = ?", (id_product,))
-        conn.commit()
-
-        return {
-            "status": "completed",
-            "product_id": id_product,
-            "deleted_blobs": deleted_files,
-            "deleted_db_entries": len(medias),
-            "errors": errors
-        }
-
+        # Lecture, suppression et mise en file des blobs dans la même transaction
+        with stage("delete_all", "db_delete"):
+            deleted, blob_urls = await media_service.delete_product_media(id_product)
     except sqlite3.Error as e:
-        if conn:
-            conn.rollback()
         raise HTTPException(500, f"Erreur BDD: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
+
+    if not deleted:
+        raise HTTPException(404, f"Aucun média trouvé pour le produit {id_product}")
+
+    return {
+        "status": "completed",
+        "product_id": id_product,
+        "deleted_db_entries": deleted,
+        "queued_blob_deletions": len(blob_urls),
+    }
 
 
 @router.delete("/")
-async def delete_media(id: str = Query(..., alias="id_media", description="ID du media")):
+async def delete_media(
+    id: str = Query(..., alias="id_media", description="ID du media"),
+    claims: Optional[models.ValidationResult] = Depends(require_auth),
+):
     """
     Supprime un média et son entrée en base de données
     """
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-
-        # Récupérer les informations du média
-        cursor.execute(
-            "SELECT file_url FROM medias WHERE id = ?",
-            (id,)
-        )
-        media = cursor.fetchone()
+        # The blob is deleted in the background once no other media references it
+        with stage("delete", "db_delete"):
+            product_id = await media_service.delete_media(id)
+    except sqlite3.Error as e:
+        raise HTTPException(500, detail=f"Erreur BDD: {str(e)}")
 
-        if not media:
-            raise HTTPException(404, detail="Média non trouvé")
+    if product_id is None:
+        raise HTTPException(404, detail="Média non trouvé")
 
-        blob_url = media["file_url"]
+    return {"status": "deleted", "media_id": id}
 
-        # Delete from blob storage
-        try:
-            delete(blob_url)
-        except Exception as e:
-            print(f"Warning: Failed to delete blob {blob_url}: {str(e)}")
+def _select_rows(conn: sqlite3.Connection, where: str, params: list, selected, limit: int) -> List[sqlite3.Row]:
+    """The first `limit` rows of the listing, with the keyset position of each."""
+    return conn.execute(
+        f"SELECT {media_service.select_fields(selected)}, created_at AS key_created_at, id AS key_id "
+        f"FROM medias WHERE {where} ORDER BY created_at, id LIMIT ?",
+        params + [limit]
+    ).fetchall()
 
+def _open_listing(conn: sqlite3.Connection, id_product: str, where: str, params: list, limit: Optional[int], selected, if_none_match, if_modified_since):
+    """
+    On a DB thread: the version headers and, unless the client already has
+    the current version (then rows is None), the next page cursor and the
+    first batch of rows (the page when limit is given).
+    """
+    # The read transaction gives the queries one snapshot; it ends with the call
+    conn.execute("BEGIN")
+    version = media_service.get_product_version(conn, id_product)
+    headers = {}
+    if version is not None:
+        headers = http_cache.version_headers(*version, settings.read_cache_control)
+        if http_cache.not_modified(headers, if_none_match, if_modified_since):
+            return headers, None
+    if limit:
+        last = conn.execute(
+            f"SELECT created_at, id FROM medias WHERE {where} ORDER BY created_at, id LIMIT 2 OFFSET ?",
+            params + [limit - 1]
+        ).fetchall()
+        if len(last) == 2:
+            headers["X-Next-Cursor"] = media_service.encode_cursor(last[0]["created_at"], last[0]["id"])
+    return headers, _select_rows(conn, where, params, selected, limit or settings.media_page_max_limit)
+
+async def _stream_media(rows: List[sqlite3.Row], where: str, params: list, fields, batch_size: Optional[int]):
+    """
+    Stream the JSON array a batch at a time. Without a page limit, each next
+    batch (batch_size rows after the last one sent) is read on a DB thread:
+    no connection or transaction is held while a slow client receives one.
+    """
+    yield "["
+    separator = ""
+    while rows:
+        yield separator + ",".join(media_service.media_to_json(row, fields) for row in rows)
+        separator = ","
+        if batch_size is None or len(rows) < batch_size:
+            break
+        last = rows[-1]
+        rows = await run(
+            _select_rows, f"{where} AND (created_at, id) > (?, ?)",
+            params + [last["key_created_at"], last["key_id"]], fields, batch_size
+        )
+    yield "]"
 
-        # Supprimer l'entrée en base de données
-        cursor.execute("DELETE FROM medias WHERE id = ?", (id,))
-        conn.commit()
-
-        return {"status": "deleted", "media_id": id}
+@router.get("/", response_model=List[models.MediaItem])
+async def get_media_by_product(
+    id_product: str = Query(..., alias="id_product", description="ID du produit"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.media_page_max_limit, description="Taille de page (par défaut: tous les médias)"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (en-tête X-Next-Cursor)"),
+    file_type: Optional[Literal["image", "video"]] = Query(None, description="Filtre sur le type de média"),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules (ex: id,file_url)"),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+):
+    """
+    Récupère les médias associés à un produit, triés par date de création
+    - Pagination par curseur (keyset sur created_at, id) : `limit` puis `cursor`
+      avec la valeur de l'en-tête `X-Next-Cursor` (absent sur la dernière page)
+    - `file_type` filtre images ou vidéos, `fields` limite les champs retournés
+    - La réponse est produite au fil de la lecture, sans charger toute la liste
+    - ETag/Last-Modified issus de la version du produit : 304 sans lire les
+      médias si le client a déjà la version courante
+    """
+    selected = media_service.MEDIA_FIELDS
+    if fields:
+        selected = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = set(selected) - set(media_service.MEDIA_FIELDS)
+        if unknown or not selected:
+            raise HTTPException(400, detail=f"Champs inconnus: {', '.join(sorted(unknown))}. Champs disponibles: {', '.join(media_service.MEDIA_FIELDS)}")
+
+    where = "product_id = ?"
+    params = [id_product]
+    if file_type:
+        where += " AND file_type = ?"
+        params.append(file_type)
+    if cursor:
+        try:
+            params.extend(media_service.decode_cursor(cursor))
+        except ValueError:
+            raise HTTPException(400, detail="Curseur invalide")
+        where += " AND (created_at, id) > (?, ?)"
 
+    try:
+        headers, rows = await run(
+            _open_listing, id_product, where, params, limit, selected, if_none_match, if_modified_since
+        )
     except sqlite3.Error as e:
         raise HTTPException(500, detail=f"Erreur BDD: {str(e)}")
-    finally:
-        conn.close()
+    if rows is None:
+        return Response(status_code=304, headers=headers)
+    if not rows and not cursor:
+        raise HTTPException(404, detail="Aucun média trouvé pour ce produit")
+
+    return StreamingResponse(
+        _stream_media(rows, where, params, selected, None if limit else settings.media_page_max_limit),
+        media_type="application/json",
+        headers=headers,
+    )
 
-@router.get("/", response_model=List[models.MediaItem])
-async def get_media_by_product( id_product: str = Query(..., alias="id_product", description="ID du produit")):
+@router.get("/{media_id}/image")
+async def get_media_image(
+    media_id: str,
+    w: Optional[int] = Query(None, ge=1, le=settings.image_max_dimension, description="Largeur maximale"),
+    h: Optional[int] = Query(None, ge=1, le=settings.image_max_dimension, description="Hauteur maximale"),
+    fmt: Literal["webp", "avif", "jpeg", "png"] = Query("webp", description="Format de sortie"),
+    if_none_match: Optional[str] = Header(None),
+):
     """
-    Récupère tous les médias associés à un produit
+    Image redimensionnée à la demande
+    - Tient dans `w` x `h` en conservant les proportions, sans agrandissement
+    - Résultat mis en cache sur disque (LRU); requêtes identiques simultanées
+      servies par une seule transformation
+    - ETag fort (304 si inchangé) et Cache-Control long pour les CDN
     """
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, product_id, file_name,file_url, file_type, is_thumbnail, created_at FROM medias WHERE product_id = ?",
-            (id_product,)
-        )
-        medias = cursor.fetchall()
-
-        if not medias:
-            raise HTTPException(404, detail="Aucun média trouvé pour ce produit")
-
-        return [
-            {
-                "id": media["id"],
-                "product_id": media["product_id"],
-                "file_name": media["file_name"],
-                "file_url": media["file_url"],
-                "file_type": media["file_type"],
-                "is_thumbnail": bool(media["is_thumbnail"]),
-                "created_at": media["created_at"]
-            }
-            for media in medias
-        ]
-
+        media = await media_service.get_media(media_id)
     except sqlite3.Error as e:
         raise HTTPException(500, detail=f"Erreur BDD: {str(e)}")
-    finally:
-        conn.close()
+    if not media:
+        raise HTTPException(404, detail="Média non trouvé")
+    if media["file_type"] != "image":
+        raise HTTPException(400, detail="Seules les images peuvent être redimensionnées")
+
+    etag = f'"{image_service.cache_key(media["file_url"], w, h, fmt)}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.image_cache_max_age}"}
+    if http_cache.not_modified(headers, if_none_match, None):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        data = await image_service.resized_image(media["file_url"], w, h, fmt)
+    except InvalidImage:
+        raise HTTPException(422, detail="Le fichier n'est pas une image lisible")
+    return Response(content=data, media_type=f"image/{fmt}", headers=headers)
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Response
+
+from ..database import executor, pool, run_sync, writer
+from ..services import auth, image_service, media_service, outbox
+from ..utils import metrics
+
+router = APIRouter(tags=["metrics"])
+
+def _samples(stats: dict, keys) -> list:
+    return [({}, stats[key]) for key in keys]
+
+@metrics.REGISTRY.collector
+def _pool_metrics():
+    stats = pool.stats()
+    yield "db_pool_connections", "gauge", "SQLite pool connections by state", [
+        ({"state": "idle"}, stats["idle"]), ({"state": "in_use"}, stats["in_use"]),
+    ]
+    yield "db_pool_acquisitions_total", "counter", "Connections taken from the pool", _samples(stats, ["acquisitions"])
+    yield "db_pool_waits_total", "counter", "Acquisitions that waited for a free connection", _samples(stats, ["waits"])
+    yield "db_pool_timeouts_total", "counter", "Acquisitions that timed out", _samples(stats, ["timeouts"])
+    stats = writer.stats()
+    yield "db_writer_queued", "gauge", "Writes waiting for the group-commit writer", _samples(stats, ["queued"])
+    yield "db_writer_groups_total", "counter", "Transactions committed by the writer", _samples(stats, ["groups"])
+    yield "db_writer_writes_total", "counter", "Writes run by the writer", _samples(stats, ["writes"])
+    yield "db_writer_failed_total", "counter", "Writes that raised or whose group failed to commit", _samples(stats, ["failed"])
+    stats = executor.stats()
+    yield "db_executor_pending", "gauge", "Calls queued or running on the DB threads", _samples(stats, ["pending"])
+    yield "db_executor_calls_total", "counter", "Calls run on the DB threads", _samples(stats, ["calls"])
+
+@metrics.REGISTRY.collector
+def _cache_metrics():
+    caches = {
+        "thumbnail": media_service.thumbnail_cache.stats(),
+        "image": image_service.get_image_cache().stats(),
+        "auth": auth.cache.stats(),
+    }
+    for name, kind, documentation, key in (
+        ("cache_hits_total", "counter", "Cache hits", "hits"),
+        ("cache_misses_total", "counter", "Cache misses", "misses"),
+        ("cache_evictions_total", "counter", "Entries evicted to stay within max_bytes", "evictions"),
+        ("cache_entries", "gauge", "Cached entries", "entries"),
+        ("cache_bytes", "gauge", "Estimated cache size", "bytes"),
+    ):
+        yield name, kind, documentation, [({"cache": cache}, stats[key]) for cache, stats in caches.items()]
+    flights = image_service.flights.stats()
+    yield "image_transforms_in_flight", "gauge", "On-demand image transforms running", _samples(flights, ["in_flight"])
+    yield "image_transforms_shared_total", "counter", "Requests served by a transform already running", _samples(flights, ["shared"])
+
+@metrics.REGISTRY.collector
+def _outbox_metrics():
+    stats = outbox.stats()
+    yield "outbox_jobs", "gauge", "Queued background jobs by kind", [
+        ({"kind": kind}, count) for kind, count in stats["by_kind"].items()
+    ]
+    yield "outbox_jobs_retrying", "gauge", "Jobs that failed at least once", _samples(stats, ["retrying"])
+    yield "outbox_lag_seconds", "gauge", "Age of the oldest queued job", _samples(stats, ["lag_seconds"])
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Métriques au format texte Prometheus (propres à ce processus)."""
+    # Collectors query the database (outbox depth)
+    return Response(await run_sync(metrics.REGISTRY.render), media_type=metrics.CONTENT_TYPE)
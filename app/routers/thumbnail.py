@@ -0,0 +1,79 @@
+import sqlite3
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, HTTPException, Response
+from .. import models
+from ..config import settings
+from ..dependencies import require_auth
+from ..services import media_service
+from ..utils import http_cache
+
+router = APIRouter(tags=["thumbnail"])
+
+@router.get("/thumbnail", response_model=models.MediaItem)
+async def get_product_thumbnail(
+    response: Response,
+    id_product: str = Query(..., alias="id_product", description="ID du produit"),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+):
+    """
+    Récupère la miniature (thumbnail) associée à un produit
+    - Retourne l'image marquée comme miniature (is_thumbnail=1)
+    - Retourne une erreur 404 si aucune miniature n'existe pour ce produit
+    - Résultat (y compris l'absence de miniature) mis en cache par produit
+    - ETag/Last-Modified issus de la version du produit (304 si inchangé)
+    """
+    try:
+        thumbnail = await media_service.get_thumbnail(id_product)
+    except sqlite3.Error as e:
+        raise HTTPException(500, detail=f"Erreur BDD: {str(e)}")
+
+    if not thumbnail:
+        raise HTTPException(404, detail="Aucun média image comme thumbnail trouvé pour ce produit")
+
+    headers = http_cache.version_headers(
+        thumbnail["product_version"], thumbnail["product_updated_at"], settings.read_cache_control
+    )
+    if http_cache.not_modified(headers, if_none_match, if_modified_since):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return thumbnail
+
+@router.post("/thumbnail/batch", response_model=models.ThumbnailBatchResponse)
+async def get_product_thumbnails(body: models.ThumbnailBatchRequest):
+    """
+    Récupère les miniatures de plusieurs produits en une seule requête
+    - Une seule requête SQL indexée pour les produits absents du cache
+    - `thumbnails` : miniature par product_id
+    - `missing` : produits sans miniature
+    """
+    if len(body.product_ids) > settings.thumbnail_batch_max_ids:
+        raise HTTPException(400, detail=f"Trop de produits (max {settings.thumbnail_batch_max_ids})")
+    try:
+        thumbnails = await media_service.get_thumbnails(body.product_ids)
+    except sqlite3.Error as e:
+        raise HTTPException(500, detail=f"Erreur BDD: {str(e)}")
+
+    return {
+        "thumbnails": {product_id: t for product_id, t in thumbnails.items() if t},
+        "missing": [product_id for product_id, t in thumbnails.items() if not t],
+    }
+
+@router.put("/thumbnail", response_model=models.MediaItem)
+async def update_product_thumbnail(
+    id_media: str = Query(..., alias="id_media", description="ID du média à définir comme miniature"),
+    claims: Optional[models.ValidationResult] = Depends(require_auth),
+):
+    """
+    Met à jour la miniature d'un produit:
+    1. Vérifie que le média existe et est une image
+    2. Si le média est déjà une miniature, renvoie une erreur
+    3. Sinon, met à jour:
+       - Désactive l'ancienne miniature (is_thumbnail=0)
+       - Définit le nouveau média comme miniature (is_thumbnail=1)
+    """
+    try:
+        return await media_service.set_thumbnail(id_media)
+    except sqlite3.Error as e:
+        raise HTTPException(500, detail=f"Erreur BDD: {str(e)}")
@@ -0,0 +1,74 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request
+
+from .. import models
+from ..config import settings
+from ..dependencies import require_auth
+from ..services import upload_sessions
+
+router = APIRouter(prefix="/media/uploads", tags=["uploads"], dependencies=[Depends(require_auth)])
+allowed_types = settings.allowed_types
+
+@router.post("", response_model=models.UploadSession, status_code=201)
+async def create_upload(body: models.UploadSessionCreate):
+    """
+    Ouvre une session d'upload reprenable (fichiers volumineux). Le client
+    envoie ensuite chaque chunk de `chunk_size` octets avec
+    PUT /media/uploads/{id}/chunks/{index}, puis finalise avec
+    POST /media/uploads/{id}/complete.
+    """
+    if body.content_type not in allowed_types:
+        raise HTTPException(400, detail=f"Unsupported type. Allowed: {list(allowed_types.keys())}")
+    file_type = allowed_types[body.content_type]
+    if file_type == 'video' and body.is_thumbnail:
+        raise HTTPException(400, detail="Videos cannot be thumbnails")
+    if body.size > settings.resumable_max_file_size:
+        raise HTTPException(413, detail=f"Fichier trop volumineux (>{settings.resumable_max_file_size // (1024 * 1024)}MB)")
+
+    return await upload_sessions.create_session(
+        product_id=body.product_id,
+        filename=body.filename,
+        content_type=body.content_type,
+        file_type=file_type,
+        is_thumbnail=body.is_thumbnail,
+        size=body.size,
+        sha256=body.sha256
+    )
+
+@router.get("/{session_id}", response_model=models.UploadSession)
+async def get_upload(session_id: str):
+    """Progression: octets reçus et chunks manquants (pour reprendre après une coupure)."""
+    return await upload_sessions.get_session(session_id)
+
+@router.put("/{session_id}/chunks/{index}", response_model=models.UploadChunk)
+async def put_chunk(
+    request: Request,
+    session_id: str,
+    index: int = Path(..., ge=0),
+    offset: int = Query(..., ge=0, description="Position du chunk dans le fichier (index * chunk_size)"),
+    checksum: str = Header(..., alias="X-Chunk-SHA256", description="SHA-256 (hex) du chunk"),
+):
+    """Le corps de la requête contient les octets bruts du chunk."""
+    return await upload_sessions.put_chunk(session_id, index, offset, checksum, request.stream())
+
+@router.post("/{session_id}/complete", response_model=models.UploadResponse)
+async def complete_upload(
+    session_id: str,
+    sha256: Optional[str] = Query(None, description="SHA-256 (hex) du fichier complet, vérifié si fourni"),
+):
+    """Assemble les chunks et crée le média. Peut être rappelé sans risque."""
+    media_id, file_url, session = await upload_sessions.complete(session_id, sha256)
+    return models.UploadResponse(
+        id=media_id,
+        file_url=file_url,
+        product_id=session["product_id"],
+        file_type=session["file_type"],
+        is_thumbnail=session["is_thumbnail"] and session["file_type"] == 'image'
+    )
+
+@router.delete("/{session_id}")
+async def cancel_upload(session_id: str):
+    """Abandonne la session; les chunks déjà envoyés sont supprimés en arrière-plan."""
+    await upload_sessions.cancel(session_id)
+    return {"status": "cancelled", "id": session_id}
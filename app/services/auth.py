@@ -0,0 +1,171 @@
+"""
+Bearer token validation for the auth dependencies (app/dependencies.py).
+
+auth_mode selects how a token is checked:
+- "aria": the ARIA service validates it (GET aria_url + aria_validate_path).
+  Requests go through one keep-alive session pooling aria_pool_size
+  connections; requests is blocking, so calls run in worker threads under
+  their own limiter, as storage calls do.
+- "jwt": the signature and exp/nbf claims are checked locally (HS* with
+  jwt_secret, RS* with jwt_public_key), with no network round trip.
+
+Results are cached per token until its expiresAt (at most auth_cache_ttl;
+rejected tokens for auth_cache_negative_ttl), and concurrent validations of
+the same token share one call. A request with a cached token only pays a
+hash and a dict lookup.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Optional
+
+import anyio
+from fastapi import HTTPException
+
+from ..config import settings
+from ..models import ValidationResult
+from ..utils.cache import LRUCache
+from ..utils.singleflight import SingleFlight
+
+# sha256(token) -> ValidationResult; the tokens themselves are not kept
+cache = LRUCache(
+    max_bytes=settings.auth_cache_max_bytes,
+    ttl=settings.auth_cache_ttl,
+    negative_ttl=settings.auth_cache_negative_ttl,
+)
+flights = SingleFlight()
+
+_HMAC = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+_RSA = ("RS256", "RS384", "RS512")
+
+_limiter = None
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(settings.aria_pool_size)
+    return _limiter
+
+@lru_cache
+def _session():
+    # requests is slow to import: loaded on the first validation, not at cold start
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.aria_pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def _aria_validate(token: str) -> ValidationResult:
+    response = _session().get(
+        settings.aria_url.rstrip("/") + settings.aria_validate_path,
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=settings.aria_timeout,
+    )
+    if response.status_code in (401, 403):
+        return ValidationResult(valid=False)
+    response.raise_for_status()
+    return ValidationResult(**response.json())
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+@lru_cache
+def _public_key():
+    from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+    return load_pem_public_key(settings.jwt_public_key.encode())
+
+def _signature_ok(algorithm: str, signed: bytes, signature: bytes) -> bool:
+    if algorithm in _HMAC:
+        expected = hmac.new(settings.jwt_secret.encode(), signed, _HMAC[algorithm]).digest()
+        return hmac.compare_digest(expected, signature)
+    if algorithm in _RSA:
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        try:
+            _public_key().verify(signature, signed, padding.PKCS1v15(), getattr(hashes, f"SHA{algorithm[2:]}")())
+        except InvalidSignature:
+            return False
+        return True
+    raise ValueError(f"Unsupported jwt_algorithm: {algorithm}")
+
+def verify_jwt(token: str) -> ValidationResult:
+    """
+    Check a JWT locally: signed with jwt_algorithm (no other algorithm, so
+    neither "none" nor an HS/RS swap is accepted) and within exp/nbf.
+    Claims sub (or userId), email and roles fill the result.
+    """
+    invalid = ValidationResult(valid=False)
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64decode(header_b64))
+        claims = json.loads(_b64decode(payload_b64))
+        signature = _b64decode(signature_b64)
+    except ValueError:
+        return invalid
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        return invalid
+    if header.get("alg") != settings.jwt_algorithm:
+        return invalid
+    if not _signature_ok(settings.jwt_algorithm, f"{header_b64}.{payload_b64}".encode(), signature):
+        return invalid
+
+    now = time.time()
+    exp, nbf = claims.get("exp"), claims.get("nbf")
+    if exp is not None and now > exp + settings.jwt_leeway:
+        return invalid
+    if nbf is not None and now + settings.jwt_leeway < nbf:
+        return invalid
+    return ValidationResult(
+        valid=True,
+        userId=claims.get("sub") or claims.get("userId"),
+        email=claims.get("email"),
+        roles=claims.get("roles") or [],
+        expiresAt=datetime.fromtimestamp(exp, timezone.utc) if exp is not None else None,
+    )
+
+def _remaining(result: ValidationResult) -> Optional[float]:
+    """Seconds until the token expires, None if it does not say."""
+    if result.expiresAt is None:
+        return None
+    expires_at = result.expiresAt
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return (expires_at - datetime.now(timezone.utc)).total_seconds()
+
+async def _validate_uncached(key: bytes, token: str) -> ValidationResult:
+    if settings.auth_mode == "jwt":
+        result = verify_jwt(token)
+    else:
+        try:
+            result = await anyio.to_thread.run_sync(_aria_validate, token, limiter=_get_limiter())
+        except Exception as e:
+            # Not cached: the next request tries again
+            raise HTTPException(503, detail=f"Service d'authentification indisponible: {str(e)}")
+
+    remaining = _remaining(result) if result.valid else None
+    if remaining is not None and remaining <= 0:
+        result = result.model_copy(update={"valid": False})
+    if result.valid:
+        ttl = settings.auth_cache_ttl if remaining is None else min(settings.auth_cache_ttl, remaining)
+    else:
+        ttl = settings.auth_cache_negative_ttl
+    cache.set(key, result, ttl)
+    return result
+
+async def validate(token: str) -> ValidationResult:
+    """ValidationResult of a bearer token, from the cache when possible."""
+    key = hashlib.sha256(token.encode()).digest()
+    found, result = cache.get(key)
+    if found:
+        return result
+    return await flights.do(key, lambda: _validate_uncached(key, token))
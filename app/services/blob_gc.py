@@ -0,0 +1,122 @@
+"""
+Collection of orphan blobs: stored objects that no row references.
+
+Uploads put the blob before inserting its row. A request that dies in
+between, or a failed cleanup, leaves an object nothing points to, and it is
+paid for until deleted. collect_orphans() pages through the storage listing
+and checks each page against every column holding a blob URL, with indexed
+IN lookups, so memory stays bounded by the page size however many objects
+the store holds. The listing and the database are never loaded whole.
+
+A blob is referenced when it is:
+- the file of a media (medias.file_url)
+- a rendition of a blob that a media still uses (media_renditions)
+- a staged chunk or the assembled file of a resumable upload
+
+Only blobs older than the grace period are deleted: a younger one may be
+mid-upload, with its row not yet inserted. The store must only hold this
+service's blobs, since anything else in it counts as an orphan.
+
+    python -m app.worker --gc-orphans [--dry-run]
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+
+from ..config import settings
+from ..database import run as _run, write as _write
+from . import blob_storage
+from .storage import BlobInfo, get_storage
+
+# Bound parameters per IN (...) lookup, below SQLite's variable limit
+_LOOKUP_BATCH = 500
+
+def referenced_urls(conn, urls: List[str]) -> Set[str]:
+    """The subset of urls that some row still references."""
+    referenced = set()
+    for i in range(0, len(urls), _LOOKUP_BATCH):
+        batch = urls[i:i + _LOOKUP_BATCH]
+        placeholders = ", ".join("?" * len(batch))
+        rows = conn.execute(
+            f"""SELECT file_url FROM medias WHERE file_url IN ({placeholders})
+            UNION SELECT r.file_url FROM media_renditions r
+                WHERE r.file_url IN ({placeholders})
+                AND EXISTS (SELECT 1 FROM medias m WHERE m.file_url = r.source_url)
+            UNION SELECT file_url FROM upload_chunks WHERE file_url IN ({placeholders})
+            UNION SELECT file_url FROM upload_sessions WHERE file_url IN ({placeholders})""",
+            batch * 4,
+        )
+        referenced.update(row[0] for row in rows)
+    return referenced
+
+async def _find_orphans(blobs: List[BlobInfo], cutoff: datetime, report: dict) -> List[BlobInfo]:
+    report["scanned"] += len(blobs)
+    report["scanned_bytes"] += sum(blob.size for blob in blobs)
+    old = [blob for blob in blobs if blob.uploaded_at < cutoff]
+    report["too_recent"] += len(blobs) - len(old)
+    if not old:
+        return []
+    referenced = await _run(referenced_urls, [blob.url for blob in old])
+    orphans = [blob for blob in old if blob.url not in referenced]
+    report["orphans"] += len(orphans)
+    report["orphan_bytes"] += sum(blob.size for blob in orphans)
+    return orphans
+
+async def _delete(orphans: List[BlobInfo], concurrency: Optional[int], report: dict):
+    failures = await blob_storage.delete_blobs([blob.url for blob in orphans], concurrency=concurrency)
+    deleted = [blob for blob in orphans if blob.url not in failures]
+    report["deleted"] += len(deleted)
+    report["reclaimed_bytes"] += sum(blob.size for blob in deleted)
+    report["failed"] += len(failures)
+    if failures and len(report["errors"]) < 10:
+        report["errors"].extend(list(failures.items())[:10 - len(report["errors"])])
+    if deleted:
+        # Renditions of a deleted source: nothing shows them any more, and
+        # without the rows their blobs are orphans for the next run
+        def delete(conn):
+            conn.executemany("DELETE FROM media_renditions WHERE source_url = ?", [(blob.url,) for blob in deleted])
+
+        await _write(delete)
+
+async def collect_orphans(
+    dry_run: bool = False,
+    grace_period: Optional[float] = None,
+    concurrency: Optional[int] = None,
+    page_size: Optional[int] = None,
+) -> dict:
+    """
+    Delete the blobs no row references, uploaded more than grace_period
+    seconds ago, with at most `concurrency` storage requests in flight
+    (default blob_max_concurrency). Returns a report with bytes reclaimed;
+    with dry_run nothing is deleted and the report only counts the orphans
+    (number and bytes), so memory stays bounded by the page size.
+    """
+    grace_period = settings.orphan_gc_grace_period if grace_period is None else grace_period
+    page_size = page_size or settings.orphan_gc_page_size
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_period)
+    storage = get_storage()
+    report = {
+        "dry_run": dry_run, "grace_period": grace_period,
+        "scanned": 0, "scanned_bytes": 0, "too_recent": 0, "orphans": 0, "orphan_bytes": 0,
+        "deleted": 0, "reclaimed_bytes": 0, "failed": 0, "errors": [],
+    }
+    started = time.perf_counter()
+    deleting = None  # deletion of the previous page, overlapped with listing the next one
+    cursor = None
+    try:
+        while True:
+            blobs, cursor = await storage.list(cursor, page_size)
+            orphans = await _find_orphans(blobs, cutoff, report)
+            if deleting is not None:
+                await deleting
+                deleting = None
+            if orphans and not dry_run:
+                deleting = asyncio.ensure_future(_delete(orphans, concurrency, report))
+            if cursor is None:
+                break
+    finally:
+        if deleting is not None:
+            await deleting
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
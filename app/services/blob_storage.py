@@ -1,19 +1,147 @@
-from vercel_blob import put, delete, list
-from fastapi import HTTPException
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, UploadFile
+import hashlib
 import uuid
-import os
 
-async def upload_blob(content: bytes, filename: str, file_ext: str) -> str:
-    new_filename = f"{uuid.uuid4().hex}{file_ext}"
+from ..config import settings
+from ..utils import validators
+from ..utils.validators import FileInfo
+from .storage import get_storage
+
+async def iter_upload(
+    file: UploadFile,
+    max_size: int = settings.max_file_size,
+    chunk_size: int = settings.upload_chunk_size,
+) -> AsyncIterator[bytes]:
+    """Yield the upload in bounded chunks, aborting with 413 once max_size is crossed."""
+    too_large = HTTPException(413, detail=f"Fichier trop volumineux (>{max_size // (1024 * 1024)}MB)")
+    # Starlette already knows the size of the spooled file: reject without reading it
+    if file.size is not None and file.size > max_size:
+        raise too_large
+
+    total = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_size:
+            raise too_large
+        yield chunk
+
+def content_mismatch(content_type: str, info: Optional[FileInfo]) -> HTTPException:
+    found = info.mime_type if info else "format non reconnu"
+    return HTTPException(400, detail=f"Le contenu du fichier ne correspond pas au type déclaré {content_type} ({found})")
+
+def check_content(head: bytes, content_type: str) -> FileInfo:
+    """Sniff the head of a file and raise 400 unless it is of the declared type."""
+    info = validators.sniff(head)
+    if not validators.matches(info, content_type):
+        raise content_mismatch(content_type, info)
+    return info
+
+async def inspect_upload(file: UploadFile, content_type: str, max_size: int = settings.max_file_size) -> Tuple[str, FileInfo]:
+    """
+    SHA-256 of the upload and the format sniffed from its head, in one read
+    in bounded chunks (also enforces max_size). A file that is not of
+    content_type is rejected as soon as its head is read. The file is
+    rewound afterwards so it can still be stored.
+    """
+    digest = hashlib.sha256()
+    head = b""
+    info = None
+    async for chunk in iter_upload(file, max_size):
+        if info is None:
+            head += chunk[:validators.SNIFF_BYTES - len(head)]
+            if len(head) >= validators.SNIFF_BYTES:
+                info = check_content(head, content_type)
+        digest.update(chunk)
+    if info is None:
+        info = check_content(head, content_type)
+    await file.seek(0)
+    return digest.hexdigest(), info
+
+async def _single(content: bytes) -> AsyncIterator[bytes]:
+    yield content
+
+async def upload_blob_stream(chunks: AsyncIterator[bytes], file_ext: str) -> str:
+    return await put_blob_stream(f"{uuid.uuid4().hex}{file_ext}", chunks)
+
+async def put_blob_stream(key: str, chunks: AsyncIterator[bytes]) -> str:
     try:
-        result = put(path=new_filename, data=content, options={"access": "public"})
-        return result['url']
+        return await get_storage().put(key, chunks)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Blob upload failed: {str(e)}")
 
-def delete_blob(url: str):
+async def upload_file(file: UploadFile, file_ext: str, max_size: int = settings.max_file_size) -> str:
+    """
+    Store an UploadFile. When the backend can copy files directly and Starlette
+    has already spooled the upload to disk, the copy is zero-copy; otherwise
+    the file is streamed in bounded chunks.
+    """
+    storage = get_storage()
+    spooled = file.file
+    on_disk = getattr(spooled, "_rolled", False)
+    if hasattr(storage, "put_file") and on_disk and file.size is not None:
+        if file.size > max_size:
+            raise HTTPException(413, detail=f"Fichier trop volumineux (>{max_size // (1024 * 1024)}MB)")
+        try:
+            return await storage.put_file(f"{uuid.uuid4().hex}{file_ext}", spooled._file, file.size)
+        except Exception as e:
+            raise HTTPException(500, f"Blob upload failed: {str(e)}")
+    return await upload_blob_stream(iter_upload(file, max_size), file_ext)
+
+async def upload_blob(content: bytes, filename: str, file_ext: str) -> str:
+    return await upload_blob_stream(_single(content), file_ext)
+
+async def put_blob(key: str, content: bytes) -> str:
+    """Store bytes under an explicit key (derived files such as renditions)."""
+    return await get_storage().put(key, _single(content))
+
+async def delete_blob(url: str, ignore_errors: bool = True):
     try:
-        delete(url)
+        await get_storage().delete(url)
     except Exception as e:
+        if not ignore_errors:
+            raise
         # Log error but don't fail the whole request
-        print(f"Blob deletion error: {e}")
\ No newline at end of file
+        print(f"Blob deletion error: {e}")
+
+async def delete_blobs(
+    urls: List[str],
+    concurrency: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Delete many blobs with bounded concurrency, in batches when the backend
+    supports it. Never raises: returns {url: error message} for the failures.
+    """
+    concurrency = concurrency or settings.blob_max_concurrency
+    batch_size = batch_size or settings.blob_delete_batch_size
+    storage = get_storage()
+    if hasattr(storage, "delete_many"):
+        batches = [urls[i:i + batch_size] for i in range(0, len(urls), batch_size)]
+        delete = storage.delete_many
+    else:
+        batches = [[url] for url in urls]
+        delete = lambda batch: storage.delete(batch[0])
+
+    failures = {}
+    semaphore = anyio.Semaphore(concurrency)
+
+    async def run(batch):
+        async with semaphore:
+            try:
+                await delete(batch)
+            except Exception as e:
+                for url in batch:
+                    failures[url] = str(e)
+
+    async with anyio.create_task_group() as tg:
+        for batch in batches:
+            tg.start_soon(run, batch)
+    return failures
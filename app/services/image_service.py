@@ -0,0 +1,59 @@
+"""
+On-demand resizing of stored images (GET /media/{id}/image).
+
+Results are kept in a size-bounded LRU disk cache keyed by the source blob
+URL and the requested transform. Blob URLs are never reused for different
+content (a replaced file gets a new URL), so a key always names the same
+bytes: it doubles as a strong ETag. Concurrent requests for the same key
+share one transform.
+"""
+import hashlib
+import os
+from functools import lru_cache
+from typing import Optional
+
+import anyio
+
+from ..config import settings
+from ..utils.disk_cache import DiskLRUCache
+from ..utils.singleflight import SingleFlight
+from . import renditions
+from .storage import get_storage
+
+# Bump when the transform changes its output for the same parameters
+TRANSFORM_VERSION = 1
+
+flights = SingleFlight()
+
+@lru_cache
+def get_image_cache() -> DiskLRUCache:
+    root = settings.image_cache_dir
+    if not root:
+        root = "/tmp/image-cache" if os.environ.get('VERCEL') else "image-cache"
+    return DiskLRUCache(root, settings.image_cache_max_bytes)
+
+def cache_key(source_url: str, width: Optional[int], height: Optional[int], fmt: str) -> str:
+    params = f"{TRANSFORM_VERSION}|{source_url}|{width}|{height}|{fmt}|{settings.rendition_quality}"
+    return hashlib.sha256(params.encode()).hexdigest()
+
+async def _transform(key: str, source_url: str, width: Optional[int], height: Optional[int], fmt: str) -> bytes:
+    data = bytearray()
+    async for chunk in get_storage().get(source_url):
+        data += chunk
+    result = await renditions.run_in_pool(
+        renditions.transform, bytes(data), width, height, fmt, settings.rendition_quality
+    )
+    await anyio.to_thread.run_sync(get_image_cache().put, key, result)
+    return result
+
+async def resized_image(source_url: str, width: Optional[int], height: Optional[int], fmt: str) -> bytes:
+    """
+    The image at source_url fitted within width x height and encoded as fmt,
+    transformed on a cache miss. Raises renditions.InvalidImage.
+    """
+    key = cache_key(source_url, width, height, fmt)
+    # The bytes rather than a path: the file may be evicted before it is served
+    data = await anyio.to_thread.run_sync(get_image_cache().read, key)
+    if data is not None:
+        return data
+    return await flights.do(key, lambda: _transform(key, source_url, width, height, fmt))
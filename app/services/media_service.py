@@ -1,30 +1,697 @@
-from ..database import get_db as _get_db
-from ..models import MediaItem
-from fastapi import HTTPException
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..database import get_db as _get_db, run as _run, write as _write
+from ..instrumentation import stage
+from ..utils.cache import LRUCache
+from ..utils.validators import FileInfo
+from . import blob_storage, outbox, renditions, video
+from .storage import get_storage
+import anyio
+from fastapi import HTTPException, UploadFile
+import os
+import sqlite3
 import uuid
-from datetime import datetime
 
-async def create_media(product_id: str, file_type: str, is_thumbnail: bool, blob_url: str, filename: str):
+# Container metadata, filled in by the probe_video job
+VIDEO_FIELDS = ("duration", "width", "height", "video_codec", "audio_codec", "bitrate")
+
+MEDIA_FIELDS = ("id", "product_id", "file_name", "file_url", "file_type", "mime_type", "is_thumbnail", "created_at", "renditions") + VIDEO_FIELDS
+
+# Renditions of a medias row as a JSON array, one primary key seek per row
+RENDITIONS_SQL = (
+    "(SELECT json_group_array(json_object('width', r.width, 'height', r.height, 'format', r.format, 'url', r.file_url)) "
+    "FROM media_renditions r WHERE r.source_url = medias.file_url) AS renditions"
+)
+
+# SELECT expression of each field that is not a plain medias column
+FIELD_SQL = {"renditions": RENDITIONS_SQL}
+
+# Version of the row's product (product_versions, bumped by triggers on every
+# change), from which the read endpoints derive their ETag
+VERSION_SQL = (
+    "(SELECT version FROM product_versions v WHERE v.product_id = medias.product_id) AS product_version, "
+    "(SELECT updated_at FROM product_versions v WHERE v.product_id = medias.product_id) AS product_updated_at"
+)
+
+def get_product_version(conn, product_id: str) -> Optional[Tuple[int, float]]:
+    """(version, updated_at) of a product, or None if it never had a media."""
+    row = conn.execute(
+        "SELECT version, updated_at FROM product_versions WHERE product_id = ?", (product_id,)
+    ).fetchone()
+    return (row["version"], row["updated_at"]) if row else None
+
+def select_fields(fields) -> str:
+    return ", ".join(FIELD_SQL.get(field, field) for field in fields)
+
+def encode_cursor(created_at: str, media_id: str) -> str:
+    """Opaque keyset cursor: position after (created_at, id)."""
+    return base64.urlsafe_b64encode(json.dumps([created_at, media_id]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, media_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(media_id, str):
+        raise ValueError("invalid cursor")
+    return created_at, media_id
+
+def media_to_json(row, fields) -> str:
+    """Serialize a medias row the way MediaItem would (bool flag, ISO 8601 date)."""
+    item = {field: row[field] for field in fields}
+    if "is_thumbnail" in item:
+        item["is_thumbnail"] = bool(item["is_thumbnail"])
+    if item.get("created_at"):
+        item["created_at"] = item["created_at"].replace(" ", "T", 1)
+    if "renditions" in item:
+        item["renditions"] = json.loads(item["renditions"])
+    return json.dumps(item, ensure_ascii=False)
+
+def _media_from_row(row) -> dict:
+    media = dict(row)
+    media["is_thumbnail"] = bool(media["is_thumbnail"])
+    media["renditions"] = json.loads(media["renditions"])
+    return media
+
+# product_id -> thumbnail row (dict), or None when the product has no thumbnail.
+# Every write that can change a product's thumbnail must invalidate its entry.
+thumbnail_cache = LRUCache(
+    max_bytes=settings.thumbnail_cache_max_bytes,
+    ttl=settings.thumbnail_cache_ttl,
+    negative_ttl=settings.thumbnail_cache_negative_ttl,
+)
+
+def _insert_media(conn, product_id: str, file_type: str, is_thumbnail: bool, blob_url: str, filename: str, content_hash: Optional[str], info: Optional[FileInfo] = None) -> str:
     media_id = uuid.uuid4().hex
-    with _get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO medias (id, product_id, file_name, file_url, file_type, is_thumbnail) VALUES (?, ?, ?, ?, ?, ?)",
-            (media_id, product_id, filename, blob_url, file_type, 1 if is_thumbnail and file_type == 'image' else 0)
+    if is_thumbnail:
+        # One thumbnail per product (enforced by idx_medias_product_thumbnail)
+        conn.execute(
+            "UPDATE medias SET is_thumbnail = 0 WHERE product_id = ? AND is_thumbnail = 1",
+            (product_id,)
         )
-        conn.commit()
+    mime_type, width, height = (info.mime_type, info.width, info.height) if info else (None, None, None)
+    conn.execute(
+        "INSERT INTO medias (id, product_id, file_name, file_url, file_type, is_thumbnail, content_hash, mime_type, width, height) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (media_id, product_id, filename, blob_url, file_type, 1 if is_thumbnail else 0, content_hash, mime_type, width, height)
+    )
     return media_id
 
-def get_media_by_product(product_id: str):
+def _copy_blob_metadata(conn, media_id: str, blob_url: str):
+    """
+    Give a media the metadata already extracted for its (shared) blob. Kept
+    as inserted (sniffed mime type and dimensions) when none was extracted yet.
+    """
+    columns = ", ".join(VIDEO_FIELDS)
+    probed = "SELECT {} FROM medias WHERE file_url = ? AND id != ? AND duration IS NOT NULL LIMIT 1"
+    conn.execute(
+        f"UPDATE medias SET ({columns}) = ({probed.format(columns)}) WHERE id = ? AND EXISTS ({probed.format(1)})",
+        (blob_url, media_id, media_id, blob_url, media_id)
+    )
+
+def enqueue_processing(conn, file_type: str, urls: List[str]):
+    """Queue the post-upload work of new blobs: renditions for images, metadata for videos."""
+    if file_type == 'image':
+        enqueue_renditions(conn, urls)
+    elif file_type == 'video':
+        outbox.enqueue(conn, "probe_video", [{"url": url} for url in dict.fromkeys(urls)])
+
+async def create_media(product_id: str, file_type: str, is_thumbnail: bool, blob_url: str, filename: str, content_hash: Optional[str] = None, info: Optional[FileInfo] = None):
+    is_thumbnail = is_thumbnail and file_type == 'image'
+
+    def insert(conn):
+        media_id = _insert_media(conn, product_id, file_type, is_thumbnail, blob_url, filename, content_hash, info)
+        enqueue_processing(conn, file_type, [blob_url])
+        return media_id
+
+    media_id = await _write(insert)
+    outbox.notify()
+    if is_thumbnail:
+        thumbnail_cache.invalidate(product_id)
+    return media_id
+
+def find_blob(conn, content_hash: str) -> Optional[str]:
+    row = conn.execute(
+        "SELECT file_url FROM medias WHERE content_hash = ? LIMIT 1", (content_hash,)
+    ).fetchone()
+    return row["file_url"] if row else None
+
+def insert_uploaded_media(conn, product_id: str, file_type: str, is_thumbnail: bool, blob_url: str, filename: str, content_hash: str, info: Optional[FileInfo] = None) -> Tuple[str, str]:
+    """
+    Inside the caller's write transaction, insert a media for a blob that was
+    just uploaded. When identical content is already stored, its blob is
+    reused and the new one queued for deletion. Returns (media_id, file_url);
+    the caller commits, then calls outbox.notify().
+    """
+    is_thumbnail = is_thumbnail and file_type == 'image'
+    existing = find_blob(conn, content_hash)
+    if existing is not None:
+        media_id = _insert_media(conn, product_id, file_type, is_thumbnail, existing, filename, content_hash, info)
+        _copy_blob_metadata(conn, media_id, existing)
+        enqueue_blob_deletions(conn, [blob_url])
+        return media_id, existing
+    media_id = _insert_media(conn, product_id, file_type, is_thumbnail, blob_url, filename, content_hash, info)
+    enqueue_processing(conn, file_type, [blob_url])
+    return media_id, blob_url
+
+async def create_media_from_duplicate(product_id: str, file_type: str, is_thumbnail: bool, content_hash: str, filename: Optional[str], info: Optional[FileInfo] = None) -> Optional[Tuple[str, str]]:
+    """
+    Insert a media reusing the blob of already-stored identical content.
+    Returns (media_id, file_url), or None when the content is new.
+    The lookup and the insert share one write transaction, so a concurrent
+    delete cannot remove the blob in between.
+    """
+    is_thumbnail = is_thumbnail and file_type == 'image'
+
+    def insert(conn):
+        blob_url = find_blob(conn, content_hash)
+        if blob_url is None:
+            return None
+        media_id = _insert_media(
+            conn, product_id, file_type, is_thumbnail, blob_url, filename or os.path.basename(blob_url), content_hash, info
+        )
+        _copy_blob_metadata(conn, media_id, blob_url)
+        return media_id, blob_url
+
+    reused = await _write(insert)
+    if reused and is_thumbnail:
+        thumbnail_cache.invalidate(product_id)
+    return reused
+
+async def store_media(file: UploadFile, product_id: str, file_type: str, is_thumbnail: bool, filename: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Content-addressed upload: identical content already stored is not
+    transferred again, only a row referencing its blob is inserted.
+    filename defaults to the blob's name. A file whose content is not of
+    its declared type is rejected before any transfer. Returns (media_id, file_url).
+    """
+    with stage("upload", "hash"):
+        content_hash, info = await blob_storage.inspect_upload(file, file.content_type)
+    try:
+        with stage("upload", "dedup_lookup"):
+            reused = await create_media_from_duplicate(product_id, file_type, is_thumbnail, content_hash, filename, info)
+    except sqlite3.Error as e:
+        raise HTTPException(500, detail=f"Erreur BDD: {str(e)}")
+    if reused:
+        return reused
+
+    file_ext = os.path.splitext(file.filename)[1]
+    with stage("upload", "blob_put"):
+        blob_url = await blob_storage.upload_file(file, file_ext)
+    try:
+        with stage("upload", "db_insert"):
+            media_id = await create_media(
+                product_id=product_id,
+                file_type=file_type,
+                is_thumbnail=is_thumbnail,
+                blob_url=blob_url,
+                filename=filename or os.path.basename(blob_url),
+                content_hash=content_hash,
+                info=info,
+            )
+    except sqlite3.Error as e:
+        # Attempt to delete blob if DB fails
+        await blob_storage.delete_blob(blob_url)
+        raise HTTPException(500, detail=f"Erreur BDD: {str(e)}")
+    return media_id, blob_url
+
+def _find_blobs(conn, content_hashes) -> Dict[str, str]:
+    hashes = list(content_hashes)
+    if not hashes:
+        return {}
+    placeholders = ", ".join("?" * len(hashes))
+    return {
+        row["content_hash"]: row["file_url"] for row in conn.execute(
+            f"SELECT content_hash, MIN(file_url) AS file_url FROM medias WHERE content_hash IN ({placeholders}) GROUP BY content_hash",
+            hashes
+        )
+    }
+
+async def _rollback_blobs(urls: List[str]):
+    """Delete blobs that no committed row references; failures go through the outbox."""
+    failures = await blob_storage.delete_blobs(urls)
+    if failures:
+        await _write(lambda conn: enqueue_blob_deletions(conn, list(failures)))
+        outbox.notify()
+
+async def store_media_batch(files: List[UploadFile], file_types: List[str], product_id: str, thumbnail_index: Optional[int] = None) -> List[dict]:
+    """
+    Store validated files of one product, all or nothing. Identical content
+    is uploaded once (not at all when already stored), new blobs are
+    uploaded with bounded parallelism, then every row is inserted in a
+    single transaction. On failure the blobs this batch uploaded are deleted
+    and HTTPException is raised with the per-file results in its detail.
+    """
+    results = [
+        {
+            "filename": file.filename,
+            "status": "not_uploaded",
+            "file_type": file_type,
+            "is_thumbnail": i == thumbnail_index and file_type == 'image',
+        }
+        for i, (file, file_type) in enumerate(zip(files, file_types))
+    ]
+
+    def fail(status_code: int, message: str):
+        return HTTPException(status_code, detail={"message": message, "product_id": product_id, "results": results})
+
+    hashes, infos = [], []
+    with stage("upload_batch", "hash"):
+        for file, result in zip(files, results):
+            try:
+                content_hash, info = await blob_storage.inspect_upload(file, file.content_type)
+                hashes.append(content_hash)
+                infos.append(info)
+            except HTTPException as e:
+                result.update(status="failed", error=e.detail)
+                raise fail(e.status_code, "Fichier refusé, aucun fichier enregistré")
+
+    uploaded: Dict[str, str] = {}  # content hash -> blob uploaded by this batch
+    semaphore = anyio.Semaphore(settings.upload_batch_concurrency)
+    errors: Dict[str, Tuple[int, str]] = {}
+
+    async def upload(i: int):
+        async with semaphore:
+            try:
+                uploaded[hashes[i]] = await blob_storage.upload_file(files[i], os.path.splitext(files[i].filename)[1])
+            except HTTPException as e:
+                errors[hashes[i]] = (e.status_code, e.detail)
+            except Exception as e:
+                errors[hashes[i]] = (500, str(e))
+
+    # A reused blob can lose its last reference between the lookup and the
+    # insert; its content is then uploaded on the next round.
+    for _ in range(3):
+        try:
+            existing = await _run(_find_blobs, set(hashes) - set(uploaded))
+        except sqlite3.Error as e:
+            await _rollback_blobs(list(uploaded.values()))
+            raise fail(500, f"Erreur BDD: {str(e)}")
+        first_index = {}
+        for i, content_hash in enumerate(hashes):
+            if content_hash not in existing and content_hash not in uploaded:
+                first_index.setdefault(content_hash, i)
+        with stage("upload_batch", "blob_put"):
+            async with anyio.create_task_group() as tg:
+                for i in first_index.values():
+                    tg.start_soon(upload, i)
+
+        if errors:
+            await _rollback_blobs(list(uploaded.values()))
+            for content_hash, result in zip(hashes, results):
+                if content_hash in errors:
+                    result.update(status="failed", error=errors[content_hash][1])
+                elif content_hash in uploaded:
+                    result["status"] = "rolled_back"
+            status_code = 413 if any(code == 413 for code, _ in errors.values()) else 500
+            raise fail(status_code, "Échec du téléversement, aucun fichier enregistré")
+
+        def insert(conn) -> bool:
+            reused = _find_blobs(conn, set(hashes) - set(uploaded))
+            if len(reused) < len(set(hashes) - set(uploaded)):
+                return False
+            for file, content_hash, info, result in zip(files, hashes, infos, results):
+                blob_url = uploaded.get(content_hash) or reused[content_hash]
+                media_id = _insert_media(
+                    conn, product_id, result["file_type"], result["is_thumbnail"], blob_url, file.filename, content_hash, info
+                )
+                if content_hash in reused:
+                    _copy_blob_metadata(conn, media_id, blob_url)
+                result.update(id=media_id, file_url=blob_url, deduplicated=content_hash in reused)
+            for file_type in ('image', 'video'):
+                enqueue_processing(conn, file_type, [
+                    uploaded[h] for h, r in zip(hashes, results) if h in uploaded and r["file_type"] == file_type
+                ])
+            return True
+
+        try:
+            with stage("upload_batch", "db_insert"):
+                if not await _write(insert):
+                    continue
+        except sqlite3.Error as e:
+            await _rollback_blobs(list(uploaded.values()))
+            for result in results:
+                result.update(status="rolled_back" if result.get("file_url") in uploaded.values() else "failed",
+                              id=None, file_url=None, deduplicated=False)
+            raise fail(500, f"Erreur BDD: {str(e)}")
+
+        outbox.notify()
+        if thumbnail_index is not None:
+            thumbnail_cache.invalidate(product_id)
+        for result in results:
+            result["status"] = "created"
+        return results
+
+    await _rollback_blobs(list(uploaded.values()))
+    raise fail(503, "Fichiers modifiés pendant l'enregistrement, réessayez")
+
+async def update_media_file(media_id: str, content_hash: str, blob_url: Optional[str] = None, info: Optional[FileInfo] = None) -> Optional[str]:
+    """
+    Point a media at blob_url or, when blob_url is None, at the blob of
+    already-stored identical content. Returns the URL now referenced, or None
+    when blob_url is None and the content is new, or when the media no longer
+    exists (blob_url is then queued for deletion). The replaced blob is
+    queued for deletion, and the metadata of the old content replaced by `info`.
+    """
+    uploaded = blob_url is not None
+
+    def update(conn) -> Optional[str]:
+        new_url = blob_url if uploaded else find_blob(conn, content_hash)
+        if new_url is None:
+            return None
+        old = conn.execute("SELECT file_url, file_type FROM medias WHERE id = ?", (media_id,)).fetchone()
+        mime_type, width, height = (info.mime_type, info.width, info.height) if info else (None, None, None)
+        updated = conn.execute(
+            f"""UPDATE medias SET file_name = ?, file_url = ?, content_hash = ?, created_at = CURRENT_TIMESTAMP,
+            {", ".join(f"{field} = NULL" for field in VIDEO_FIELDS if field not in ("width", "height"))}, mime_type = ?, width = ?, height = ?
+            WHERE id = ?""",
+            (os.path.basename(new_url), new_url, content_hash, mime_type, width, height, media_id)
+        ).rowcount
+        if not updated:
+            # Deleted since the caller looked it up: nothing references the new blob
+            if uploaded:
+                enqueue_blob_deletions(conn, [blob_url])
+            return None
+        _copy_blob_metadata(conn, media_id, new_url)
+        if old["file_url"] != new_url:
+            enqueue_blob_deletions(conn, [old["file_url"]])
+        if uploaded:
+            enqueue_processing(conn, old["file_type"], [new_url])
+        return new_url
+
+    return await _write(update)
+
+def enqueue_blob_deletions(conn, urls: List[str]):
+    """
+    Queue blob deletions in the transaction that drops their references; the
+    outbox worker deletes them once committed (see _delete_blobs_job).
+    """
+    outbox.enqueue(conn, "delete_blob", [{"url": url} for url in dict.fromkeys(urls)])
+
+@outbox.handler("delete_blob")
+async def _delete_blobs_job(jobs: List[Tuple[int, dict]]) -> Dict[int, str]:
+    """
+    Delete the queued blobs no media references any more, with their
+    renditions, concurrently. Idempotent: a blob referenced again
+    (deduplicated upload) is kept, and deleting a missing blob succeeds.
+    """
+    urls = list(dict.fromkeys(payload["url"] for _, payload in jobs))
+    placeholders = ", ".join("?" * len(urls))
+
+    def lookup(conn):
+        referenced = {
+            row["file_url"] for row in conn.execute(
+                f"SELECT DISTINCT file_url FROM medias WHERE file_url IN ({placeholders})", urls
+            )
+        }
+        rendition_urls = {}
+        for row in conn.execute(
+            f"SELECT source_url, file_url FROM media_renditions WHERE source_url IN ({placeholders})", urls
+        ):
+            if row["source_url"] not in referenced:
+                rendition_urls.setdefault(row["source_url"], []).append(row["file_url"])
+        return [url for url in urls if url not in referenced], rendition_urls
+
+    unreferenced, rendition_urls = await _run(lookup)
+
+    failures = await blob_storage.delete_blobs(
+        unreferenced + [url for source in rendition_urls.values() for url in source]
+    )
+    # A source fails when it or any of its renditions could not be deleted
+    for source, derived in rendition_urls.items():
+        errors = [failures[url] for url in derived if url in failures]
+        if errors and source not in failures:
+            failures[source] = errors[0]
+
+    deleted = [source for source in rendition_urls if source not in failures]
+    if deleted:
+        def delete(conn):
+            conn.executemany("DELETE FROM media_renditions WHERE source_url = ?", [(url,) for url in deleted])
+
+        await _write(delete)
+    return {job_id: failures[payload["url"]] for job_id, payload in jobs if payload["url"] in failures}
+
+def enqueue_renditions(conn, urls: List[str]):
+    """Queue rendition rendering of image blobs (see _render_job)."""
+    if settings.rendition_widths and settings.rendition_formats:
+        outbox.enqueue(conn, "render", [{"url": url} for url in dict.fromkeys(urls)])
+
+def enqueue_missing_processing() -> int:
+    """
+    Queue post-upload work for stored blobs that never got it (uploaded before
+    renditions and video metadata existed). Returns the number of blobs queued.
+    """
     with _get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, product_id, file_name, file_url, file_type, is_thumbnail, created_at FROM medias WHERE product_id = ?",
-            (product_id,)
+        images = [
+            row["file_url"] for row in conn.execute(
+                """SELECT DISTINCT file_url FROM medias m
+                WHERE file_type = 'image'
+                AND NOT EXISTS (SELECT 1 FROM media_renditions r WHERE r.source_url = m.file_url)"""
+            )
+        ]
+        videos = [
+            row["file_url"] for row in conn.execute(
+                "SELECT DISTINCT file_url FROM medias WHERE file_type = 'video' AND duration IS NULL"
+            )
+        ]
+        enqueue_processing(conn, 'image', images)
+        enqueue_processing(conn, 'video', videos)
+        conn.commit()
+    outbox.notify()
+    return len(images) + len(videos)
+
+def _blob_state(conn, source: str) -> Tuple[bool, bool]:
+    """Whether a media references the blob, and whether it has renditions (or a poster)."""
+    referenced = conn.execute("SELECT 1 FROM medias WHERE file_url = ? LIMIT 1", (source,)).fetchone()
+    rendered = conn.execute("SELECT 1 FROM media_renditions WHERE source_url = ? LIMIT 1", (source,)).fetchone()
+    return referenced is not None, rendered is not None
+
+@outbox.handler("render")
+async def _render_job(jobs: List[Tuple[int, dict]]) -> Dict[int, str]:
+    """
+    Render and store the renditions of image blobs. Idempotent: a blob that
+    already has renditions, or that no media references any more, is skipped.
+    """
+    storage = get_storage()
+    errors = {}
+    for job_id, payload in jobs:
+        source = payload["url"]
+        referenced, rendered = await _run(_blob_state, source)
+        if not referenced or rendered:
+            continue
+
+        stored = []
+        try:
+            data = bytearray()
+            async for chunk in storage.get(source):
+                data += chunk
+            # A fresh prefix per attempt: storage does not overwrite existing keys
+            prefix = f"renditions/{os.path.splitext(os.path.basename(source))[0]}-{uuid.uuid4().hex[:8]}"
+            for rendition in await renditions.render_async(bytes(data)):
+                url = await blob_storage.put_blob(f"{prefix}/{rendition.width}.{rendition.format}", rendition.data)
+                stored.append((source, rendition.format, rendition.width, rendition.height, url, len(rendition.data)))
+        except Exception as e:
+            errors[job_id] = str(e)
+            await blob_storage.delete_blobs([row[4] for row in stored])
+            continue
+
+        def record(conn) -> List[str]:
+            products = [
+                row["product_id"] for row in conn.execute(
+                    "SELECT product_id FROM medias WHERE file_url = ? AND is_thumbnail = 1", (source,)
+                )
+            ]
+            if conn.execute("SELECT 1 FROM medias WHERE file_url = ? LIMIT 1", (source,)).fetchone():
+                conn.executemany(
+                    "INSERT OR REPLACE INTO media_renditions (source_url, format, width, height, file_url, size) VALUES (?, ?, ?, ?, ?, ?)",
+                    stored
+                )
+            else:
+                # The media was deleted while rendering
+                enqueue_blob_deletions(conn, [row[4] for row in stored])
+            return products
+
+        for product_id in await _write(record):
+            thumbnail_cache.invalidate(product_id)
+    return errors
+
+@outbox.handler("probe_video")
+async def _probe_video_job(jobs: List[Tuple[int, dict]]) -> Dict[int, str]:
+    """
+    Store the container metadata of video blobs on every media referencing
+    them and, when ffmpeg is available, a JPEG poster frame as a rendition.
+    Idempotent; files that cannot be parsed are left without metadata.
+    """
+    errors = {}
+    for job_id, payload in jobs:
+        source = payload["url"]
+        referenced, has_poster = await _run(_blob_state, source)
+        if not referenced:
+            continue
+
+        poster = None
+        try:
+            try:
+                info = await video.probe(source)
+            except ValueError:
+                continue  # unsupported or corrupt container: nothing to extract
+            if not has_poster:
+                at = settings.video_poster_at
+                if info.duration:
+                    at = min(at, info.duration / 2)
+                frame = await video.poster_frame(source, at)
+                if frame:
+                    data, fmt = frame
+                    prefix = f"renditions/{os.path.splitext(os.path.basename(source))[0]}-{uuid.uuid4().hex[:8]}"
+                    url = await blob_storage.put_blob(f"{prefix}/poster.{fmt}", data)
+                    poster = (source, fmt, info.width or 0, info.height or 0, url, len(data))
+        except Exception as e:
+            errors[job_id] = str(e)
+            continue
+
+        def record(conn):
+            if conn.execute("SELECT 1 FROM medias WHERE file_url = ? LIMIT 1", (source,)).fetchone():
+                conn.execute(
+                    f"UPDATE medias SET {', '.join(f'{field} = ?' for field in VIDEO_FIELDS)} WHERE file_url = ?",
+                    (*info, source)
+                )
+                if poster:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO media_renditions (source_url, format, width, height, file_url, size) VALUES (?, ?, ?, ?, ?, ?)",
+                        poster
+                    )
+            elif poster:
+                # The media was deleted while probing
+                enqueue_blob_deletions(conn, [poster[4]])
+
+        await _write(record)
+    return errors
+
+def _select_media(conn, media_id: str):
+    return conn.execute(
+        "SELECT product_id, file_url, file_type, is_thumbnail FROM medias WHERE id = ?", (media_id,)
+    ).fetchone()
+
+async def get_media(media_id: str) -> Optional[sqlite3.Row]:
+    """product_id, file_url, file_type and is_thumbnail of a media, or None."""
+    return await _run(_select_media, media_id)
+
+async def delete_media(media_id: str) -> Optional[str]:
+    """
+    Delete a media and queue its blob for deletion, done in the background
+    once no other media references it. Returns the media's product_id, or
+    None when it does not exist.
+    """
+    def delete(conn) -> Optional[str]:
+        media = _select_media(conn, media_id)
+        if media is None:
+            return None
+        conn.execute("DELETE FROM medias WHERE id = ?", (media_id,))
+        enqueue_blob_deletions(conn, [media["file_url"]])
+        return media["product_id"]
+
+    product_id = await _write(delete)
+    if product_id is not None:
+        thumbnail_cache.invalidate(product_id)
+        outbox.notify()
+    return product_id
+
+async def delete_product_media(product_id: str) -> Tuple[int, List[str]]:
+    """
+    Delete every media of a product and queue their blobs for deletion.
+    Returns (media deleted, distinct blobs queued).
+    """
+    def delete(conn) -> Tuple[int, List[str]]:
+        urls = [
+            row["file_url"] for row in conn.execute("SELECT file_url FROM medias WHERE product_id = ?", (product_id,))
+        ]
+        if not urls:
+            return 0, []
+        blob_urls = list(dict.fromkeys(urls))
+        conn.execute("DELETE FROM medias WHERE product_id = ?", (product_id,))
+        enqueue_blob_deletions(conn, blob_urls)
+        return len(urls), blob_urls
+
+    deleted, blob_urls = await _write(delete)
+    if deleted:
+        thumbnail_cache.invalidate(product_id)
+        outbox.notify()
+    return deleted, blob_urls
+
+async def set_thumbnail(media_id: str) -> dict:
+    """
+    Make an image media its product's thumbnail, in place of the current one.
+    Raises HTTPException when the media does not exist, is not an image or
+    already is the thumbnail. Returns the updated media.
+    """
+    def update(conn) -> dict:
+        media = _select_media(conn, media_id)
+        if not media:
+            raise HTTPException(404, detail="Média non trouvé")
+        if media["file_type"] != "image":
+            raise HTTPException(400, detail="Seules les images peuvent être des miniatures")
+        if media["is_thumbnail"] == 1:
+            raise HTTPException(400, detail="Ce média est déjà la miniature actuelle")
+        conn.execute(
+            "UPDATE medias SET is_thumbnail = 0 WHERE product_id = ? AND is_thumbnail = 1",
+            (media["product_id"],)
         )
-        rows = cursor.fetchall()
-        if not rows:
-            raise HTTPException(404, "No media found for this product")
-        return [MediaItem(**dict(row)) for row in rows]
+        conn.execute("UPDATE medias SET is_thumbnail = 1 WHERE id = ?", (media_id,))
+        updated = conn.execute(
+            "SELECT id, product_id, file_name, file_url, file_type, is_thumbnail, created_at FROM medias WHERE id = ?",
+            (media_id,)
+        ).fetchone()
+        return {**dict(updated), "is_thumbnail": bool(updated["is_thumbnail"])}
+
+    updated = await _write(update)
+    thumbnail_cache.invalidate(updated["product_id"])
+    return updated
+
+def _select_thumbnails(conn, product_ids: List[str]) -> Dict[str, dict]:
+    placeholders = ", ".join("?" * len(product_ids))
+    rows = conn.execute(
+        f"""SELECT {select_fields(MEDIA_FIELDS)}, {VERSION_SQL}
+        FROM medias
+        WHERE product_id IN ({placeholders}) AND file_type = 'image' AND is_thumbnail = 1""",
+        product_ids
+    )
+    return {row["product_id"]: _media_from_row(row) for row in rows}
+
+async def get_thumbnail(product_id: str) -> Optional[dict]:
+    """
+    The product's thumbnail row, served from thumbnail_cache when possible.
+    Carries product_version/product_updated_at read with it, so a cached
+    entry and its ETag always match.
+    """
+    found, thumbnail = thumbnail_cache.get(product_id)
+    if found:
+        return thumbnail
+    generation = thumbnail_cache.generation
+    thumbnail = (await _run(_select_thumbnails, [product_id])).get(product_id)
+    thumbnail_cache.set(product_id, thumbnail, generation=generation)
+    return thumbnail
+
+async def get_thumbnails(product_ids: List[str]) -> Dict[str, Optional[dict]]:
+    """
+    Thumbnails of many products: cached entries first, then a single indexed
+    IN (...) query for the rest. Products without a thumbnail map to None.
+    """
+    thumbnails = {}
+    pending = []
+    for product_id in dict.fromkeys(product_ids):
+        found, thumbnail = thumbnail_cache.get(product_id)
+        if found:
+            thumbnails[product_id] = thumbnail
+        else:
+            pending.append(product_id)
 
-# Similarly move other functions: delete_media, update_media, etc.
\ No newline at end of file
+    if pending:
+        generation = thumbnail_cache.generation
+        found_rows = await _run(_select_thumbnails, pending)
+        for product_id in pending:
+            thumbnail = found_rows.get(product_id)
+            thumbnail_cache.set(product_id, thumbnail, generation=generation)
+            thumbnails[product_id] = thumbnail
+    return thumbnails
@@ -0,0 +1,195 @@
+"""
+Transactional outbox for side effects outside SQLite (blob storage).
+
+A job is written with enqueue() in the same transaction as the metadata
+change that requires it, so both commit or roll back together and the
+request only pays for the commit. A worker (in the API process, see
+worker_lifespan, or `python -m app.worker`) claims due jobs in batches and
+runs the handler registered for their kind. Failures are retried with
+exponential backoff; nothing is ever dropped.
+
+Handlers must be idempotent: a job may run more than once (e.g. when a
+worker dies between the side effect and recording it).
+"""
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, suppress
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..database import get_db as _get_db, run as _run
+from ..instrumentation import stage
+
+# handler(jobs: [(job id, payload)]) -> {job id: error message} for the failures
+Handler = Callable[[List[Tuple[int, dict]]], Awaitable[Dict[int, str]]]
+HANDLERS: Dict[str, Handler] = {}
+
+_wakeup: Optional[asyncio.Event] = None
+
+def handler(kind: str):
+    """Register the handler of a job kind."""
+    def register(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+    return register
+
+def enqueue(conn, kind: str, payloads: List[dict], delay: float = 0.0):
+    """Add jobs inside the caller's transaction (committed by the caller), due after delay seconds."""
+    now = time.time()
+    conn.executemany(
+        "INSERT OR IGNORE INTO outbox (kind, payload, created_at, available_at) VALUES (?, ?, ?, ?)",
+        [(kind, json.dumps(payload, sort_keys=True), now, now + delay) for payload in payloads]
+    )
+
+def notify():
+    """Wake the in-process worker; call after committing new jobs."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+def backoff(attempts: int) -> float:
+    delay = min(settings.outbox_backoff_base * 2 ** (attempts - 1), settings.outbox_backoff_max)
+    return delay * random.uniform(0.5, 1.0)
+
+def _claim(conn, limit: int) -> List[Tuple[int, str, dict, int]]:
+    # Leasing the jobs (pushing available_at forward) keeps other workers off them
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    rows = conn.execute(
+        "SELECT id, kind, payload, attempts FROM outbox WHERE available_at <= ? ORDER BY available_at LIMIT ?",
+        (now, limit)
+    ).fetchall()
+    conn.executemany(
+        "UPDATE outbox SET available_at = ? WHERE id = ?",
+        [(now + settings.outbox_lease_seconds, row["id"]) for row in rows]
+    )
+    conn.commit()
+    return [(row["id"], row["kind"], json.loads(row["payload"]), row["attempts"]) for row in rows]
+
+def _record(conn, done: List[int], failures: Dict[int, Tuple[str, int]]):
+    now = time.time()
+    conn.executemany("DELETE FROM outbox WHERE id = ?", [(job_id,) for job_id in done])
+    conn.executemany(
+        "UPDATE outbox SET attempts = ?, last_error = ?, available_at = ? WHERE id = ?",
+        [(attempts, error, now + backoff(attempts), job_id) for job_id, (error, attempts) in failures.items()]
+    )
+    conn.commit()
+
+async def process_batch(limit: Optional[int] = None) -> Tuple[int, int]:
+    """Run one batch of due jobs. Returns (succeeded, failed)."""
+    jobs = await _run(_claim, limit or settings.outbox_batch_size)
+    if not jobs:
+        return 0, 0
+
+    by_kind = defaultdict(list)
+    attempts = {}
+    for job_id, kind, payload, job_attempts in jobs:
+        by_kind[kind].append((job_id, payload))
+        attempts[job_id] = job_attempts + 1
+
+    errors: Dict[int, str] = {}
+    for kind, kind_jobs in by_kind.items():
+        run = HANDLERS.get(kind)
+        if run is None:
+            errors.update((job_id, f"No handler for job kind '{kind}'") for job_id, _ in kind_jobs)
+            continue
+        try:
+            with stage("outbox", kind):
+                errors.update(await run(kind_jobs))
+        except Exception as e:
+            errors.update((job_id, str(e)) for job_id, _ in kind_jobs)
+
+    done = [job_id for job_id in attempts if job_id not in errors]
+    await _run(_record, done, {job_id: (error, attempts[job_id]) for job_id, error in errors.items()})
+    return len(done), len(errors)
+
+async def drain() -> Tuple[int, int]:
+    """Process due jobs until none is left. Returns (succeeded, failed)."""
+    succeeded = failed = 0
+    while True:
+        ok, ko = await process_batch()
+        if not ok and not ko:
+            return succeeded, failed
+        succeeded += ok
+        failed += ko
+
+async def run_worker(poll_interval: Optional[float] = None):
+    """Drain the outbox forever, waking up on notify() or every poll_interval."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    poll_interval = poll_interval or settings.outbox_poll_interval
+    while True:
+        _wakeup.clear()
+        try:
+            await drain()
+        except Exception as e:
+            # Keep the worker alive; jobs stay queued
+            print(f"Outbox worker error: {e}")
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(_wakeup.wait(), poll_interval)
+
+@asynccontextmanager
+async def worker_lifespan(app):
+    """FastAPI lifespan running the outbox worker alongside the API."""
+    global _wakeup
+    task = asyncio.create_task(run_worker()) if settings.outbox_worker_enabled else None
+    try:
+        yield
+    finally:
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+            _wakeup = None
+
+def _reschedule_failed(conn) -> int:
+    count = conn.execute(
+        "UPDATE outbox SET available_at = ? WHERE attempts > 0", (time.time(),)
+    ).rowcount
+    conn.commit()
+    return count
+
+async def retry_now() -> int:
+    """Make every failed job due immediately. Returns the number of jobs rescheduled."""
+    count = await _run(_reschedule_failed)
+    notify()
+    return count
+
+def stats() -> dict:
+    """
+    Queue depth and lag (age of the oldest job, how overdue the oldest due
+    job is). Blocking: async code runs it with database.run_sync.
+    """
+    now = time.time()
+    with _get_db() as conn:
+        row = conn.execute(
+            """
+            SELECT COUNT(*) AS depth,
+                   SUM(available_at <= ?) AS due,
+                   SUM(attempts > 0) AS retrying,
+                   MIN(created_at) AS oldest,
+                   MIN(CASE WHEN available_at <= ? THEN available_at END) AS oldest_due,
+                   MAX(attempts) AS max_attempts
+            FROM outbox
+            """,
+            (now, now)
+        ).fetchone()
+        kinds = {
+            r["kind"]: r["count"]
+            for r in conn.execute("SELECT kind, COUNT(*) AS count FROM outbox GROUP BY kind")
+        }
+        last_error = conn.execute(
+            "SELECT last_error FROM outbox WHERE last_error IS NOT NULL ORDER BY available_at DESC LIMIT 1"
+        ).fetchone()
+    return {
+        "depth": row["depth"],
+        "due": row["due"] or 0,
+        "retrying": row["retrying"] or 0,
+        "lag_seconds": now - row["oldest"] if row["oldest"] is not None else 0.0,
+        "due_lag_seconds": now - row["oldest_due"] if row["oldest_due"] is not None else 0.0,
+        "max_attempts": row["max_attempts"] or 0,
+        "by_kind": kinds,
+        "last_error": last_error["last_error"] if last_error else None,
+    }
@@ -0,0 +1,128 @@
+"""
+Resized copies of uploaded images, rendered in a process pool: the stored
+renditions generated after upload (render) and on-demand resizes (transform).
+
+The image is decoded once, at the smallest scale that still covers the
+largest output (JPEG draft mode). Stored renditions are then resized from
+the largest width down to the smallest, each step starting from the previous
+result. Images are never upscaled.
+"""
+import asyncio
+import io
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Sequence
+
+import anyio
+
+from ..config import settings
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+# PIL format name and content extension per rendition format
+FORMATS = {"webp": "WEBP", "avif": "AVIF", "jpeg": "JPEG", "png": "PNG"}
+
+class InvalidImage(ValueError):
+    """The content is not an image Pillow can decode."""
+
+class Rendition(NamedTuple):
+    width: int
+    height: int
+    format: str
+    data: bytes
+
+def _open(data: bytes):
+    """Open without decoding. Returns (image, displayed width, displayed height)."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError as e:
+        raise InvalidImage(str(e))
+    width, height = image.size
+    # EXIF orientations 5-8 swap the displayed width and height
+    if image.getexif().get(0x0112) in (5, 6, 7, 8):
+        width, height = height, width
+    return image, width, height
+
+def _decode(image, scale: float):
+    """Decode at the smallest scale >= `scale`, upright, in RGB(A)."""
+    from PIL import ImageOps
+
+    if image.format == "JPEG" and scale < 1:
+        image.draft("RGB", (max(1, int(image.size[0] * scale)), max(1, int(image.size[1] * scale))))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        transparent = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if transparent else "RGB")
+    return image
+
+def _encode(image, fmt: str, quality: int) -> bytes:
+    out = io.BytesIO()
+    if fmt == "jpeg" and image.mode == "RGBA":
+        image = image.convert("RGB")
+    image.save(out, FORMATS[fmt], quality=quality)
+    return out.getvalue()
+
+def render(data: bytes, widths: Sequence[int], formats: Sequence[str], quality: int) -> List[Rendition]:
+    """
+    Decode an image and encode it at each width in each format (runs in a
+    worker process). Content Pillow cannot identify gets no renditions.
+    """
+    from PIL import Image
+
+    try:
+        image, width, height = _open(data)
+    except InvalidImage:
+        return []
+    with image:
+        targets = sorted((w for w in set(widths) if w < width), reverse=True)
+        if not targets:
+            return []
+        current = _decode(image, targets[0] / width)
+        renditions = []
+        for target in targets:
+            size = (target, max(1, round(height * target / width)))
+            current = current.resize(size, Image.LANCZOS, reducing_gap=3.0)
+            for fmt in formats:
+                renditions.append(Rendition(size[0], size[1], fmt, _encode(current, fmt, quality)))
+        return renditions
+
+def transform(data: bytes, width: Optional[int], height: Optional[int], fmt: str, quality: int) -> bytes:
+    """
+    Fit an image within width x height (either may be None), keeping its
+    aspect ratio and never upscaling, and encode it as fmt. Raises InvalidImage.
+    """
+    from PIL import Image
+
+    image, source_width, source_height = _open(data)
+    with image:
+        scale = min(
+            (width or source_width) / source_width,
+            (height or source_height) / source_height,
+            1.0,
+        )
+        size = (max(1, round(source_width * scale)), max(1, round(source_height * scale)))
+        current = _decode(image, scale)
+        if current.size != size:
+            current = current.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        return _encode(current, fmt, quality)
+
+_executor: Optional["ProcessPoolExecutor"] = None
+
+def _get_executor() -> "ProcessPoolExecutor":
+    global _executor
+    if _executor is None:
+        # Imported here: multiprocessing is not needed until the first rendition (cold starts)
+        from concurrent.futures import ProcessPoolExecutor
+        _executor = ProcessPoolExecutor(max_workers=settings.rendition_workers)
+    return _executor
+
+async def run_in_pool(func, *args):
+    """Run an image function in the process pool (or a thread when rendition_workers is 0)."""
+    if settings.rendition_workers <= 0:
+        return await anyio.to_thread.run_sync(func, *args)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+async def render_async(data: bytes) -> List[Rendition]:
+    """render() with the configured sizes and formats."""
+    return await run_in_pool(render, data, settings.rendition_widths, settings.rendition_formats, settings.rendition_quality)
@@ -0,0 +1,26 @@
+from functools import lru_cache
+
+from ...config import settings
+from .base import BlobInfo, StorageBackend, run_blocking
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    """The backend selected by settings.storage_backend (one instance per process)."""
+    backend = _create_backend()
+    if settings.metrics_enabled:
+        from .instrumented import InstrumentedStorage
+        return InstrumentedStorage(backend)
+    return backend
+
+def _create_backend() -> StorageBackend:
+    if settings.storage_backend == "vercel":
+        from .vercel import VercelBlobBackend
+        return VercelBlobBackend()
+    if settings.storage_backend == "local":
+        from .local import LocalStorageBackend
+        return LocalStorageBackend(settings.storage_local_root, f"{settings.base_url.rstrip('/')}/files")
+    if settings.storage_backend == "memory":
+        from .memory import MemoryStorageBackend
+        return MemoryStorageBackend(settings.storage_memory_latency)
+    raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
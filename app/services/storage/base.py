@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import AsyncIterator, List, Optional, Protocol, Tuple
+
+import anyio
+
+from ...config import settings
+
+
+@dataclass
+class BlobInfo:
+    url: str
+    size: int
+    uploaded_at: datetime
+
+
+class StorageBackend(Protocol):
+    """
+    Where media bytes live. Blobs are addressed by the public URL returned
+    from put(), which is what gets stored in medias.file_url.
+    """
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes]) -> str:
+        """Store a chunk stream under key and return its public URL."""
+        ...
+
+    def get(self, url: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream the blob's bytes, optionally limited to the range [start, end)."""
+        ...
+
+    async def delete(self, url: str) -> None:
+        """Remove a blob. Deleting a missing blob is not an error."""
+        ...
+
+    # Backends with a batch API may also provide
+    #     async def delete_many(self, urls: List[str]) -> None
+    # which removes all the URLs in one request (all-or-nothing on error).
+
+    async def list(self, cursor: Optional[str] = None, limit: int = 1000) -> Tuple[List[BlobInfo], Optional[str]]:
+        """Return one page of blobs and the cursor of the next page (None at the end)."""
+        ...
+
+
+# Blocking I/O (the vercel_blob client, local disk) runs in worker threads so a
+# slow call never stalls the event loop. The dedicated limiter bounds how many
+# threads storage may hold, leaving the default pool to FastAPI.
+_limiter = None
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(settings.blob_max_concurrency)
+    return _limiter
+
+async def run_blocking(func, *args, **kwargs):
+    return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=_get_limiter())
@@ -0,0 +1,62 @@
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+from ... import instrumentation
+from .base import BlobInfo
+
+
+class InstrumentedStorage:
+    """
+    Wraps a backend to record the latency and failures of each call
+    (blob_request_duration_seconds / blob_errors_total, by operation).
+    Optional methods (put_file, delete_many) exist only if the backend has
+    them, so capability checks with hasattr() still work. Other attributes
+    are the backend's.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        if hasattr(backend, "put_file"):
+            self.put_file = self._put_file
+        if hasattr(backend, "delete_many"):
+            self.delete_many = self._delete_many
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    async def _call(self, op: str, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        except Exception:
+            instrumentation.BLOB_ERRORS.labels(op).inc()
+            raise
+        finally:
+            instrumentation.BLOB_SECONDS.labels(op).observe(time.perf_counter() - start)
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes]) -> str:
+        # Includes the time spent producing the chunks (e.g. reading the upload)
+        return await self._call("put", self.backend.put(key, chunks))
+
+    async def _put_file(self, key: str, source, size: int) -> str:
+        return await self._call("put", self.backend.put_file(key, source, size))
+
+    async def get(self, url: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        began = time.perf_counter()
+        try:
+            async for chunk in self.backend.get(url, start, end):
+                yield chunk
+        except Exception:
+            instrumentation.BLOB_ERRORS.labels("get").inc()
+            raise
+        finally:
+            instrumentation.BLOB_SECONDS.labels("get").observe(time.perf_counter() - began)
+
+    async def delete(self, url: str) -> None:
+        await self._call("delete", self.backend.delete(url))
+
+    async def _delete_many(self, urls: List[str]) -> None:
+        await self._call("delete_many", self.backend.delete_many(urls))
+
+    async def list(self, cursor: Optional[str] = None, limit: int = 1000) -> Tuple[List[BlobInfo], Optional[str]]:
+        return await self._call("list", self.backend.list(cursor, limit))
@@ -0,0 +1,159 @@
+import heapq
+import itertools
+import os
+import posixpath
+import shutil
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, BinaryIO, Iterator, List, Optional, Tuple
+
+from ...config import settings
+from .base import BlobInfo, run_blocking
+
+
+class LocalStorageBackend:
+    """
+    Blobs stored as files under `root` and served by the /files router, for
+    on-prem deployments, benchmarks and profiling without the network.
+    """
+
+    def __init__(self, root: str, public_url: str, read_chunk_size: int = settings.upload_chunk_size):
+        self.root = os.path.abspath(root)
+        self.public_url = public_url.rstrip("/")
+        self.read_chunk_size = read_chunk_size
+        os.makedirs(os.path.join(self.root, ".tmp"), exist_ok=True)
+
+    def key_for(self, url: str) -> str:
+        prefix = self.public_url + "/"
+        if not url.startswith(prefix):
+            raise FileNotFoundError(url)
+        return url[len(prefix):]
+
+    def path_for(self, key: str) -> str:
+        # Normalised first, so "a/../.tmp/x" cannot reach the staging directory
+        parts = posixpath.normpath(key).split("/")
+        if any(part in ("", "..") or part.startswith(".") for part in parts):
+            raise FileNotFoundError(key)
+        path = os.path.abspath(os.path.join(self.root, *parts))
+        if not path.startswith(self.root + os.sep):
+            raise FileNotFoundError(key)
+        return path
+
+    def _commit(self, tmp_path: str, key: str) -> str:
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return f"{self.public_url}/{key}"
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes]) -> str:
+        # Write to a private temp file and rename, so readers never see a partial blob
+        tmp_path = os.path.join(self.root, ".tmp", uuid.uuid4().hex)
+        f = await run_blocking(open, tmp_path, "wb")
+        try:
+            async for chunk in chunks:
+                await run_blocking(f.write, chunk)
+        except BaseException:
+            f.close()
+            os.unlink(tmp_path)
+            raise
+        f.close()
+        return self._commit(tmp_path, key)
+
+    def _copy_file(self, source: BinaryIO, tmp_path: str, size: int):
+        source.seek(0)
+        with open(tmp_path, "wb") as out:
+            try:
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(out.fileno(), source.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            except OSError:
+                # sendfile between these descriptors is unsupported: plain copy
+                source.seek(0)
+                out.seek(0)
+                out.truncate()
+                shutil.copyfileobj(source, out, self.read_chunk_size)
+
+    async def put_file(self, key: str, source: BinaryIO, size: int) -> str:
+        """Zero-copy store of an on-disk file (kernel sendfile, no userspace buffers)."""
+        tmp_path = os.path.join(self.root, ".tmp", uuid.uuid4().hex)
+        try:
+            await run_blocking(self._copy_file, source, tmp_path, size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return self._commit(tmp_path, key)
+
+    async def get(self, url: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        f = await run_blocking(open, self.path_for(self.key_for(url)), "rb")
+        try:
+            f.seek(start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                size = self.read_chunk_size if remaining is None else min(self.read_chunk_size, remaining)
+                chunk = await run_blocking(f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+    async def delete(self, url: str) -> None:
+        try:
+            await run_blocking(os.unlink, self.path_for(self.key_for(url)))
+        except FileNotFoundError:
+            pass
+
+    def _scan(self, prefix: str, cursor: Optional[str], after: Optional[str]) -> Iterator[Tuple[str, bool]]:
+        """(key, is_dir) of the entries of a directory that can hold a key greater than cursor, past `after`."""
+        with os.scandir(os.path.join(self.root, prefix)) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                # "d/" sorts its subtree where its keys belong among the files ("d-1" < "d/x")
+                is_dir = entry.is_dir()
+                key = prefix + entry.name + ("/" if is_dir else "")
+                if cursor is not None and key <= cursor and not (is_dir and cursor.startswith(key)):
+                    continue
+                if after is None or key > after:
+                    yield key, is_dir
+
+    def _keys_after(self, cursor: Optional[str], count: int, prefix: str = "") -> Iterator[str]:
+        """
+        Keys greater than cursor, in order. Each directory is scanned keeping
+        only its `count` smallest entries, so memory stays bounded by the page
+        however many files it holds; it is scanned again only if those are
+        used up without filling the page (empty subdirectories).
+        """
+        after = None
+        while True:
+            entries = heapq.nsmallest(count, self._scan(prefix, cursor, after))
+            for key, is_dir in entries:
+                if is_dir:
+                    yield from self._keys_after(cursor, count, key)
+                else:
+                    yield key
+            if len(entries) < count:
+                return
+            after = entries[-1][0]
+
+    def _list(self, cursor: Optional[str], limit: int) -> Tuple[List[BlobInfo], Optional[str]]:
+        keys = list(itertools.islice(self._keys_after(cursor, limit + 1), limit + 1))
+        page = keys[:limit]
+        blobs = []
+        for key in page:
+            stat = os.stat(self.path_for(key))
+            blobs.append(BlobInfo(
+                url=f"{self.public_url}/{key}",
+                size=stat.st_size,
+                uploaded_at=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            ))
+        return blobs, page[-1] if len(keys) > limit else None
+
+    async def list(self, cursor: Optional[str] = None, limit: int = 1000) -> Tuple[List[BlobInfo], Optional[str]]:
+        return await run_blocking(self._list, cursor, limit)
@@ -0,0 +1,63 @@
+import bisect
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import anyio
+
+from .base import BlobInfo
+
+
+class MemoryStorageBackend:
+    """
+    Blobs kept in a dict. For tests and benchmarks only: nothing survives the
+    process. `latency` (seconds) is added to every call to stand in for the
+    round trip to a real store.
+    """
+
+    public_url = "memory://blobs"
+
+    def __init__(self, latency: float = 0.0):
+        self.blobs: Dict[str, Tuple[bytes, datetime]] = {}
+        self.latency = latency
+        self._sorted: Optional[List[str]] = None  # listing order, rebuilt after a put
+
+    async def _round_trip(self):
+        if self.latency:
+            await anyio.sleep(self.latency)
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes]) -> str:
+        data = bytearray()
+        async for chunk in chunks:
+            data += chunk
+        await self._round_trip()
+        url = f"{self.public_url}/{key}"
+        self.blobs[url] = (bytes(data), datetime.now(timezone.utc))
+        self._sorted = None
+        return url
+
+    async def get(self, url: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        await self._round_trip()
+        if url not in self.blobs:
+            raise FileNotFoundError(url)
+        yield self.blobs[url][0][start:end]
+
+    async def delete(self, url: str) -> None:
+        await self._round_trip()
+        self.blobs.pop(url, None)
+
+    async def list(self, cursor: Optional[str] = None, limit: int = 1000) -> Tuple[List[BlobInfo], Optional[str]]:
+        await self._round_trip()
+        if self._sorted is None:
+            self._sorted = sorted(self.blobs)
+        # Deleted URLs stay in the sorted list until the next put and are skipped here
+        start = 0 if cursor is None else bisect.bisect_right(self._sorted, cursor)
+        page, more = [], False
+        for i in range(start, len(self._sorted)):
+            url = self._sorted[i]
+            if url in self.blobs:
+                if len(page) == limit:
+                    more = True
+                    break
+                page.append(url)
+        blobs = [BlobInfo(url=url, size=len(self.blobs[url][0]), uploaded_at=self.blobs[url][1]) for url in page]
+        return blobs, page[-1] if more else None
@@ -0,0 +1,106 @@
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+import requests
+import vercel_blob
+from vercel_blob.blob_store import (
+    _API_VERSION,
+    _DEFAULT_CACHE_AGE,
+    _complete_multipart_upload,
+    _create_multipart_upload,
+    _get_auth_token,
+    _upload_part,
+)
+from vercel_blob.utils import guess_mime_type
+
+from ...config import settings
+from .base import BlobInfo, run_blocking
+
+
+def _multipart_headers(path: str) -> dict:
+    # Same headers vercel_blob.put builds for a multipart upload
+    return {
+        "access": "public",
+        "authorization": f"Bearer {_get_auth_token({})}",
+        "x-api-version": _API_VERSION,
+        "x-content-type": guess_mime_type(path),
+        "x-cache-control-max-age": _DEFAULT_CACHE_AGE,
+    }
+
+
+class VercelBlobBackend:
+    """Vercel Blob Storage through the (blocking) vercel_blob client."""
+
+    def __init__(self, part_size: int = settings.upload_part_size, read_chunk_size: int = settings.upload_chunk_size):
+        self.part_size = part_size
+        self.read_chunk_size = read_chunk_size
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes]) -> str:
+        """
+        Holds at most one part in memory: small files go through a single PUT,
+        larger ones through a multipart upload.
+        """
+        buffer = bytearray()
+        upload = None
+        parts = []
+        async for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= self.part_size:
+                if upload is None:
+                    headers = _multipart_headers(key)
+                    upload = await run_blocking(_create_multipart_upload, key, headers, {})
+                with memoryview(buffer) as view:
+                    data = bytes(view[:self.part_size])
+                del buffer[:self.part_size]
+                parts.append(await run_blocking(
+                    _upload_part, key, upload["uploadId"], upload["key"], len(parts) + 1, data, headers, {}
+                ))
+
+        if upload is None:
+            result = await run_blocking(vercel_blob.put, path=key, data=bytes(buffer), options={"access": "public"})
+            return result["url"]
+
+        if buffer:
+            parts.append(await run_blocking(
+                _upload_part, key, upload["uploadId"], upload["key"], len(parts) + 1, bytes(buffer), headers, {}
+            ))
+        result = await run_blocking(_complete_multipart_upload, key, upload["uploadId"], upload["key"], parts, headers, {})
+        return result["url"]
+
+    async def get(self, url: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        headers = {}
+        if start or end is not None:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        response = await run_blocking(requests.get, url, headers=headers, stream=True, timeout=30)
+        try:
+            response.raise_for_status()
+            chunks = response.iter_content(self.read_chunk_size)
+            while True:
+                chunk = await run_blocking(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            response.close()
+
+    async def delete(self, url: str) -> None:
+        await run_blocking(vercel_blob.delete, url)
+
+    async def delete_many(self, urls: List[str]) -> None:
+        # The delete endpoint takes a list of URLs: one round trip per batch
+        await run_blocking(vercel_blob.delete, list(urls))
+
+    async def list(self, cursor: Optional[str] = None, limit: int = 1000) -> Tuple[List[BlobInfo], Optional[str]]:
+        options = {"limit": str(limit)}
+        if cursor:
+            options["cursor"] = cursor
+        page = await run_blocking(vercel_blob.list, options)
+        blobs = [
+            BlobInfo(
+                url=blob["url"],
+                size=blob.get("size", 0),
+                uploaded_at=datetime.fromisoformat(blob["uploadedAt"].replace("Z", "+00:00")),
+            )
+            for blob in page.get("blobs", [])
+        ]
+        return blobs, page.get("cursor") if page.get("hasMore") else None
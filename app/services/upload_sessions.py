@@ -0,0 +1,308 @@
+"""
+Resumable uploads for large files (videos over slow or flaky connections).
+
+A session fixes the file size and the chunk size. The client PUTs numbered
+chunks in any order, each checked against its SHA-256, and may retry one or
+resume after a dropped connection (the session reports which chunks are
+missing). Completing the session streams the staged chunks, one at a time,
+into the final blob and inserts the media row, so the file is never
+buffered whole on either side and no single request carries more than one
+chunk.
+
+Chunks are staged as blobs of their own (uploads/<session>/...). They are
+deleted through the outbox once the session completes, is cancelled or
+expires (resumable_session_ttl after creation).
+
+The first chunk is checked against the declared content type before it is
+staged, so a mislabelled file is refused without being transferred.
+"""
+import hashlib
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException
+
+from ..config import settings
+from ..database import run as _run, write as _write
+from ..utils import validators
+from ..utils.validators import FileInfo
+from . import blob_storage, media_service, outbox
+from .storage import get_storage
+
+# How long a completion may run before another request can take over
+COMPLETE_LEASE_SECONDS = 600.0
+
+def chunk_count(size: int, chunk_size: int) -> int:
+    return -(-size // chunk_size)
+
+def _load(conn, session_id: str):
+    session = conn.execute("SELECT * FROM upload_sessions WHERE id = ?", (session_id,)).fetchone()
+    if session is None or session["expires_at"] <= time.time():
+        raise HTTPException(404, detail="Session d'upload introuvable ou expirée")
+    return session
+
+async def create_session(product_id: str, filename: str, content_type: str, file_type: str, is_thumbnail: bool, size: int, sha256: Optional[str] = None) -> dict:
+    session_id = uuid.uuid4().hex
+    now = time.time()
+
+    def insert(conn):
+        conn.execute(
+            """INSERT INTO upload_sessions (id, product_id, file_name, content_type, file_type, is_thumbnail, size, chunk_size, sha256, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (session_id, product_id, filename, content_type, file_type, 1 if is_thumbnail else 0, size,
+             settings.resumable_chunk_size, sha256.lower() if sha256 else None, now, now + settings.resumable_session_ttl)
+        )
+        outbox.enqueue(conn, "expire_upload", [{"session_id": session_id}], delay=settings.resumable_session_ttl)
+
+    await _write(insert)
+    return await get_session(session_id)
+
+def _read_session(conn, session_id: str):
+    session = _load(conn, session_id)
+    received = {
+        row["idx"]: row["size"]
+        for row in conn.execute("SELECT idx, size FROM upload_chunks WHERE session_id = ?", (session_id,))
+    }
+    return session, received
+
+async def get_session(session_id: str) -> dict:
+    """Session state and progress: received bytes and the chunks still missing."""
+    session, received = await _run(_read_session, session_id)
+    count = chunk_count(session["size"], session["chunk_size"])
+    completed = session["media_id"] is not None
+    return {
+        "id": session["id"],
+        "product_id": session["product_id"],
+        "filename": session["file_name"],
+        "file_type": session["file_type"],
+        "is_thumbnail": bool(session["is_thumbnail"]),
+        "size": session["size"],
+        "chunk_size": session["chunk_size"],
+        "chunk_count": count,
+        "received_bytes": session["size"] if completed else sum(received.values()),
+        "missing_chunks": [] if completed else [i for i in range(count) if i not in received],
+        "media_id": session["media_id"],
+        "expires_at": datetime.fromtimestamp(session["expires_at"], timezone.utc),
+    }
+
+async def put_chunk(session_id: str, index: int, offset: int, checksum: str, body: AsyncIterator[bytes]) -> dict:
+    """
+    Stage chunk `index` from the request body. Re-sending a chunk replaces
+    it; re-sending an identical chunk already stored is a no-op.
+    """
+    checksum = checksum.lower()
+
+    def lookup(conn):
+        session = _load(conn, session_id)
+        existing = conn.execute(
+            "SELECT size, sha256 FROM upload_chunks WHERE session_id = ? AND idx = ?", (session_id, index)
+        ).fetchone()
+        return session, existing
+
+    session, existing = await _run(lookup)
+    if session["media_id"] is not None:
+        raise HTTPException(409, detail="Upload déjà finalisé")
+    if index >= chunk_count(session["size"], session["chunk_size"]):
+        raise HTTPException(400, detail="Numéro de chunk hors limites")
+    if offset != index * session["chunk_size"]:
+        raise HTTPException(400, detail=f"Offset attendu pour le chunk {index}: {index * session['chunk_size']}")
+    expected_size = min(session["chunk_size"], session["size"] - offset)
+    result = {"index": index, "offset": offset, "size": expected_size, "sha256": checksum}
+    if existing is not None and existing["sha256"] == checksum:
+        return result
+
+    digest = hashlib.sha256()
+    received = 0
+    # The head of the file, held back until sniffed (first chunk of a session of known type)
+    head = [] if index == 0 and session["content_type"] else None
+    info = None
+
+    async def checked() -> AsyncIterator[bytes]:
+        nonlocal received, head, info
+        async for data in body:
+            received += len(data)
+            if received > expected_size:
+                raise HTTPException(400, detail=f"Chunk trop long (attendu: {expected_size} octets)")
+            digest.update(data)
+            if head is None:
+                yield data
+                continue
+            head.append(data)
+            if received >= validators.SNIFF_BYTES:
+                data, head = b"".join(head), None
+                info = blob_storage.check_content(data[:validators.SNIFF_BYTES], session["content_type"])
+                yield data
+        if head is not None:
+            data, head = b"".join(head), None
+            info = blob_storage.check_content(data, session["content_type"])
+            yield data
+
+    chunk_url = await blob_storage.put_blob_stream(f"uploads/{session_id}/{index:06d}-{uuid.uuid4().hex[:8]}", checked())
+    error = None
+    if received != expected_size:
+        error = HTTPException(400, detail=f"Chunk incomplet: {received} octets reçus sur {expected_size}")
+    elif digest.hexdigest() != checksum:
+        error = HTTPException(400, detail="Somme de contrôle SHA-256 invalide")
+    if error is not None:
+        await blob_storage.delete_blob(chunk_url)
+        raise error
+
+    def record(conn):
+        session = _load(conn, session_id)
+        if session["media_id"] is not None:
+            raise HTTPException(409, detail="Upload déjà finalisé")
+        replaced = conn.execute(
+            "SELECT file_url FROM upload_chunks WHERE session_id = ? AND idx = ?", (session_id, index)
+        ).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO upload_chunks (session_id, idx, size, sha256, file_url) VALUES (?, ?, ?, ?, ?)",
+            (session_id, index, expected_size, checksum, chunk_url)
+        )
+        if info is not None:
+            conn.execute(
+                "UPDATE upload_sessions SET mime_type = ?, width = ?, height = ? WHERE id = ?",
+                (info.mime_type, info.width, info.height, session_id)
+            )
+        if replaced is not None:
+            media_service.enqueue_blob_deletions(conn, [replaced["file_url"]])
+        return replaced
+
+    try:
+        replaced = await _write(record)
+    except HTTPException:
+        await blob_storage.delete_blob(chunk_url)
+        raise
+    if replaced is not None:
+        outbox.notify()
+    return result
+
+def _discard_chunks(conn, session_ids: List[str]):
+    """Delete the chunk rows of sessions and queue their staged blobs for deletion."""
+    for session_id in session_ids:
+        urls = [row["file_url"] for row in conn.execute(
+            "SELECT file_url FROM upload_chunks WHERE session_id = ?", (session_id,)
+        )]
+        conn.execute("DELETE FROM upload_chunks WHERE session_id = ?", (session_id,))
+        media_service.enqueue_blob_deletions(conn, urls)
+
+async def complete(session_id: str, sha256: Optional[str] = None) -> Tuple[str, str, dict]:
+    """
+    Assemble the staged chunks into the final blob and insert the media.
+    Idempotent: completing a completed session returns the same media.
+    Returns (media_id, file_url, session).
+    """
+    now = time.time()
+
+    def lease(conn):
+        session = _load(conn, session_id)
+        if session["media_id"] is not None:
+            return session, None
+        chunks = conn.execute(
+            "SELECT idx, file_url FROM upload_chunks WHERE session_id = ? ORDER BY idx", (session_id,)
+        ).fetchall()
+        count = chunk_count(session["size"], session["chunk_size"])
+        if len(chunks) < count:
+            received = {row["idx"] for row in chunks}
+            raise HTTPException(409, detail={
+                "message": "Chunks manquants",
+                "missing_chunks": [i for i in range(count) if i not in received],
+            })
+        # Lease the session so a concurrent or retried completion does not assemble it twice
+        if session["completing_until"] is not None and session["completing_until"] > now:
+            raise HTTPException(409, detail="Finalisation déjà en cours")
+        conn.execute(
+            "UPDATE upload_sessions SET completing_until = ? WHERE id = ?", (now + COMPLETE_LEASE_SECONDS, session_id)
+        )
+        return session, chunks
+
+    session, chunks = await _write(lease)
+    if chunks is None:
+        return session["media_id"], session["file_url"], await get_session(session_id)
+
+    blob_url = None
+    try:
+        storage = get_storage()
+        digest = hashlib.sha256()
+
+        async def assembled() -> AsyncIterator[bytes]:
+            # One staged chunk in flight at a time, each streamed in pieces
+            for chunk in chunks:
+                async for data in storage.get(chunk["file_url"]):
+                    digest.update(data)
+                    yield data
+
+        blob_url = await blob_storage.upload_blob_stream(assembled(), os.path.splitext(session["file_name"])[1])
+        content_hash = digest.hexdigest()
+        expected = (sha256 or session["sha256"] or "").lower()
+        if expected and expected != content_hash:
+            raise HTTPException(400, detail="Somme de contrôle SHA-256 du fichier invalide")
+
+        info = FileInfo(session["mime_type"], session["file_type"], session["width"], session["height"]) if session["mime_type"] else None
+
+        def insert(conn) -> Tuple[str, str]:
+            media_id, file_url = media_service.insert_uploaded_media(
+                conn, session["product_id"], session["file_type"], bool(session["is_thumbnail"]),
+                blob_url, session["file_name"], content_hash, info
+            )
+            conn.execute(
+                "UPDATE upload_sessions SET media_id = ?, file_url = ?, completing_until = NULL WHERE id = ?",
+                (media_id, file_url, session_id)
+            )
+            _discard_chunks(conn, [session_id])
+            return media_id, file_url
+
+        media_id, file_url = await _write(insert)
+    except BaseException:
+        # The staged chunks stay, so completion can be retried; shielded, as
+        # a cancelled request (client gone) must still release the lease
+        with anyio.CancelScope(shield=True):
+            await _write(_release_lease(session_id))
+            if blob_url is not None:
+                await blob_storage.delete_blob(blob_url)
+        raise
+    outbox.notify()
+    if session["is_thumbnail"]:
+        media_service.thumbnail_cache.invalidate(session["product_id"])
+    return media_id, file_url, await get_session(session_id)
+
+def _release_lease(session_id: str):
+    def release(conn):
+        conn.execute("UPDATE upload_sessions SET completing_until = NULL WHERE id = ?", (session_id,))
+    return release
+
+async def cancel(session_id: str):
+    def delete(conn):
+        _load(conn, session_id)
+        _discard_chunks(conn, [session_id])
+        conn.execute("DELETE FROM upload_sessions WHERE id = ?", (session_id,))
+
+    await _write(delete)
+    outbox.notify()
+
+@outbox.handler("expire_upload")
+async def _expire_sessions_job(jobs: List[Tuple[int, dict]]) -> Dict[int, str]:
+    """Drop expired sessions and their staged chunks (a completed session keeps its media)."""
+    now = time.time()
+
+    def expire(conn) -> Dict[int, str]:
+        errors = {}
+        expired = []
+        for job_id, payload in jobs:
+            session = conn.execute(
+                "SELECT completing_until FROM upload_sessions WHERE id = ?", (payload["session_id"],)
+            ).fetchone()
+            if session is not None and (session["completing_until"] or 0) > now:
+                errors[job_id] = "Finalisation en cours"
+            else:
+                expired.append(payload["session_id"])
+        _discard_chunks(conn, expired)
+        conn.executemany("DELETE FROM upload_sessions WHERE id = ?", [(session_id,) for session_id in expired])
+        return errors
+
+    errors = await _write(expire)
+    outbox.notify()
+    return errors
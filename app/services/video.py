@@ -0,0 +1,95 @@
+"""
+Video metadata and poster frames, computed by the outbox worker after upload.
+
+Probing reads only what the container needs through ranged storage reads:
+the top-level box headers and the `moov` box for MP4/MOV, the first KBs
+for AVI. The poster frame needs a decoder, so it is extracted with ffmpeg
+when one is installed and skipped otherwise.
+"""
+import os
+import shutil
+import tempfile
+from typing import Optional, Tuple
+
+import anyio
+
+from ..config import settings
+from ..utils import mp4
+from . import renditions
+from .storage import get_storage
+
+AVI_HEADER_BYTES = 64 * 1024
+MAX_TOP_LEVEL_BOXES = 10_000
+# Real moov boxes are a few hundred KB even for long videos; a larger one
+# (or an unsized one running to the end of the file) is not read
+MAX_MOOV_BYTES = 16 * 1024 * 1024
+
+async def _read(url: str, start: int, size: int) -> bytes:
+    data = bytearray()
+    async for chunk in get_storage().get(url, start, start + size):
+        data += chunk
+    return bytes(data)
+
+async def probe(url: str) -> mp4.VideoInfo:
+    """Container metadata of a stored video. Raises ValueError for unsupported or corrupt files."""
+    head = await _read(url, 0, AVI_HEADER_BYTES)
+    if head[:4] == b"RIFF":
+        # the RIFF size field gives the file size without reading further
+        return await renditions.run_in_pool(mp4.parse_avi, head, int.from_bytes(head[4:8], "little") + 8)
+
+    offset = 0
+    moov = None
+    for _ in range(MAX_TOP_LEVEL_BOXES):
+        header = head[offset:offset + 16] if offset + 16 <= len(head) else await _read(url, offset, 16)
+        if len(header) < 8:
+            break
+        size, box_type, header_length = mp4.box_header(header)
+        if box_type == b"moov":
+            # an unsized box is read one byte past the cap, to tell if it exceeds it
+            payload_size = size - header_length if size else MAX_MOOV_BYTES + 1
+            if size and payload_size > MAX_MOOV_BYTES:
+                raise ValueError("moov box too large")
+            moov = await _read(url, offset + header_length, payload_size)
+            if len(moov) > MAX_MOOV_BYTES:
+                raise ValueError("moov box too large")
+            if not size:
+                offset += header_length + len(moov)
+                break
+        if size == 0 or size < header_length:
+            break
+        offset += size
+    if moov is None:
+        raise ValueError("no moov box: not an MP4/QuickTime file")
+    return await renditions.run_in_pool(mp4.parse_moov, moov, offset)
+
+def ffmpeg_path() -> Optional[str]:
+    if not settings.video_poster_enabled:
+        return None
+    return shutil.which(settings.ffmpeg_path)
+
+async def poster_frame(url: str, at: float) -> Optional[Tuple[bytes, str]]:
+    """
+    JPEG frame of a stored video at `at` seconds, as (data, format), or None
+    when no ffmpeg is available or it cannot decode the video in time.
+    """
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source")
+        with open(source, "wb") as f:
+            async for chunk in get_storage().get(url):
+                await anyio.to_thread.run_sync(f.write, chunk)
+        try:
+            # A crafted file can keep ffmpeg decoding; it is killed on timeout
+            with anyio.fail_after(settings.video_poster_timeout):
+                result = await anyio.run_process(
+                    [ffmpeg, "-v", "error", "-ss", f"{at:.3f}", "-i", source,
+                     "-frames:v", "1", "-f", "image2pipe", "-vcodec", "mjpeg", "-q:v", "3", "-"],
+                    check=False,
+                )
+        except TimeoutError:
+            return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result.stdout, "jpeg"
@@ -0,0 +1,112 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+
+class DiskLRUCache:
+    """
+    Files under `root` with a total size budget, evicted least-recently-used
+    first. Keys must be safe file names (e.g. hex digests).
+
+    The LRU index lives in memory and is rebuilt from the directory (by
+    access time) at startup. Entries are written to a temp file and renamed,
+    so readers never see a partial file; several processes may share the
+    directory, each evicting by its own view of recency.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(os.path.join(self.root, ".tmp"), exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                files.append((stat.st_atime, entry.name, stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._bytes += size
+        self._evict()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def read(self, key: str) -> Optional[bytes]:
+        """
+        Content of the cached file, or None. Read through one open file, so
+        an eviction (by this or another process) cannot remove it mid-read.
+        """
+        path = self.path_for(key)
+        with self._lock:
+            known = key in self._entries
+            if known:
+                self._entries.move_to_end(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            if known:
+                with self._lock:
+                    self._bytes -= self._entries.pop(key, 0)
+            self.misses += 1
+            return None
+        if not known:
+            # written by another process sharing the directory
+            self._track(key, len(data))
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> str:
+        if len(data) > self.max_bytes:
+            raise ValueError("entry larger than the cache")
+        tmp_path = os.path.join(self.root, ".tmp", uuid.uuid4().hex)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        path = self.path_for(key)
+        os.replace(tmp_path, path)
+        self._track(key, len(data))
+        return path
+
+    def _track(self, key: str, size: int):
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._bytes += size
+        self._evict()
+
+    def _evict(self):
+        while True:
+            with self._lock:
+                if self._bytes <= self.max_bytes or not self._entries:
+                    return
+                key, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+            try:
+                os.unlink(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
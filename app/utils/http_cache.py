@@ -0,0 +1,35 @@
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+# Part of every version ETag: bump when the JSON representation changes
+REPRESENTATION_VERSION = 1
+
+
+def version_headers(version: int, updated_at: float, cache_control: str) -> dict:
+    """
+    Validators of a versioned resource. The update time is part of the ETag,
+    so a recreated database (version counters restarting) never reuses one.
+    """
+    return {
+        "ETag": f'"{REPRESENTATION_VERSION}-{version}-{int(updated_at * 1000):x}"',
+        "Last-Modified": formatdate(updated_at, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+
+
+def not_modified(headers: dict, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """
+    Whether a conditional GET can be answered 304, given the response's
+    ETag and, if it has one, Last-Modified (as from version_headers()).
+    If-None-Match takes precedence and uses the weak comparison (a CDN may
+    weaken the ETag when compressing), as in RFC 9110.
+    """
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or headers["ETag"] in tags
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(headers.get("Last-Modified")) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False  # no Last-Modified, unparsable or without a time zone
+    return False
@@ -0,0 +1,168 @@
+"""
+Pure-Python container metadata for MP4/QuickTime (ISO BMFF boxes, "atoms")
+and AVI (RIFF), enough to learn duration, resolution, codecs and bitrate
+without decoding anything.
+
+For MP4/MOV only the top-level box headers and the `moov` box are needed;
+`moov` may sit before or after the media data (`mdat`).
+"""
+import struct
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+
+class VideoInfo(NamedTuple):
+    duration: Optional[float]  # seconds
+    width: Optional[int]  # displayed (rotation applied)
+    height: Optional[int]
+    video_codec: Optional[str]  # sample entry / FourCC, e.g. avc1, hvc1, H264
+    audio_codec: Optional[str]
+    bitrate: Optional[int]  # bits per second, whole file
+
+
+def box_header(data: bytes, offset: int = 0) -> Tuple[int, bytes, int]:
+    """(box size, type, header length) of the box starting at offset. Size 0 means "to the end"."""
+    size, box_type = struct.unpack_from(">I4s", data, offset)
+    if size == 1:
+        size = struct.unpack_from(">Q", data, offset + 8)[0]
+        return size, box_type, 16
+    return size, box_type, 8
+
+
+def iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload start, payload end) of the boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type, header = box_header(data, offset)
+        box_end = end if size == 0 else offset + size
+        if size and size < header or box_end > end:
+            break  # truncated or corrupt
+        yield box_type, offset + header, box_end
+        offset = box_end
+
+
+def _find(data: bytes, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    for found_type, payload_start, payload_end in iter_boxes(data, start, end):
+        if found_type == box_type:
+            return payload_start, payload_end
+    return None
+
+
+def _path(data: bytes, start: int, end: int, *path: bytes) -> Optional[Tuple[int, int]]:
+    span = (start, end)
+    for box_type in path:
+        span = _find(data, span[0], span[1], box_type)
+        if span is None:
+            return None
+    return span
+
+
+def _time(data: bytes, start: int) -> Tuple[int, int]:
+    """(timescale, duration) of a version 0/1 mvhd or mdhd payload."""
+    if data[start] == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, start + 12)
+    return timescale, duration
+
+
+def _fourcc(raw: bytes) -> Optional[str]:
+    return raw.decode("latin-1").strip().strip("\x00") or None
+
+
+def parse_moov(moov: bytes, file_size: Optional[int] = None) -> VideoInfo:
+    """Metadata from the payload of a `moov` box."""
+    duration = None
+    mvhd = _find(moov, 0, len(moov), b"mvhd")
+    if mvhd:
+        timescale, ticks = _time(moov, mvhd[0])
+        # 0 (fragmented files) and all-ones mean unknown
+        if timescale and ticks and ticks not in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+            duration = ticks / timescale
+
+    width = height = video_codec = audio_codec = None
+    for box_type, start, end in iter_boxes(moov):
+        if box_type != b"trak":
+            continue
+        hdlr = _path(moov, start, end, b"mdia", b"hdlr")
+        stsd = _path(moov, start, end, b"mdia", b"minf", b"stbl", b"stsd")
+        if not hdlr or not stsd:
+            continue
+        handler = moov[hdlr[0] + 8:hdlr[0] + 12]
+        # stsd: version/flags, entry count, then sample entries (size, format, ...)
+        entry = stsd[0] + 8
+        codec = _fourcc(moov[entry + 4:entry + 8]) if entry + 8 <= stsd[1] else None
+
+        if handler == b"vide" and video_codec is None:
+            video_codec = codec
+            tkhd = _find(moov, start, end, b"tkhd")
+            if tkhd and tkhd[1] - tkhd[0] >= 84:
+                # matrix (9 x 32 bits) and 16.16 fixed-point width/height end the box
+                a, b = struct.unpack_from(">ii", moov, tkhd[1] - 44)
+                w, h = struct.unpack_from(">II", moov, tkhd[1] - 8)
+                width, height = w >> 16, h >> 16
+                if a == 0 and abs(b) == 0x10000:  # rotated by 90 or 270 degrees
+                    width, height = height, width
+            if not width and entry + 36 <= stsd[1]:
+                # visual sample entry: 24 bytes after the entry header, then width/height
+                width, height = struct.unpack_from(">HH", moov, entry + 32)
+        elif handler == b"soun" and audio_codec is None:
+            audio_codec = codec
+
+        if duration is None:
+            mdhd = _path(moov, start, end, b"mdia", b"mdhd")
+            if mdhd:
+                timescale, ticks = _time(moov, mdhd[0])
+                if timescale and ticks:
+                    duration = ticks / timescale
+
+    bitrate = int(file_size * 8 / duration) if file_size and duration else None
+    return VideoInfo(duration, width or None, height or None, video_codec, audio_codec, bitrate)
+
+
+def parse_avi(head: bytes, file_size: Optional[int] = None) -> VideoInfo:
+    """Metadata from the start of an AVI file (the `hdrl` list, normally in the first KBs)."""
+    if head[:4] != b"RIFF" or head[8:12] != b"AVI ":
+        raise ValueError("not an AVI file")
+    duration = width = height = video_codec = audio_codec = None
+    offset = 12
+    # RIFF chunks: fourcc, little-endian size, payload padded to even length
+    hdrl_end = None
+    while offset + 8 <= len(head):
+        fourcc, size = struct.unpack_from("<4sI", head, offset)
+        if fourcc == b"LIST" and head[offset + 8:offset + 12] == b"hdrl":
+            hdrl_end = min(offset + 8 + size, len(head))
+            offset += 12
+            break
+        offset += 8 + size + (size & 1)
+    if hdrl_end is None:
+        raise ValueError("AVI header not found")
+
+    stream_type = None
+    while offset + 8 <= hdrl_end:
+        fourcc, size = struct.unpack_from("<4sI", head, offset)
+        payload = offset + 8
+        if fourcc == b"LIST":
+            offset += 12  # descend into strl
+            continue
+        if fourcc == b"avih" and payload + 40 <= hdrl_end:
+            usec_per_frame, = struct.unpack_from("<I", head, payload)
+            total_frames, = struct.unpack_from("<I", head, payload + 16)
+            width, height = struct.unpack_from("<II", head, payload + 32)
+            if usec_per_frame:
+                duration = total_frames * usec_per_frame / 1_000_000
+        elif fourcc == b"strh" and payload + 8 <= hdrl_end:
+            stream_type, handler = head[payload:payload + 4], head[payload + 4:payload + 8]
+            if stream_type == b"vids" and video_codec is None:
+                video_codec = _fourcc(handler)
+        elif fourcc == b"strf" and payload + 20 <= hdrl_end:
+            if stream_type == b"vids":
+                # BITMAPINFOHEADER.biCompression is the actual codec
+                video_codec = _fourcc(head[payload + 16:payload + 20]) or video_codec
+            elif stream_type == b"auds" and audio_codec is None:
+                tag, = struct.unpack_from("<H", head, payload)
+                audio_codec = f"0x{tag:04x}"
+        offset = payload + size + (size & 1)
+
+    bitrate = int(file_size * 8 / duration) if file_size and duration else None
+    return VideoInfo(duration, width or None, height or None, video_codec, audio_codec, bitrate)
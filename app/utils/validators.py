@@ -0,0 +1,86 @@
+"""
+Signature-based detection of the accepted upload formats.
+
+sniff() only looks at the head of a file, so an upload can be checked
+against its declared Content-Type on the first chunk read, before anything
+is transferred to blob storage. Pixel dimensions come for free from the
+same bytes for PNG, GIF and AVI (fixed header offsets) and for JPEG when
+its frame header falls within the head (it follows the APP segments, which
+stay below SNIFF_BYTES unless an EXIF block carries a large preview).
+MP4/QuickTime dimensions sit in `moov`, often at the end of the file; the
+probe_video job reads them later.
+"""
+import struct
+from typing import NamedTuple, Optional
+
+# Bytes of the head read before deciding: the largest JPEG APP segment
+SNIFF_BYTES = 64 * 1024
+
+# Box types a QuickTime file may start with when it has no `ftyp`
+_QUICKTIME_BOXES = {b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"}
+
+# JPEG start-of-frame markers (SOF0-SOF15 except DHT, JPG and DAC)
+_JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# Declared types that share a container and are told apart by brand only
+_EQUIVALENT = {"video/quicktime": "video/mp4"}
+
+
+class FileInfo(NamedTuple):
+    mime_type: str
+    file_type: str  # image | video
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+def _jpeg_size(head: bytes):
+    offset = 2
+    while offset + 4 <= len(head):
+        if head[offset] != 0xFF:
+            return None
+        marker = head[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # no length field
+            offset += 2
+            continue
+        if marker in _JPEG_SOF:
+            if offset + 9 > len(head):
+                return None
+            height, width = struct.unpack_from(">HH", head, offset + 5)
+            return width, height
+        offset += 2 + struct.unpack_from(">H", head, offset + 2)[0]
+    return None
+
+
+def sniff(head: bytes) -> Optional[FileInfo]:
+    """The format of a file from its first bytes, or None if it is not one of the accepted ones."""
+    if head[:3] == b"\xff\xd8\xff":
+        size = _jpeg_size(head)
+        return FileInfo("image/jpeg", "image", *(size or (None, None)))
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        if head[12:16] == b"IHDR" and len(head) >= 24:
+            return FileInfo("image/png", "image", *struct.unpack_from(">II", head, 16))
+        return FileInfo("image/png", "image")
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        if len(head) >= 10:
+            return FileInfo("image/gif", "image", *struct.unpack_from("<HH", head, 6))
+        return FileInfo("image/gif", "image")
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        # RIFF AVI: LIST hdrl, whose first chunk is the main header (avih)
+        if head[24:28] == b"avih" and len(head) >= 72:
+            return FileInfo("video/x-msvideo", "video", *struct.unpack_from("<II", head, 64))
+        return FileInfo("video/x-msvideo", "video")
+    if head[4:8] == b"ftyp":
+        return FileInfo("video/quicktime" if head[8:12] == b"qt  " else "video/mp4", "video")
+    if head[4:8] in _QUICKTIME_BOXES:
+        return FileInfo("video/quicktime", "video")
+    return None
+
+
+def matches(info: Optional[FileInfo], content_type: str) -> bool:
+    """Whether the sniffed format is the declared one (MP4 and QuickTime are interchangeable)."""
+    if info is None:
+        return False
+    return _EQUIVALENT.get(info.mime_type, info.mime_type) == _EQUIVALENT.get(content_type, content_type)
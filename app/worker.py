@@ -0,0 +1,47 @@
+"""
+Outbox worker as a separate process, for deployments where the API process
+does not run it (serverless, or outbox_worker_enabled=false).
+
+    python -m app.worker            run forever
+    python -m app.worker --once     process the due jobs, then exit
+    python -m app.worker --stats    print queue depth and lag as JSON
+    python -m app.worker --backfill queue renditions / video metadata of
+                                    media stored before they existed
+    python -m app.worker --gc-orphans [--dry-run]
+                                    delete blobs no row references, print
+                                    the report (bytes reclaimed) as JSON
+"""
+import argparse
+import asyncio
+import json
+
+from .database import init_db
+from .services import blob_gc, media_service, outbox, upload_sessions  # register the job handlers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scena outbox worker")
+    parser.add_argument("--once", action="store_true", help="process the due jobs, then exit")
+    parser.add_argument("--stats", action="store_true", help="print queue depth and lag, then exit")
+    parser.add_argument("--backfill", action="store_true", help="queue post-upload processing of media that never got it, then exit")
+    parser.add_argument("--gc-orphans", action="store_true", help="delete blobs no row references, then exit")
+    parser.add_argument("--dry-run", action="store_true", help="with --gc-orphans: report the orphans without deleting them")
+    parser.add_argument("--grace", type=float, help="with --gc-orphans: minimum blob age in seconds (default orphan_gc_grace_period)")
+    args = parser.parse_args()
+
+    init_db()
+    if args.stats:
+        print(json.dumps(outbox.stats(), indent=2))
+    elif args.backfill:
+        print(f"{media_service.enqueue_missing_processing()} blobs queued for processing")
+    elif args.gc_orphans:
+        print(json.dumps(asyncio.run(blob_gc.collect_orphans(dry_run=args.dry_run, grace_period=args.grace)), indent=2))
+    elif args.once:
+        succeeded, failed = asyncio.run(outbox.drain())
+        print(f"{succeeded} jobs done, {failed} failed (rescheduled)")
+    else:
+        asyncio.run(outbox.run_worker())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Local stand-in for the ARIA auth service, for benchmarks and manual tests.
+
+GET /validate answers a ValidationResult for the bearer token: tokens
+starting with "invalid" get a 401, "admin-..." tokens carry the admin role,
+and every other token is valid for TTL seconds. Each answer waits LATENCY
+seconds, like the remote service would.
+
+    python -m benchmarks.aria_stub [PORT] [LATENCY_MS]
+
+then run the API with AUTH_MODE=aria ARIA_URL=http://127.0.0.1:PORT.
+"""
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TTL = 3600.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so the client pool is exercised
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        time.sleep(server.latency)
+        token = self.headers.get("Authorization", "").partition(" ")[2]
+        if self.path != "/validate":
+            status, body = 404, {"detail": "Not Found"}
+        elif not token or token.startswith("invalid"):
+            status, body = 401, {"valid": False}
+        else:
+            status, body = 200, {
+                "valid": True,
+                "userId": token.split("-")[-1],
+                "email": f"{token.split('-')[-1]}@example.com",
+                "roles": ["admin"] if token.startswith("admin") else [],
+                "expiresAt": (datetime.now(timezone.utc) + timedelta(seconds=TTL)).isoformat(),
+            }
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int = 0, latency: float = 0.05) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread; its URL is server.url, its request count server.requests."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.requests = 0
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8001
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 50 / 1000
+    server = serve(port, latency)
+    print(f"ARIA stub on {server.url} ({latency * 1000:.0f} ms per validation)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Cost of authentication per request: the same authenticated request with
+auth_mode off, aria (token cached) and jwt (token cached), and what a cache
+miss costs against the local ARIA stub (benchmarks/aria_stub.py) with a
+simulated round trip. Also checks that concurrent requests with a new token
+share one validation. Requires httpx.
+
+The request is PUT /thumbnail for a missing media: authentication, one
+primary key lookup, 404.
+
+    python -m benchmarks.auth_overhead [LATENCY_MS]
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from app.config import settings
+
+from .aria_stub import serve
+
+REQUESTS = 2000
+CONCURRENT = 100
+SECRET = "benchmark-secret"
+
+
+def _jwt(sub: str) -> str:
+    def encode(data) -> str:
+        raw = data if isinstance(data, bytes) else json.dumps(data).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    signed = f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode({'sub': sub, 'exp': time.time() + 3600})}"
+    return f"{signed}.{encode(hmac.new(SECRET.encode(), signed.encode(), hashlib.sha256).digest())}"
+
+
+async def _latencies(client, token, count=REQUESTS) -> list:
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.put("/thumbnail", params={"id_media": "missing"}, headers=headers)
+        samples.append((time.perf_counter() - start) * 1e6)
+        assert response.status_code == 404, response.text
+    return samples
+
+
+async def _main(latency: float):
+    from app.main import app
+    from app.services import auth
+
+    stub = serve(latency=latency)
+    settings.aria_url = stub.url
+    settings.jwt_secret = SECRET
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {}
+        for mode, token in (("off", None), ("aria", "user-42"), ("jwt", _jwt("42"))):
+            settings.auth_mode = mode
+            auth.cache.clear()
+            await _latencies(client, token, 50)  # warm up, fills the cache
+            results[mode] = statistics.median(await _latencies(client, token))
+
+        print(f"PUT /thumbnail (404), median of {REQUESTS} requests:")
+        for mode, median in results.items():
+            extra = "" if mode == "off" else f"   ({median - results['off']:+.1f} us vs off)"
+            print(f"  auth {mode:5}: {median:8.1f} us{extra}")
+
+        settings.auth_mode = "aria"
+        auth.cache.clear()
+        miss = await _latencies(client, "user-cold", 1)
+        print(f"\ncache miss against ARIA ({latency * 1000:.0f} ms round trip): {miss[0] / 1000:.1f} ms")
+
+        before = stub.requests
+        headers = {"Authorization": "Bearer user-burst"}
+        await asyncio.gather(*(
+            client.put("/thumbnail", params={"id_media": "missing"}, headers=headers) for _ in range(CONCURRENT)
+        ))
+        print(f"{CONCURRENT} concurrent requests with a new token: {stub.requests - before} ARIA call(s)")
+    stub.shutdown()
+
+
+def main():
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 50 / 1000
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    settings.outbox_worker_enabled = False
+    settings.metrics_enabled = False
+    asyncio.run(_main(latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Read latency while slow blob uploads are in flight.
+
+Blob PUTs are faked with a blocking sleep (a slow network round trip). The same
+mixed workload runs twice: once with blob calls made inline on the event loop
+(the old behaviour) and once through the bounded thread offload. Requires httpx.
+Run from a scratch directory (it creates media.db there):
+
+    python -m benchmarks.blob_event_loop
+"""
+import asyncio
+import io
+import statistics
+import time
+
+import httpx
+
+from app.services.storage import vercel
+
+UPLOAD_LATENCY = 0.5  # seconds per blob PUT
+UPLOADS = 8
+READS = 200
+READ_INTERVAL = 0.005
+
+
+def _slow_put(path, data, options=None):
+    time.sleep(UPLOAD_LATENCY)
+    return {"url": f"https://blob.test/{path}"}
+
+
+async def _inline(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+async def _workload(client: httpx.AsyncClient) -> list:
+    async def upload(i):
+        files = {"file": (f"{i}.jpg", io.BytesIO(b"\xff\xd8\xff" + b"x" * 4093), "image/jpeg")}
+        await client.post("/upload", data={"product_id": "bench"}, files=files)
+
+    async def reads():
+        # Latency is measured from each read's scheduled start so time spent
+        # waiting for a blocked loop is counted (no coordinated omission).
+        latencies = []
+        origin = time.perf_counter()
+        for i in range(READS):
+            scheduled = origin + i * READ_INTERVAL
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            await client.get("/thumbnail", params={"id_product": "bench"})
+            latencies.append(time.perf_counter() - scheduled)
+        return latencies
+
+    results = await asyncio.gather(reads(), *(upload(i) for i in range(UPLOADS)))
+    return results[0]
+
+
+async def _run(label: str):
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        latencies = await _workload(client)
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:>10}: read p50={p50:7.1f}ms p99={p99:7.1f}ms wall={elapsed:5.2f}s")
+
+
+def main():
+    vercel.vercel_blob.put = _slow_put
+    offload = vercel.run_blocking
+
+    vercel.run_blocking = _inline
+    asyncio.run(_run("inline"))
+
+    vercel.run_blocking = offload
+    asyncio.run(_run("offloaded"))
+
+
+if __name__ == "__main__":
+    main()
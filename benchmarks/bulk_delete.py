@@ -0,0 +1,101 @@
+"""
+DELETE /media/all for products with 10, 100 and 1000 media: request latency
+(DB commit + outbox enqueue) and the time the outbox worker then takes to
+delete the blobs.
+
+The memory storage backend is given a fixed round trip per request to mimic
+a remote blob store. Blob deletion strategies compared:
+  serial      one delete request after the other
+  concurrent  per-URL deletes, blob_max_concurrency in flight
+  batch       backend batch delete, blob_delete_batch_size URLs per request
+Requires httpx.
+
+    python -m benchmarks.bulk_delete
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from app.config import settings
+
+SIZES = (10, 100, 1000)
+ROUND_TRIP = 0.02  # seconds per storage request
+
+
+def _seed(storage, product: str, count: int):
+    from app.database import get_db
+
+    rows = []
+    for i in range(count):
+        url = f"{storage.public_url}/{product}-{i}.jpg"
+        storage.blobs[url] = (b"x", None)
+        rows.append((f"{product}-{i}", product, f"{i}.jpg", url, f"{product}-{i}"))
+    with get_db() as conn:
+        conn.executemany(
+            "INSERT INTO medias (id, product_id, file_name, file_url, file_type, content_hash) VALUES (?, ?, ?, ?, 'image', ?)",
+            rows,
+        )
+        conn.commit()
+
+
+def _configure(storage, mode: str, concurrency: int):
+    async def delete(url):
+        await asyncio.sleep(ROUND_TRIP)
+        storage.blobs.pop(url, None)
+
+    async def delete_many(urls):
+        await asyncio.sleep(ROUND_TRIP)
+        for url in urls:
+            storage.blobs.pop(url, None)
+
+    storage.delete = delete
+    if mode == "batch":
+        storage.delete_many = delete_many
+    elif hasattr(storage, "delete_many"):
+        del storage.delete_many
+    # serial = one request in flight at a time
+    settings.blob_max_concurrency = 1 if mode == "serial" else concurrency
+
+
+async def _main():
+    from app.main import app
+    from app.services import outbox
+    from app.services.storage import get_storage
+
+    storage = get_storage()
+    concurrency = settings.blob_max_concurrency
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'items':>6} {'request':>10}   blob deletion: {'serial':>10} {'concurrent':>12} {'batch':>10}")
+        for size in SIZES:
+            requests, drains = [], []
+            for mode in ("serial", "concurrent", "batch"):
+                product = f"{mode}-{size}"
+                _seed(storage, product, size)
+                _configure(storage, mode, concurrency)
+                start = time.perf_counter()
+                response = await client.delete("/media/all", params={"id_product": product})
+                requests.append((time.perf_counter() - start) * 1000)
+                assert response.json()["queued_blob_deletions"] == size, response.json()
+                start = time.perf_counter()
+                succeeded, failed = await outbox.drain()
+                drains.append((time.perf_counter() - start) * 1000)
+                assert succeeded == size and not failed and not storage.blobs
+            print(f"{size:>6} {max(requests):>7.1f} ms                  " + " ".join(f"{t:>9.1f} ms" for t in drains))
+
+
+def main():
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    settings.outbox_batch_size = 1000
+    from app.database import init_db
+
+    init_db()
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Cold start of the serverless entry point: each sample is a fresh Python
+process that imports `main` (what Vercel loads, see vercel.json) and serves
+its first requests in process, straight through the ASGI interface.
+
+Reported per sample, median over RUNS processes:
+- import: `import main`, app construction included
+- first request: GET /thumbnail on the new process (pool, schema, first query)
+- steady request: the same request again
+- process to first response: wall time seen by the parent, interpreter
+  startup included
+
+"empty /tmp" starts each process on a database that does not exist yet
+(a new serverless container); "existing db" reuses one already migrated.
+
+    python -m benchmarks.cold_start [RUNS]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RUNS = 15
+
+
+async def _get(app, path: str, query: str) -> int:
+    """One GET straight through the ASGI interface (no HTTP client to import). Returns the status."""
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "headers": [(b"host", b"cold")],
+        "client": ("127.0.0.1", 1), "server": ("cold", 80),
+    }
+    await app(scope, receive, send)
+    return status
+
+
+def _child():
+    import asyncio
+
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    async def requests():
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            # Served by both entry points before they were merged; 404 on an empty catalog
+            status = await _get(main.app, "/thumbnail", "id_product=p1")
+            assert status in (200, 404), status
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    first, steady = asyncio.run(requests())
+    print(json.dumps({"import": imported - started, "first": first, "steady": steady}), flush=True)
+
+
+def _sample(database: str) -> dict:
+    env = dict(os.environ, DATABASE_PATH=database, STORAGE_BACKEND="memory", OUTBOX_WORKER_ENABLED="false")
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child"],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - start
+    return result
+
+
+def _report(label: str, samples: list):
+    print(f"{label}:")
+    for key, name in (("import", "import main"), ("first", "first request"), ("steady", "steady request"),
+                      ("process", "process to first response")):
+        print(f"  {name:<27}{statistics.median(s[key] for s in samples) * 1000:8.1f} ms")
+
+
+def main():
+    if sys.argv[1:] == ["--child"]:
+        _child()
+        return
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else RUNS
+    directory = tempfile.mkdtemp()
+    empty = [_sample(os.path.join(directory, f"cold-{n}.db")) for n in range(runs)]
+    existing_db = os.path.join(directory, "existing.db")
+    _sample(existing_db)
+    existing = [_sample(existing_db) for _ in range(runs)]
+    print(f"median of {runs} processes")
+    _report("empty /tmp", empty)
+    _report("existing db", existing)
+
+
+if __name__ == "__main__":
+    main()
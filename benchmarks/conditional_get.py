@@ -0,0 +1,130 @@
+"""
+Replay of storefront reads against GET /media/ and GET /thumbnail, with
+clients that ignore validators vs clients that revalidate with the ETag
+they got last (If-None-Match, as browsers and CDNs do).
+
+Products are requested with a Zipf-like popularity; a small share of the
+trace are uploads, which change the product's version so the next read
+of it is a full 200 again. Reported per mode: SQL statements executed (and
+how many read medias rows), response body bytes and wall time. Requires
+httpx.
+
+    python -m benchmarks.conditional_get [REQUESTS]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+from app.config import settings
+
+PRODUCTS = 500
+MEDIAS_PER_PRODUCT = 20
+WRITE_SHARE = 0.02  # of the trace
+
+
+def _seed():
+    from app.database import get_db, init_db
+
+    init_db()
+    with get_db() as conn:
+        conn.executemany(
+            "INSERT INTO medias (id, product_id, file_name, file_url, file_type, is_thumbnail) VALUES (?, ?, ?, ?, 'image', ?)",
+            [
+                (f"m{p}-{i}", f"p{p}", f"{i}.jpg", f"https://blob.test/p{p}/{i}.jpg", 1 if i == 0 else 0)
+                for p in range(PRODUCTS) for i in range(MEDIAS_PER_PRODUCT)
+            ],
+        )
+        conn.commit()
+
+
+def _count_statements():
+    """Count the SQL statements run on every pooled connection (including trigger bodies)."""
+    from app import database
+
+    counter = {"statements": 0, "row_reads": 0}
+    connect = database.get_db_connection
+
+    def traced():
+        conn = connect()
+
+        def trace(sql):
+            counter["statements"] += 1
+            counter["row_reads"] += "FROM medias" in sql
+        conn.set_trace_callback(trace)
+        return conn
+
+    database.get_db_connection = traced
+    return counter
+
+
+def _trace(requests: int):
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(PRODUCTS)]
+    products = rng.choices(range(PRODUCTS), weights, k=requests)
+    return [
+        ("upload" if rng.random() < WRITE_SHARE else rng.choice(("media", "thumbnail")), f"p{p}")
+        for p in products
+    ]
+
+
+async def _replay(client, trace, conditional: bool, counter):
+    etags = {}
+    reads = not_modified = body_bytes = 0
+    counter["statements"] = counter["row_reads"] = 0
+    start = time.perf_counter()
+    for i, (kind, product) in enumerate(trace):
+        if kind == "upload":
+            response = await client.post(
+                "/media/upload",
+                data={"product_id": product},
+                files={"file": ("new.jpg", b"\xff\xd8\xff" + f"{conditional}-{i}".encode(), "image/jpeg")},
+            )
+            response.raise_for_status()
+            continue
+        url, params = ("/media/", {"id_product": product}) if kind == "media" else ("/thumbnail", {"id_product": product})
+        headers = {"If-None-Match": etags[url, product]} if conditional and (url, product) in etags else {}
+        response = await client.get(url, params=params, headers=headers)
+        reads += 1
+        body_bytes += len(response.content)
+        if response.status_code == 304:
+            not_modified += 1
+        else:
+            response.raise_for_status()
+            etags[url, product] = response.headers["ETag"]
+    elapsed = time.perf_counter() - start
+    label = "If-None-Match" if conditional else "unconditional"
+    print(
+        f"{label:>14}: {reads} reads, {not_modified:5d} x 304, {counter['statements']:6d} SQL statements "
+        f"({counter['row_reads']:5d} reading medias), "
+        f"{body_bytes / 1024 / 1024:7.2f} MB of bodies, {elapsed:6.2f} s"
+    )
+
+
+async def _main(requests: int, counter):
+    from app.main import app
+
+    trace = _trace(requests)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for conditional in (False, True):
+            await _replay(client, trace, conditional, counter)
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    settings.outbox_worker_enabled = False
+    settings.rendition_widths = []  # no render jobs for the fake uploads
+    counter = _count_statements()
+    _seed()
+    asyncio.run(_main(requests, counter))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Cost of content sniffing: sniff() on the head of each accepted format, and
+the hash pass of an upload with and without the check on its first chunk.
+The sniff only reads bytes the hash pass has already read, so the second
+figure is the whole overhead per upload.
+
+    python -m benchmarks.content_sniff [SIZE_KB]
+"""
+import asyncio
+import hashlib
+import io
+import os
+import struct
+import sys
+import timeit
+
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from app.services import blob_storage
+from app.utils import validators
+
+RUNS = 20
+
+
+def _heads() -> dict:
+    # JPEG with a 20 KB EXIF block before its frame header, as phones write them
+    exif = b"\xff\xe1" + struct.pack(">H", 20 * 1024) + b"\0" * (20 * 1024 - 2)
+    sof = b"\xff\xc0\x00\x11\x08" + struct.pack(">HH", 3024, 4032) + b"\0" * 10
+    avih = b"avih" + struct.pack("<I", 56) + struct.pack("<10I", 33333, 0, 0, 0, 300, 0, 1, 0, 1920, 1080)
+    return {
+        "image/jpeg": b"\xff\xd8" + exif + sof,
+        "image/png": b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 2048, 2048) + b"\x08\x06\0\0\0",
+        "image/gif": b"GIF89a" + struct.pack("<HH", 640, 480),
+        "video/mp4": struct.pack(">I4s4s", 24, b"ftyp", b"isom") + b"\0" * 12,
+        "video/quicktime": struct.pack(">I4s4s", 20, b"ftyp", b"qt  ") + b"\0" * 8,
+        "video/x-msvideo": b"RIFF" + struct.pack("<I", 0) + b"AVI LIST" + struct.pack("<I", 0) + b"hdrl" + avih,
+    }
+
+
+def _upload(content: bytes, content_type: str) -> UploadFile:
+    return UploadFile(io.BytesIO(content), size=len(content), filename="f", headers=Headers({"content-type": content_type}))
+
+
+async def _hash_only(file: UploadFile):
+    digest = hashlib.sha256()
+    async for chunk in blob_storage.iter_upload(file):
+        digest.update(chunk)
+    await file.seek(0)
+    return digest.hexdigest()
+
+
+def _time_pass(func, file: UploadFile) -> float:
+    samples = []
+    for _ in range(RUNS):
+        samples.append(timeit.timeit(lambda: asyncio.run(func(file)), number=1))
+    return min(samples)
+
+
+def main():
+    size = int(sys.argv[1]) * 1024 if len(sys.argv) > 1 else 5 * 1024 * 1024
+    print("sniff() per format:")
+    for content_type, head in _heads().items():
+        head = head + os.urandom(validators.SNIFF_BYTES - len(head))
+        info = validators.sniff(head)
+        assert validators.matches(info, content_type), (content_type, info)
+        runs = 100_000
+        elapsed = timeit.timeit(lambda: validators.sniff(head), number=runs)
+        print(f"  {content_type:16} {elapsed / runs * 1e6:6.2f} us   {info.width}x{info.height}")
+
+    content = _heads()["image/jpeg"] + os.urandom(size)
+    file = _upload(content, "image/jpeg")
+    plain = _time_pass(_hash_only, file)
+    checked = _time_pass(lambda f: blob_storage.inspect_upload(f, "image/jpeg"), file)
+    print(f"\nhash pass over {size // 1024} KB: {plain * 1000:.2f} ms plain, {checked * 1000:.2f} ms with sniffing "
+          f"({(checked - plain) * 1e6:+.0f} us)")
+
+    garbage = _upload(os.urandom(size), "image/jpeg")
+    rejected = _time_pass(_rejected, garbage)
+    print(f"garbage labelled image/jpeg rejected after the first chunk: {rejected * 1000:.2f} ms")
+
+
+async def _rejected(file: UploadFile):
+    await file.seek(0)
+    try:
+        await blob_storage.inspect_upload(file, "image/jpeg")
+    except Exception:
+        return
+    raise AssertionError("garbage accepted")
+
+
+if __name__ == "__main__":
+    main()
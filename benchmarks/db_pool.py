@@ -0,0 +1,57 @@
+"""
+Cost of obtaining a connection and running the GET /thumbnail query:
+a fresh sqlite3.connect + PRAGMA per request (old behaviour) vs the pool.
+
+    python -m benchmarks.db_pool
+"""
+import os
+import sqlite3
+import tempfile
+import time
+
+from app.config import settings
+
+ITERATIONS = 5000
+QUERY = """SELECT id, product_id, file_name, file_url, file_type, is_thumbnail, created_at
+    FROM medias WHERE product_id = ? AND file_type = 'image' AND is_thumbnail = 1 LIMIT 1"""
+
+
+def _per_request(path: str):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.row_factory = sqlite3.Row
+    conn.execute(QUERY, ("p1",)).fetchone()
+    conn.close()
+
+
+def _pooled(get_db):
+    with get_db() as conn:
+        conn.execute(QUERY, ("p1",)).fetchone()
+
+
+def _time(label: str, func, *args):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func(*args)
+    per_call = (time.perf_counter() - start) / ITERATIONS * 1e6
+    print(f"{label:>12}: {per_call:8.1f} us/request")
+
+
+def main():
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    from app.database import get_db, init_db, pool
+
+    init_db()
+    with get_db() as conn:
+        conn.execute(
+            "INSERT INTO medias (id, product_id, file_name, file_url, file_type, is_thumbnail) VALUES ('m1', 'p1', 'a.jpg', 'u', 'image', 1)"
+        )
+        conn.commit()
+
+    _time("per-request", _per_request, settings.database_path)
+    _time("pooled", _pooled, get_db)
+    print(pool.stats())
+
+
+if __name__ == "__main__":
+    main()
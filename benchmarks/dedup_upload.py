@@ -0,0 +1,83 @@
+"""
+Upload latency of new content vs content already stored (deduplicated).
+
+The memory storage backend is slowed down to mimic a remote blob store
+(fixed round trip + bandwidth), so a new upload pays the transfer while a
+duplicate only pays hashing and one DB insert. Requires httpx.
+
+    python -m benchmarks.dedup_upload [SIZE_KB]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from app.config import settings
+
+UPLOADS = 30
+ROUND_TRIP = 0.05            # seconds per blob request
+BANDWIDTH = 50 * 1024 * 1024  # bytes/s
+
+
+def _slow_down(storage):
+    put = storage.put
+
+    async def slow_put(key, chunks):
+        async def timed():
+            async for chunk in chunks:
+                await asyncio.sleep(len(chunk) / BANDWIDTH)
+                yield chunk
+        await asyncio.sleep(ROUND_TRIP)
+        return await put(key, timed())
+
+    storage.put = slow_put
+
+
+async def _upload(client, product, content):
+    start = time.perf_counter()
+    response = await client.post(
+        "/media/upload",
+        data={"product_id": product},
+        files={"file": ("packshot.jpg", content, "image/jpeg")},
+    )
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def _main(size: int):
+    from app.main import app
+    from app.services.storage import get_storage
+
+    storage = get_storage()
+    _slow_down(storage)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        new, duplicate = [], []
+        for i in range(UPLOADS):
+            content = b"\xff\xd8\xff" + os.urandom(size - 3)
+            new.append(await _upload(client, f"p{i}", content))
+            # the same packshot attached to a variant
+            duplicate.append(await _upload(client, f"p{i}-variant", content))
+
+    print(f"{UPLOADS} uploads of {size // 1024} KB, blobs stored: {len(storage.blobs)}")
+    for label, samples in (("new content", new), ("duplicate", duplicate)):
+        samples.sort()
+        print(f"{label:>12}: p50 {statistics.median(samples):8.2f} ms   max {samples[-1]:8.2f} ms")
+
+
+def main():
+    size = int(sys.argv[1]) * 1024 if len(sys.argv) > 1 else 2 * 1024 * 1024
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    from app.database import init_db
+
+    init_db()
+    asyncio.run(_main(size))
+
+
+if __name__ == "__main__":
+    main()
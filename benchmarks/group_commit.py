@@ -0,0 +1,97 @@
+"""
+Metadata write path under a burst of concurrent uploads: one transaction
+per write (db_group_commit=false, the previous design) against the
+group-commit writer. Each mode runs in a fresh process on a fresh database
+file, with bursts of BURST concurrent POST /media/upload of new content
+(memory storage backend, in process through httpx.ASGITransport).
+
+Reports sustained throughput (uploads/s over all bursts), p50/p99 upload
+latency, and for the writer the average number of writes per commit.
+Requires httpx.
+
+    python -m benchmarks.group_commit [BURST] [BURSTS]
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+
+def _worker(burst: int, bursts: int):
+    """Runs in the child process: print the measurements as JSON."""
+    import httpx
+
+    from app.config import settings
+
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    settings.outbox_worker_enabled = False
+    settings.rendition_widths = []
+
+    from app.database import init_db, writer
+    from app.main import app
+
+    init_db()
+
+    async def upload(client, product: str):
+        start = time.perf_counter()
+        response = await client.post(
+            "/media/upload",
+            data={"product_id": product},
+            files={"file": ("a.jpg", b"\xff\xd8\xff" + uuid.uuid4().bytes, "image/jpeg")},
+        )
+        response.raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await asyncio.gather(*(upload(client, "warmup") for _ in range(20)))
+            latencies = []
+            start = time.perf_counter()
+            for n in range(bursts):
+                latencies += await asyncio.gather(*(upload(client, f"p{n}-{i % 20}") for i in range(burst)))
+            elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            "throughput": len(latencies) / elapsed,
+            "p50": statistics.median(latencies),
+            "p99": latencies[int(len(latencies) * 0.99) - 1],
+            "writer": writer.stats(),
+        }
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def _run(group_commit: bool, burst: int, bursts: int) -> dict:
+    env = dict(os.environ, DB_GROUP_COMMIT=str(group_commit).lower())
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.group_commit", "--worker", str(burst), str(bursts)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    if sys.argv[1:2] == ["--worker"]:
+        _worker(int(sys.argv[2]), int(sys.argv[3]))
+        return
+    burst = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    bursts = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"{bursts} bursts of {burst} concurrent uploads")
+    for label, group_commit in (("commit per write", False), ("group commit", True)):
+        result = _run(group_commit, burst, bursts)
+        line = (f"  {label:16}: {result['throughput']:7.0f} uploads/s   "
+                f"p50 {result['p50']:7.1f} ms   p99 {result['p99']:7.1f} ms")
+        if group_commit:
+            line += f"   {result['writer']['avg_group']:.1f} writes/commit"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+GET /media/{id}/image latency: cold (fetch + resize + disk cache write),
+warm (served from the disk cache), revalidation (If-None-Match -> 304), and
+a burst of identical cold requests coalesced into one transform.
+Requires httpx and Pillow.
+
+    python -m benchmarks.image_resize
+"""
+import asyncio
+import io
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from PIL import Image
+
+from app.config import settings
+
+IMAGES = 10
+WARM_REPEAT = 20
+BURST = 50
+
+
+def _photo(seed: int) -> bytes:
+    image = Image.merge("RGB", [Image.effect_noise((3000, 2000), 50 + seed) for _ in range(3)])
+    image = image.resize((750, 500)).resize((3000, 2000), Image.BICUBIC)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+async def _get(client, media_id, **headers):
+    start = time.perf_counter()
+    response = await client.get(f"/media/{media_id}/image", params={"w": 400, "fmt": "webp"}, headers=headers)
+    assert response.status_code in (200, 304), response.text
+    return (time.perf_counter() - start) * 1000, response
+
+
+def _report(label, samples):
+    samples = sorted(samples)
+    print(f"{label:>14}: p50 {statistics.median(samples):8.2f} ms   max {samples[-1]:8.2f} ms")
+
+
+async def _main():
+    from app.main import app
+    from app.services import image_service
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        ids = []
+        for i in range(IMAGES + 1):
+            response = await client.post(
+                "/media/upload", data={"product_id": "p"},
+                files={"file": (f"{i}.jpg", _photo(i), "image/jpeg")},
+            )
+            ids.append(response.json()["id"])
+        burst_id, ids = ids[-1], ids[:-1]
+
+        cold, warm, revalidate = [], [], []
+        for media_id in ids:
+            elapsed, response = await _get(client, media_id)
+            cold.append(elapsed)
+            etag = response.headers["etag"]
+            for _ in range(WARM_REPEAT):
+                warm.append((await _get(client, media_id))[0])
+                revalidate.append((await _get(client, media_id, **{"if-none-match": etag}))[0])
+        _report("cold", cold)
+        _report("warm", warm)
+        _report("304", revalidate)
+
+        calls = image_service.flights.calls
+        start = time.perf_counter()
+        await asyncio.gather(*(_get(client, burst_id) for _ in range(BURST)))
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{BURST} identical cold requests: {elapsed:.1f} ms total, "
+              f"{image_service.flights.calls - calls} transform(s)")
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    settings.database_path = os.path.join(tmp, "media.db")
+    settings.image_cache_dir = os.path.join(tmp, "image-cache")
+    settings.storage_backend = "memory"
+    settings.rendition_widths = []  # keep the upload-time pipeline out of the measurement
+    from app.database import init_db
+
+    init_db()
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Load benchmark of the media API: p50/p99 latency and throughput per
+endpoint under a mixed read/write workload, as JSON that can be compared
+across commits.
+
+The catalog is seeded straight into SQLite: ROWS medias over PRODUCTS
+products with a skewed (Zipf-like) distribution, one thumbnail per product
+and about one video in ten. Seeded databases are kept in the temp directory
+per (rows, products, schema version) and copied for each run, since the
+workload writes. Blobs go to the memory backend, with --blob-latency added
+to every storage call to stand in for the round trip to Vercel Blob.
+
+The app is driven either in process through httpx.ASGITransport or over
+HTTP against a uvicorn server started for the run (--server uvicorn), by
+CONCURRENCY clients in a closed loop. Requests pick products with the same
+skew as the catalog. Writes (uploads, thumbnail changes, deletions) act on
+medias uploaded during the run, so the seeded catalog only grows. The
+outbox worker is disabled in both modes so that runs are comparable.
+
+    python -m benchmarks.load [--rows 100000] [--server inprocess|uvicorn]
+        [--mix mixed|read|write] [--duration 20] [--concurrency 8]
+        [--out result.json] [--compare baseline.json]
+
+Requires httpx (and uvicorn for --server uvicorn).
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from app import migrations
+
+SEED = 42
+UPLOAD_SIZE = 64 * 1024
+
+# Relative weight of each operation per workload
+MIXES = {
+    "read": {
+        "GET /media/": 45,
+        "GET /media/ (304)": 10,
+        "GET /thumbnail": 35,
+        "POST /thumbnail/batch": 10,
+    },
+    "mixed": {
+        "GET /media/": 35,
+        "GET /media/ (304)": 10,
+        "GET /thumbnail": 30,
+        "POST /thumbnail/batch": 5,
+        "POST /media/upload": 10,
+        "PUT /thumbnail": 5,
+        "DELETE /media/": 5,
+    },
+    "write": {
+        "GET /media/": 10,
+        "POST /media/upload": 50,
+        "PUT /thumbnail": 20,
+        "DELETE /media/": 20,
+    },
+}
+
+
+class Catalog:
+    """Product ids drawn with the catalog's skew (rank r has weight 1/(r+1))."""
+
+    def __init__(self, products: int, rng: random.Random):
+        self.cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(products)))
+        self.rng = rng
+
+    def product(self) -> str:
+        return f"p{bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])}"
+
+
+def seed(path: str, rows: int, products: int):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    migrations.migrate(conn)
+    rng = random.Random(SEED)
+    catalog = Catalog(products, rng)
+    has_thumbnail = set()
+    start = time.time() - 365 * 86400
+    batch = []
+    for n in range(rows):
+        product = catalog.product() if n >= products else f"p{n}"  # every product has media
+        media_id = uuid.uuid4().hex
+        file_type = "video" if rng.random() < 0.1 else "image"
+        is_thumbnail = 0
+        if file_type == "image" and product not in has_thumbnail:
+            has_thumbnail.add(product)
+            is_thumbnail = 1
+        created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + n * 365 * 86400 / rows))
+        batch.append((
+            media_id, product, f"{media_id}.{'mp4' if file_type == 'video' else 'jpg'}",
+            f"memory://blobs/seed/{media_id}", file_type, is_thumbnail, created_at, rng.randbytes(32).hex(),
+        ))
+        if len(batch) == 50_000:
+            _insert(conn, batch)
+    _insert(conn, batch)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def _insert(conn: sqlite3.Connection, batch: list):
+    conn.executemany(
+        "INSERT INTO medias (id, product_id, file_name, file_url, file_type, is_thumbnail, created_at, content_hash) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        batch,
+    )
+    conn.commit()
+    batch.clear()
+
+
+def seeded_database(rows: int, products: int) -> str:
+    """A fresh copy of the seeded catalog (seeding 1M rows takes a while, so it is done once)."""
+    version = migrations.MIGRATIONS[-1][0]
+    cached = os.path.join(tempfile.gettempdir(), f"scena-load-{rows}-{products}-v{version}.db")
+    if not os.path.exists(cached):
+        print(f"seeding {rows} medias over {products} products into {cached}", file=sys.stderr)
+        started = time.perf_counter()
+        seed(cached + ".tmp", rows, products)
+        os.replace(cached + ".tmp", cached)
+        print(f"  seeded in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    path = os.path.join(tempfile.mkdtemp(), "media.db")
+    shutil.copyfile(cached, path)
+    return path
+
+
+class Client:
+    """One closed-loop client: its own random stream and the medias it uploaded."""
+
+    def __init__(self, http, catalog: Catalog, rng: random.Random, upload: bytes):
+        self.http = http
+        self.catalog = catalog
+        self.rng = rng
+        self.upload = upload
+        self.uploaded = []  # (media id, product id) of images uploaded by this client
+        self.etags = {}  # product id -> ETag of its last GET /media/ (popular products, mostly)
+
+    async def run(self, operation: str) -> int:
+        product = self.catalog.product()
+        if operation == "GET /media/":
+            response = await self.http.get("/media/", params={"id_product": product, "limit": 50})
+            self.etags[product] = response.headers.get("etag")
+        elif operation == "GET /media/ (304)":
+            # Revalidate a listing this client already has (a full GET when it has none yet)
+            if self.etags:
+                product = self.rng.choice(list(self.etags))
+            headers = {"If-None-Match": self.etags[product]} if self.etags.get(product) else {}
+            response = await self.http.get("/media/", params={"id_product": product, "limit": 50}, headers=headers)
+            self.etags[product] = response.headers.get("etag")
+        elif operation == "GET /thumbnail":
+            response = await self.http.get("/thumbnail", params={"id_product": product})
+        elif operation == "POST /thumbnail/batch":
+            ids = list({self.catalog.product() for _ in range(50)})
+            response = await self.http.post("/thumbnail/batch", json={"product_ids": ids})
+        elif operation == "POST /media/upload":
+            # Unique content, so every upload stores a blob (no dedup hit)
+            body = b"\xff\xd8\xff" + uuid.uuid4().bytes + self.upload
+            response = await self.http.post(
+                "/media/upload",
+                data={"product_id": product},
+                files={"file": ("load.jpg", body, "image/jpeg")},
+            )
+            if response.status_code == 200:
+                self.uploaded.append((response.json()["id"], product))
+        elif operation == "PUT /thumbnail":
+            if not self.uploaded:
+                return await self.run("POST /media/upload")
+            media_id, _ = self.uploaded[self.rng.randrange(len(self.uploaded))]
+            response = await self.http.put("/thumbnail", params={"id_media": media_id})
+            if response.status_code == 400:  # already the thumbnail: a valid outcome here
+                return 200
+        elif operation == "DELETE /media/":
+            if not self.uploaded:
+                return await self.run("POST /media/upload")
+            media_id, _ = self.uploaded.pop(self.rng.randrange(len(self.uploaded)))
+            response = await self.http.delete("/media/", params={"id_media": media_id})
+        else:
+            raise ValueError(operation)
+        return response.status_code
+
+
+async def drive(http, args) -> dict:
+    """Run the workload against `http` (an httpx.AsyncClient) and return per-operation latencies."""
+    weights = MIXES[args.mix]
+    operations, cumulative = list(weights), list(itertools.accumulate(weights.values()))
+    latencies = {operation: [] for operation in operations}
+    errors = {operation: 0 for operation in operations}
+    upload = random.Random(SEED).randbytes(UPLOAD_SIZE)
+    measuring = False
+
+    async def loop(n: int, deadline: float):
+        rng = random.Random(SEED * 1000 + n)
+        client = Client(http, Catalog(args.products, rng), rng, upload)
+        while time.perf_counter() < deadline:
+            operation = operations[bisect.bisect_left(cumulative, rng.random() * cumulative[-1])]
+            started = time.perf_counter()
+            try:
+                status = await client.run(operation)
+            except Exception:
+                status = 0
+            elapsed = time.perf_counter() - started
+            if measuring:
+                latencies[operation].append(elapsed)
+                if status == 0 or (status >= 400 and status != 404):  # 404: product without thumbnail
+                    errors[operation] += 1
+
+    await asyncio.gather(*(loop(n, time.perf_counter() + args.warmup) for n in range(args.concurrency)))
+    measuring = True
+    started = time.perf_counter()
+    await asyncio.gather(*(loop(n, started + args.duration) for n in range(args.concurrency)))
+    return {"elapsed": time.perf_counter() - started, "latencies": latencies, "errors": errors}
+
+
+def summarize(run: dict) -> dict:
+    endpoints = {}
+    everything = []
+    for operation, values in run["latencies"].items():
+        everything.extend(values)
+        endpoints[operation] = _stats(values, run["errors"][operation], run["elapsed"])
+    return {"endpoints": endpoints, "total": _stats(everything, sum(run["errors"].values()), run["elapsed"])}
+
+
+def _stats(values: list, errors: int, elapsed: float) -> dict:
+    if not values:
+        return {"requests": 0, "errors": errors, "rps": 0.0}
+    values = sorted(values)
+
+    def percentile(p: float) -> float:
+        return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 3)
+
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(values) * 1000, 3),
+        "p50_ms": percentile(0.50),
+        "p90_ms": percentile(0.90),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def _environment(args, database: str) -> dict:
+    """Settings of the app under test, for both modes (the uvicorn server reads them from its environment)."""
+    return {
+        "DATABASE_PATH": database,
+        "STORAGE_BACKEND": "memory",
+        "STORAGE_MEMORY_LATENCY": str(args.blob_latency),
+        "OUTBOX_WORKER_ENABLED": "false",
+        "RENDITION_WIDTHS": "[]",
+        "METRICS_ENABLED": str(args.metrics).lower(),
+    }
+
+
+async def run_inprocess(args, database: str) -> dict:
+    import httpx
+
+    os.environ.update(_environment(args, database))
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=60) as http:
+        return await drive(http, args)
+
+
+async def run_uvicorn(args, database: str) -> dict:
+    import httpx
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        env=dict(os.environ, **_environment(args, database)),
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as http:
+            for _ in range(200):
+                try:
+                    await http.get("/")
+                    break
+                except httpx.TransportError:
+                    if server.poll() is not None:
+                        raise RuntimeError("uvicorn exited during startup")
+                    await asyncio.sleep(0.05)
+            return await drive(http, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result: dict, baseline: dict = None):
+    rows = [("total", result["total"])] + list(result["endpoints"].items())
+    print(f"{'endpoint':<24}{'requests':>9}{'errors':>7}{'rps':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, stats in rows:
+        line = f"{name:<24}{stats['requests']:>9}{stats['errors']:>7}{stats['rps']:>9.1f}"
+        if stats["requests"]:
+            line += f"{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+        if baseline:
+            before = baseline["total"] if name == "total" else baseline["endpoints"].get(name)
+            if before and before.get("requests") and stats["requests"]:
+                line += (
+                    f"   rps {_delta(before['rps'], stats['rps'])}"
+                    f"  p50 {_delta(before['p50_ms'], stats['p50_ms'])}"
+                    f"  p99 {_delta(before['p99_ms'], stats['p99_ms'])}"
+                )
+        print(line)
+
+
+def _delta(before: float, after: float) -> str:
+    return f"{(after - before) / before * 100:+6.1f}%" if before else "   n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="seeded medias (10k to 1M)")
+    parser.add_argument("--products", type=int, help="seeded products (default: rows / 20)")
+    parser.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds run before measuring")
+    parser.add_argument("--blob-latency", type=float, default=0.02, help="seconds added to each storage call")
+    parser.add_argument("--metrics", action=argparse.BooleanOptionalAction, default=True, help="metrics_enabled")
+    parser.add_argument("--out", help="write the JSON result to this file")
+    parser.add_argument("--compare", help="JSON result of an earlier run to compare against")
+    args = parser.parse_args()
+    args.products = args.products or max(1, args.rows // 20)
+
+    database = seeded_database(args.rows, args.products)
+    runner = run_uvicorn if args.server == "uvicorn" else run_inprocess
+    try:
+        run = asyncio.run(runner(args, database))
+    finally:
+        shutil.rmtree(os.path.dirname(database), ignore_errors=True)
+
+    result = {
+        "commit": _git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "config": {
+            key: getattr(args, key)
+            for key in ("rows", "products", "server", "workers", "mix", "concurrency", "duration", "blob_latency", "metrics")
+        },
+        **summarize(run),
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != result["config"]:
+            print(f"warning: baseline config differs: {baseline.get('config')}", file=sys.stderr)
+    print(f"{result['commit']}  {args.server}, {args.mix} mix, {args.rows} rows, "
+          f"{args.concurrency} clients, {args.duration:g} s")
+    print_report(result, baseline)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
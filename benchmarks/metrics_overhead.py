@@ -0,0 +1,104 @@
+"""
+Cost of the instrumentation: the same request mix with metrics_enabled
+false and true, each in a fresh process (the setting is read when the app
+and the DB connections are created), alternating to spread noise.
+
+The mix is the hot read paths (GET /thumbnail from cache, GET /media/ with
+20 rows) plus small uploads, in process through httpx.ASGITransport.
+The time of each run is the median of several passes. Requires httpx.
+
+    python -m benchmarks.metrics_overhead [ROUNDS]
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PRODUCTS = 100
+REQUESTS = 3000
+PASSES = 5
+
+
+def _worker():
+    """Runs in the child process: print the median time of a pass, in seconds."""
+    import httpx
+
+    from app.config import settings
+
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    settings.outbox_worker_enabled = False
+    settings.rendition_widths = []
+
+    from app.database import get_db, init_db
+
+    init_db()
+    with get_db() as conn:
+        conn.executemany(
+            "INSERT INTO medias (id, product_id, file_name, file_url, file_type, is_thumbnail) VALUES (?, ?, ?, ?, 'image', ?)",
+            [
+                (f"m{p}-{i}", f"p{p}", f"{i}.jpg", f"https://blob.test/p{p}/{i}.jpg", 1 if i == 0 else 0)
+                for p in range(PRODUCTS) for i in range(20)
+            ],
+        )
+        conn.commit()
+
+    from app.main import app
+
+    async def one_pass(client, offset):
+        start = time.perf_counter()
+        for i in range(REQUESTS):
+            product = f"p{i % PRODUCTS}"
+            if i % 10 == 9:
+                response = await client.post(
+                    "/media/upload",
+                    data={"product_id": product},
+                    files={"file": ("a.jpg", b"\xff\xd8\xff" + f"{offset}-{i}".encode(), "image/jpeg")},
+                )
+            elif i % 2:
+                response = await client.get("/media/", params={"id_product": product, "limit": 20})
+            else:
+                response = await client.get("/thumbnail", params={"id_product": product})
+            response.raise_for_status()
+        return time.perf_counter() - start
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await one_pass(client, -1)  # warm up
+            return statistics.median([await one_pass(client, n) for n in range(PASSES)])
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def _run(enabled: bool) -> float:
+    env = dict(os.environ, METRICS_ENABLED=str(enabled).lower())
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.metrics_overhead", "--worker"],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    if sys.argv[1:] == ["--worker"]:
+        _worker()
+        return
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    times = {False: [], True: []}
+    for _ in range(rounds):
+        for enabled in (False, True):
+            times[enabled].append(_run(enabled))
+    off, on = statistics.median(times[False]), statistics.median(times[True])
+    print(f"{REQUESTS} requests per pass, median of {rounds} processes x {PASSES} passes")
+    print(f"  metrics off: {off * 1000:8.1f} ms  ({off / REQUESTS * 1e6:6.1f} us/request)")
+    print(f"  metrics on:  {on * 1000:8.1f} ms  ({on / REQUESTS * 1e6:6.1f} us/request)")
+    print(f"  overhead:    {(on - off) / off * 100:+.2f}%")
+
+
+if __name__ == "__main__":
+    main()
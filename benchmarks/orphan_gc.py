@@ -0,0 +1,142 @@
+"""
+Orphan blob collection over a large store: time, peak memory and bytes
+reclaimed, against a naive pass that loads the listing and every
+referenced URL into sets.
+
+The memory backend is filled with BLOBS objects: medias (~85%), renditions
+of those medias, staged resumable chunks, and orphans. Orphans are plain
+blobs (~6%), renditions of a deleted source (~2%), and recent uploads
+still inside the grace period (~1%, which must be kept). Peak memory is
+the tracemalloc peak during the pass, excluding the store itself.
+
+    python -m benchmarks.orphan_gc [BLOBS ...]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from app.config import settings
+
+SIZES = [50_000, 200_000]
+BLOB = b"x" * 4096  # shared by every stored object: sizes without the memory
+
+
+def seed(storage, blobs: int):
+    """Fill the store and the database. Returns the set of URLs the collection must delete."""
+    from app.database import get_db
+
+    rng = random.Random(7)
+    old = datetime.now(timezone.utc) - timedelta(days=30)
+    recent = datetime.now(timezone.utc)
+    medias, renditions, chunks, expected = [], [], [], set()
+
+    def put(key, uploaded_at=old) -> str:
+        url = f"{storage.public_url}/{key}"
+        storage.blobs[url] = (BLOB, uploaded_at)
+        return url
+
+    for n in range(blobs):
+        kind = rng.random()
+        if kind < 0.85:
+            medias.append((f"m{n}", f"p{n % 5000}", "a.jpg", put(f"{n:08d}.jpg"), "image"))
+        elif kind < 0.91:
+            source = medias[rng.randrange(len(medias))][3] if medias else put(f"{n:08d}-src.jpg")
+            renditions.append((source, "webp", n, n, put(f"renditions/{n:08d}.webp"), len(BLOB)))
+        elif kind < 0.92:
+            chunks.append((f"s{n}", n, len(BLOB), "0" * 64, put(f"uploads/s{n}/{n:06d}")))
+        elif kind < 0.98:
+            expected.add(put(f"{n:08d}-lost.jpg"))
+        elif kind < 0.99:
+            # Rendition rows of a source that no media uses any more
+            source = put(f"{n:08d}-deleted-src.jpg")
+            expected.add(source)
+            renditions.append((source, "webp", n, n, put(f"renditions/{n:08d}-orphan.webp"), len(BLOB)))
+            expected.add(renditions[-1][4])
+        else:
+            put(f"{n:08d}-uploading.jpg", recent)
+
+    with get_db() as conn:
+        conn.executemany("INSERT INTO medias (id, product_id, file_name, file_url, file_type) VALUES (?, ?, ?, ?, ?)", medias)
+        conn.executemany("INSERT INTO media_renditions VALUES (?, ?, ?, ?, ?, ?)", renditions)
+        conn.executemany(
+            "INSERT INTO upload_sessions (id, product_id, file_name, file_type, size, chunk_size, created_at, expires_at) "
+            "VALUES (?, 'p', 'f', 'video', 1, 1, 0, 1e12)",
+            [(c[0],) for c in chunks],
+        )
+        conn.executemany("INSERT INTO upload_chunks VALUES (?, ?, ?, ?, ?)", chunks)
+        conn.commit()
+    return expected
+
+
+async def naive_orphans(storage) -> int:
+    """Every listed URL and every referenced URL in memory, then a set difference."""
+    from app.database import get_db
+
+    listed, cursor = {}, None
+    while True:
+        page, cursor = await storage.list(cursor, 1000)
+        listed.update((blob.url, blob) for blob in page)
+        if cursor is None:
+            break
+    with get_db() as conn:
+        referenced = {row[0] for row in conn.execute(
+            "SELECT file_url FROM medias UNION SELECT file_url FROM media_renditions "
+            "UNION SELECT file_url FROM upload_chunks"
+        )}
+    return len(listed.keys() - referenced)
+
+
+def _measure(func):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(blobs: int):
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    from app.database import _migrated
+    from app.services import blob_gc
+    from app.services.storage import get_storage
+
+    _migrated.discard(settings.database_path)
+    storage = get_storage()
+    storage = getattr(storage, "backend", storage)  # the memory backend under the metrics wrapper
+    storage.blobs.clear()
+    storage._sorted = None
+    expected = seed(storage, blobs)
+    expected_bytes = len(expected) * len(BLOB)
+
+    naive, naive_time, naive_peak = _measure(lambda: asyncio.run(naive_orphans(storage)))
+    report, gc_time, gc_peak = _measure(lambda: asyncio.run(blob_gc.collect_orphans()))
+
+    survivors = expected & storage.blobs.keys()
+    print(f"\n{blobs} blobs, {len(expected)} orphans ({expected_bytes / 2**20:.1f} MB)")
+    print(f"  naive set difference: {naive_time:6.2f} s, peak {naive_peak / 2**20:7.1f} MB, "
+          f"{naive} unreferenced (recent uploads included)")
+    print(f"  collect_orphans:      {gc_time:6.2f} s, peak {gc_peak / 2**20:7.1f} MB, "
+          f"{report['deleted']} deleted, {report['reclaimed_bytes'] / 2**20:.1f} MB reclaimed, "
+          f"{report['too_recent']} too recent")
+    assert not survivors and report["reclaimed_bytes"] == expected_bytes, (len(survivors), report)
+    assert len(storage.blobs) == blobs - len(expected)
+
+
+def main():
+    settings.storage_backend = "memory"
+    settings.blob_delete_batch_size = 100
+    for blobs in [int(arg) for arg in sys.argv[1:]] or SIZES:
+        run(blobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Rendition pipeline: rendering cost and bytes a storefront downloads.
+
+A 4000x3000 photo-like JPEG is rendered at the configured widths and formats:
+  naive     full-resolution decode, every width resized from the original
+  pipeline  app.services.renditions.render (JPEG draft decode, cascaded resizes)
+then IMAGES photos are rendered with 1 process and with rendition_workers
+processes. Requires Pillow.
+
+    python -m benchmarks.renditions
+"""
+import io
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from app.config import settings
+from app.services.renditions import FORMATS, render
+
+IMAGES = 16
+REPEAT = 5
+
+
+def _photo(seed: int) -> bytes:
+    # Colour noise at several scales has detail at every rendition width and
+    # compresses like a photo (several MB at quality 92)
+    random.seed(seed)
+    image = None
+    for width in (16, 64, 256, 1000, 4000):
+        layer = Image.merge("RGB", [
+            Image.effect_noise((width, width * 3 // 4), 60 + random.random() * 20) for _ in range(3)
+        ]).resize((4000, 3000), Image.BICUBIC)
+        image = layer if image is None else Image.blend(image, layer, 0.3)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=92)
+    return out.getvalue()
+
+
+def _naive(data: bytes, widths, formats, quality):
+    results = []
+    for width in widths:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            size = (width, round(image.height * width / image.width))
+            resized = image.resize(size, Image.LANCZOS)
+            for fmt in formats:
+                out = io.BytesIO()
+                resized.save(out, FORMATS[fmt], quality=quality)
+                results.append(out.getvalue())
+    return results
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = func(*args)
+    return (time.perf_counter() - start) / REPEAT * 1000, result
+
+
+def main():
+    args = (settings.rendition_widths, settings.rendition_formats, settings.rendition_quality)
+    data = _photo(0)
+    print(f"original: {len(data) / 1024:.0f} KB, widths {args[0]}, formats {args[1]}")
+
+    naive_ms, _ = _timed(_naive, data, *args)
+    pipeline_ms, renditions = _timed(render, data, *args)
+    print(f"naive    {naive_ms:8.1f} ms/image")
+    print(f"pipeline {pipeline_ms:8.1f} ms/image")
+    for r in renditions:
+        print(f"  {r.width:>5}x{r.height:<5} {r.format:<5} {len(r.data) / 1024:8.1f} KB  ({len(data) / len(r.data):6.1f}x smaller)")
+
+    photos = [_photo(i) for i in range(IMAGES)]
+    for workers in sorted({1, max(1, settings.rendition_workers), os.cpu_count() or 1}):
+        with ProcessPoolExecutor(workers) as pool:
+            list(pool.map(render, photos[:workers], *[[a] * workers for a in args]))  # warm up
+            start = time.perf_counter()
+            list(pool.map(render, photos, *[[a] * IMAGES for a in args]))
+            elapsed = time.perf_counter() - start
+        print(f"{workers:>2} processes: {IMAGES / elapsed:6.1f} images/s")
+
+
+if __name__ == "__main__":
+    main()
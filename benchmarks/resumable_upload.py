@@ -0,0 +1,120 @@
+"""
+Bytes sent and requests needed to upload a large video over a connection
+that drops, single-shot POST /media/upload vs the resumable protocol.
+
+A drop happens on average every MEAN_BYTES_BETWEEN_DROPS sent (exponential
+distribution). A single-shot upload interrupted by a drop starts over; a
+resumable upload only resends the interrupted chunk. Attempts that succeed
+go through the app (in process, memory storage), so the server-side cost of
+staging and assembling chunks is measured too. Requires httpx.
+
+    python -m benchmarks.resumable_upload [SIZE_MB] [MEAN_MB_BETWEEN_DROPS]
+"""
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+from app.config import settings
+
+RUNS = 5
+MAX_ATTEMPTS = 50  # a single-shot upload gives up after this many drops
+
+
+class FlakyLink:
+    def __init__(self, mean_bytes_between_drops: float, rng: random.Random):
+        self.mean = mean_bytes_between_drops
+        self.rng = rng
+        self.sent = 0
+        self._until_drop = rng.expovariate(1 / self.mean)
+
+    def send(self, size: int) -> bool:
+        """Account for sending size bytes; False if the connection dropped on the way."""
+        if size <= self._until_drop:
+            self._until_drop -= size
+            self.sent += size
+            return True
+        self.sent += int(self._until_drop)
+        self._until_drop = self.rng.expovariate(1 / self.mean)
+        return False
+
+
+async def _single_shot(client, link, content):
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        if link.send(len(content)):
+            response = await client.post(
+                "/media/upload",
+                data={"product_id": "single"},
+                files={"file": ("video.mp4", content, "video/mp4")},
+            )
+            response.raise_for_status()
+            return attempt, True
+    return MAX_ATTEMPTS, False
+
+
+async def _resumable(client, link, content):
+    session = (await client.post("/media/uploads", json={
+        "product_id": "resumable", "filename": "video.mp4", "content_type": "video/mp4", "size": len(content),
+    })).json()
+    requests = 1
+    chunk_size = session["chunk_size"]
+    for index in range(session["chunk_count"]):
+        chunk = content[index * chunk_size:(index + 1) * chunk_size]
+        while not link.send(len(chunk)):
+            requests += 1  # interrupted; a real client would GET the session before resuming
+        response = await client.put(
+            f"/media/uploads/{session['id']}/chunks/{index}",
+            params={"offset": index * chunk_size},
+            content=chunk,
+            headers={"X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest()},
+        )
+        response.raise_for_status()
+        requests += 1
+    start = time.perf_counter()
+    response = await client.post(f"/media/uploads/{session['id']}/complete")
+    response.raise_for_status()
+    return requests + 1, (time.perf_counter() - start) * 1000
+
+
+async def _main(size: int, mean: float):
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{size // (1024 * 1024)} MB file, a drop every {mean / (1024 * 1024):.0f} MB on average, "
+              f"chunks of {settings.resumable_chunk_size // (1024 * 1024)} MB")
+        for run in range(RUNS):
+            content = b"\x00\x00\x00\x08ftyp" + os.urandom(size - 8)
+            link = FlakyLink(mean, random.Random(run))
+            attempts, done = await _single_shot(client, link, content)
+            single_sent = link.sent
+
+            link = FlakyLink(mean, random.Random(run))
+            requests, assemble_ms = await _resumable(client, link, content + b"r")
+            print(
+                f"run {run + 1}: single-shot {'done' if done else 'gave up'} after {attempts:2d} attempts, "
+                f"sent {single_sent / size:5.2f}x the file   |   resumable: {requests:3d} requests, "
+                f"sent {link.sent / size:4.2f}x, complete {assemble_ms:6.1f} ms"
+            )
+
+
+def main():
+    size = int(sys.argv[1] if len(sys.argv) > 1 else 200) * 1024 * 1024
+    mean = float(sys.argv[2] if len(sys.argv) > 2 else 50) * 1024 * 1024
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    settings.max_file_size = size + 1
+    settings.outbox_worker_enabled = False
+    from app.database import init_db
+
+    init_db()
+    asyncio.run(_main(size, mean))
+
+
+if __name__ == "__main__":
+    main()
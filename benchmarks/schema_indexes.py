@@ -0,0 +1,88 @@
+"""
+Query plans and latencies of the hot medias queries before and after the
+index migrations (product listing index + one-thumbnail partial unique index).
+
+Seeds a schema-version-1 database with ROWS media spread over products with
+a skewed (Zipf-like) distribution, then migrates it in place.
+
+    python -m benchmarks.schema_indexes [ROWS]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+from app import migrations
+
+ROWS = 1_000_000
+PRODUCTS = 50_000
+REPEAT = 50
+
+QUERIES = {
+    "GET /media/": (
+        "SELECT id, product_id, file_name, file_url, file_type, is_thumbnail, created_at "
+        "FROM medias WHERE product_id = ?"
+    ),
+    "GET /thumbnail": (
+        "SELECT id, product_id, file_name, file_url, file_type, is_thumbnail, created_at "
+        "FROM medias WHERE product_id = ? AND file_type = 'image' AND is_thumbnail = 1 LIMIT 1"
+    ),
+    "PUT /thumbnail (swap)": "UPDATE medias SET is_thumbnail = 0 WHERE product_id = ? AND is_thumbnail = 1",
+    "DELETE /media/all": "DELETE FROM medias WHERE product_id = ?",
+}
+
+
+def seed(conn: sqlite3.Connection, rows: int):
+    migrations.migrate(conn, target=1)
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(PRODUCTS)]
+    products = rng.choices(range(PRODUCTS), weights=weights, k=rows)
+    thumbnails = set()
+    batch = []
+    for product in products:
+        is_thumbnail = 0
+        if product not in thumbnails:
+            thumbnails.add(product)
+            is_thumbnail = 1
+        batch.append((uuid.uuid4().hex, f"p{product}", "f.jpg", "https://blob.test/f.jpg", "image", is_thumbnail))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO medias (id, product_id, file_name, file_url, file_type, is_thumbnail) VALUES (?, ?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    conn.executemany("INSERT INTO medias (id, product_id, file_name, file_url, file_type, is_thumbnail) VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+
+
+def measure(conn: sqlite3.Connection, label: str):
+    print(f"\n== {label}")
+    # A mid-popularity product, so results are neither tiny nor the hottest key
+    product = ("p100",)
+    for name, sql in QUERIES.items():
+        plan = " / ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", product))
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            conn.execute(sql, product).fetchall()
+            conn.rollback()  # keep the writes from changing the data set
+        elapsed = (time.perf_counter() - start) / REPEAT * 1000
+        print(f"{name:<22} {elapsed:9.3f} ms   {plan}")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    path = os.path.join(tempfile.mkdtemp(), "media.db")
+    conn = sqlite3.connect(path)
+    print(f"seeding {rows} rows ...")
+    seed(conn, rows)
+    measure(conn, "schema v1 (no secondary index)")
+    start = time.perf_counter()
+    migrations.migrate(conn)
+    version = migrations.schema_version(conn)
+    print(f"\nmigration to v{version}: {time.perf_counter() - start:.1f}s")
+    measure(conn, f"schema v{version}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Latency of fast requests while slow queries run. A client issues GET
+/thumbnail back to back (thumbnail cache disabled, so each one queries
+SQLite) while another fires a request whose query takes SLOW_MS (a SQL
+function sleeping inside the media lookup of GET /media/{id}/image, then
+a 304 from its ETag), every INTERVAL_MS. Three runs: no slow query; slow
+queries on the DB threads (the current data access); and slow queries run
+on the event loop, as every route did before database.run. Also reports
+the event loop lag (how late a 1 ms sleep wakes up) and checks each slow
+query ran on the thread its row claims. Requires httpx.
+
+    python -m benchmarks.slow_query [SLOW_MS] [INTERVAL_MS]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from app.config import settings
+
+DURATION = 3.0
+PRODUCTS = 100
+
+
+def _seed():
+    from app.database import get_db, init_db
+
+    init_db()
+    with get_db() as conn:
+        conn.executemany(
+            "INSERT INTO medias (id, product_id, file_name, file_url, file_type, is_thumbnail) VALUES (?, ?, ?, ?, 'image', 1)",
+            [(f"m{p}", f"p{p}", f"{p}.jpg", f"https://blob.test/p{p}.jpg") for p in range(PRODUCTS)],
+        )
+        conn.commit()
+
+
+def _slow_lookup(seconds: float, threads: list):
+    """media_service._select_media, with a query that takes `seconds`; records the thread it ran on."""
+    def select(conn, media_id: str):
+        threads.append(threading.current_thread().name)
+        conn.create_function("sleep", 1, lambda s: time.sleep(s) or 0)
+        return conn.execute(
+            "SELECT product_id, file_url, file_type, is_thumbnail FROM medias WHERE id = ? AND sleep(?) = 0",
+            (media_id, seconds)
+        ).fetchone()
+    return select
+
+
+async def _on_loop(func, *args):
+    """The previous data access: the query runs on the event loop."""
+    from app.database import get_db
+
+    with get_db() as conn:
+        return func(conn, *args)
+
+
+async def _run(client, slow: bool, interval: float) -> dict:
+    from app.services import image_service
+
+    latencies = []
+    lags = []
+    deadline = time.perf_counter() + DURATION
+
+    async def fast():
+        n = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get("/thumbnail", params={"id_product": f"p{n % PRODUCTS}"})
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+            n += 1
+            # In-process requests may complete without suspending: let the other tasks run
+            await asyncio.sleep(0)
+
+    async def ticker():
+        # Event loop lag: how late a 1 ms sleep wakes up
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - start - 0.001) * 1000)
+
+    async def slow_queries():
+        # The lookup of an existing media, then a 304: its seeded blob is not a real image
+        etag = f'"{image_service.cache_key("https://blob.test/p0.jpg", None, None, "webp")}"'
+        pending = []
+        while time.perf_counter() < deadline:
+            pending.append(asyncio.ensure_future(client.get("/media/m0/image", headers={"If-None-Match": etag})))
+            await asyncio.sleep(interval)
+        for response in await asyncio.gather(*pending):
+            assert response.status_code == 304, response.text
+
+    await asyncio.gather(fast(), ticker(), *([slow_queries()] if slow else []))
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "max": latencies[-1],
+        "lag": max(lags),
+    }
+
+
+async def _main(slow_seconds: float, interval: float):
+    from app.database import run
+    from app.main import app
+    from app.services import media_service
+
+    media_service.thumbnail_cache.max_bytes = 0  # every GET /thumbnail queries the database
+    threads = []
+    media_service._select_media = _slow_lookup(slow_seconds, threads)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.get("/thumbnail", params={"id_product": "p0"})
+        print(f"GET /thumbnail for {DURATION:.0f} s, a {slow_seconds * 1000:.0f} ms query every {interval * 1000:.0f} ms:")
+        for label, slow, data_access in (
+            ("no slow query", False, run),
+            ("on DB threads", True, run),
+            ("on the loop", True, _on_loop),
+        ):
+            media_service._run = data_access
+            threads.clear()
+            result = await _run(client, slow, interval)
+            # Each slow query must have run where the row claims
+            assert not slow or threads, "no slow query ran"
+            on_loop = data_access is _on_loop
+            assert all((name == "MainThread") == on_loop for name in threads), set(threads)
+            print(f"  {label:14}: {result['requests']:6} requests   p50 {result['p50']:7.2f} ms   "
+                  f"p99 {result['p99']:7.2f} ms   max {result['max']:7.1f} ms   "
+                  f"loop lag {result['lag']:7.1f} ms   ({len(threads)} slow queries)")
+
+
+def main():
+    slow_seconds = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.5
+    interval = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.25
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    settings.outbox_worker_enabled = False
+    settings.metrics_enabled = False
+    _seed()
+    asyncio.run(_main(slow_seconds, interval))
+
+
+if __name__ == "__main__":
+    main()
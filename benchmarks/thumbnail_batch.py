@@ -0,0 +1,77 @@
+"""
+A catalog page of 50 products: 50 x GET /thumbnail vs one POST /thumbnail/batch,
+with a cold thumbnail cache (cleared before every page) and a warm one.
+Requires httpx.
+
+    python -m benchmarks.thumbnail_batch
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from app.config import settings
+
+PRODUCTS = 50
+PAGES = 50
+
+
+def _seed():
+    from app.database import get_db, init_db
+
+    init_db()
+    with get_db() as conn:
+        conn.executemany(
+            "INSERT INTO medias (id, product_id, file_name, file_url, file_type, is_thumbnail) VALUES (?, ?, ?, ?, 'image', ?)",
+            [
+                (f"m{p}-{i}", f"p{p}", f"{i}.jpg", f"https://blob.test/p{p}/{i}.jpg", 1 if i == 0 else 0)
+                # every 10th product has no thumbnail
+                for p in range(PRODUCTS) for i in range(5) if not (p % 10 == 9 and i == 0)
+            ],
+        )
+        conn.commit()
+
+
+async def _per_product(client, ids):
+    await asyncio.gather(*(client.get("/thumbnail", params={"id_product": i}) for i in ids))
+
+
+async def _batch(client, ids):
+    await client.post("/thumbnail/batch", json={"product_ids": ids})
+
+
+async def _bench(client, label, page, warm: bool):
+    from app.services.media_service import thumbnail_cache
+
+    ids = [f"p{p}" for p in range(PRODUCTS)]
+    await page(client, ids)
+    start = time.perf_counter()
+    for _ in range(PAGES):
+        if not warm:
+            thumbnail_cache.clear()
+        await page(client, ids)
+    per_page = (time.perf_counter() - start) / PAGES * 1000
+    print(f"{label:>18} {'warm' if warm else 'cold'}: {per_page:7.2f} ms/page")
+
+
+async def _main():
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for warm in (False, True):
+            await _bench(client, "50 x GET", _per_product, warm)
+            await _bench(client, "1 x POST /batch", _batch, warm)
+
+
+def main():
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    _seed()
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Wall-clock time of a 20-image batch: one POST /media/upload per file vs one
+POST /media/upload/batch, compared with the slowest single upload.
+
+The memory storage backend is slowed down to mimic a remote blob store
+(fixed round trip + per-stream bandwidth, sizes varying per file), so
+parallel uploads overlap their transfers. Requires httpx.
+
+    python -m benchmarks.upload_batch [FILES] [SIZE_KB]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+from app.config import settings
+
+ROUNDS = 3
+ROUND_TRIP = 0.05             # seconds per blob request
+BANDWIDTH = 20 * 1024 * 1024  # bytes/s per stream
+
+
+def _slow_down(storage):
+    put = storage.put
+
+    async def slow_put(key, chunks):
+        async def timed():
+            async for chunk in chunks:
+                await asyncio.sleep(len(chunk) / BANDWIDTH)
+                yield chunk
+        await asyncio.sleep(ROUND_TRIP)
+        return await put(key, timed())
+
+    storage.put = slow_put
+
+
+async def _timed(request):
+    start = time.perf_counter()
+    response = await request
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def _main(count: int, size: int):
+    from app.main import app
+    from app.services.storage import get_storage
+
+    storage = get_storage()
+    _slow_down(storage)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for round_ in range(ROUNDS):
+            # new content every round, so nothing is deduplicated
+            files = [(f"{i}.jpg", b"\xff\xd8\xff" + os.urandom(random.randint(size // 2, size))) for i in range(count)]
+            singles = [
+                await _timed(client.post(
+                    "/media/upload",
+                    data={"product_id": f"seq{round_}"},
+                    files={"file": (name, content + b"seq", "image/jpeg")},
+                ))
+                for name, content in files
+            ]
+            batch = await _timed(client.post(
+                "/media/upload/batch",
+                data={"product_id": f"batch{round_}"},
+                files=[("files", (name, content, "image/jpeg")) for name, content in files],
+            ))
+            print(
+                f"round {round_ + 1}: sequential {sum(singles):8.1f} ms   batch {batch:8.1f} ms   "
+                f"slowest single {max(singles):7.1f} ms   batch/slowest {batch / max(singles):5.2f}x"
+            )
+    print(f"{count} files of up to {size // 1024} KB, concurrency {settings.upload_batch_concurrency}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    size = int(sys.argv[2]) * 1024 if len(sys.argv) > 2 else 2 * 1024 * 1024
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    settings.upload_batch_concurrency = max(settings.upload_batch_concurrency, count)
+    from app.database import init_db
+
+    init_db()
+    asyncio.run(_main(count, size))
+
+
+if __name__ == "__main__":
+    main()
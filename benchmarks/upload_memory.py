@@ -0,0 +1,71 @@
+"""
+Peak Python heap per upload: buffered `await file.read()` vs streamed chunks.
+
+Vercel blob calls are replaced by no-op fakes so only the service's own
+buffering is measured. Run from the repository root:
+
+    python -m benchmarks.upload_memory
+"""
+import asyncio
+import os
+import tempfile
+import tracemalloc
+
+from starlette.datastructures import Headers, UploadFile
+
+from app.services import blob_storage
+from app.services.storage import vercel
+
+SIZES_MB = [1, 10, 50, 100]
+
+
+def _fake_blob_api():
+    vercel.vercel_blob.put = lambda path, data, options=None: {"url": f"https://blob.test/{path}"}
+    vercel._get_auth_token = lambda options: "token"
+    vercel._create_multipart_upload = lambda path, headers, options: {"uploadId": "u", "key": "k"}
+    vercel._upload_part = lambda path, upload_id, key, n, data, headers, options: {"partNumber": n, "etag": str(n)}
+    vercel._complete_multipart_upload = lambda path, upload_id, key, parts, headers, options: {"url": f"https://blob.test/{path}"}
+
+
+def _upload_file(size: int) -> UploadFile:
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    block = os.urandom(1024 * 1024)
+    for _ in range(size // len(block)):
+        spool.write(block)
+    spool.seek(0)
+    return UploadFile(spool, size=size, filename="video.mp4", headers=Headers({"content-type": "video/mp4"}))
+
+
+async def _buffered(file: UploadFile):
+    content = await file.read()
+    return vercel.vercel_blob.put(path="x.mp4", data=content)
+
+
+async def _streamed(file: UploadFile):
+    return await blob_storage.upload_blob_stream(
+        blob_storage.iter_upload(file, max_size=1024 * 1024 * 1024), ".mp4"
+    )
+
+
+def _peak(strategy, size: int) -> int:
+    file = _upload_file(size)
+    tracemalloc.start()
+    asyncio.run(strategy(file))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    file.file.close()
+    return peak
+
+
+def main():
+    _fake_blob_api()
+    print(f"{'size':>8} {'buffered peak':>16} {'streamed peak':>16}")
+    for mb in SIZES_MB:
+        size = mb * 1024 * 1024
+        buffered = _peak(_buffered, size)
+        streamed = _peak(_streamed, size)
+        print(f"{mb:>6}MB {buffered / 2**20:>14.1f}MB {streamed / 2**20:>14.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Video metadata probing: bytes read and latency of the ranged MP4/MOV atom
+parser vs downloading the whole file, for a video with `moov` at the end
+(the usual layout of camera files, the worst case for probing), and upload
+latency with the probe queued vs run inline.
+
+The memory storage backend is given a fixed round trip per request and a
+bandwidth to mimic a remote blob store. Requires httpx.
+
+    python -m benchmarks.video_probe [SIZE_MB]
+"""
+import asyncio
+import os
+import statistics
+import struct
+import sys
+import tempfile
+import time
+
+import httpx
+
+from app.config import settings
+
+ROUND_TRIP = 0.02  # seconds per storage request
+BANDWIDTH = 50 * 1024 * 1024  # bytes/s
+UPLOADS = 10
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def build_mp4(mdat_size: int, width=1920, height=1080, seconds=42.5, moov_at_end=True) -> bytes:
+    """A structurally valid MP4 with one H.264 video and one AAC audio track."""
+    timescale = 1000
+    mvhd = box(b"mvhd", struct.pack(">B3xIIII", 0, 0, 0, timescale, int(seconds * timescale)) + bytes(80))
+    matrix = struct.pack(">9i", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+
+    def trak(handler: bytes, codec: bytes, w=0, h=0):
+        tkhd = box(b"tkhd", struct.pack(">B3xIIIII", 0, 0, 0, 1, 0, int(seconds * timescale))
+                   + bytes(8) + bytes(8) + matrix + struct.pack(">II", w << 16, h << 16))
+        mdhd = box(b"mdhd", struct.pack(">B3xIIII", 0, 0, 0, timescale, int(seconds * timescale)) + bytes(4))
+        hdlr = box(b"hdlr", bytes(4) + bytes(4) + handler + bytes(12) + b"\0")
+        entry = box(codec, bytes(6) + struct.pack(">H", 1) + bytes(16) + struct.pack(">HH", w, h) + bytes(50))
+        stsd = box(b"stsd", bytes(4) + struct.pack(">I", 1) + entry)
+        minf = box(b"minf", box(b"stbl", stsd))
+        return box(b"trak", tkhd + box(b"mdia", mdhd + hdlr + minf))
+
+    moov = box(b"moov", mvhd + trak(b"vide", b"avc1", width, height) + trak(b"soun", b"mp4a"))
+    ftyp = box(b"ftyp", b"isom" + bytes(4) + b"isomavc1")
+    mdat = struct.pack(">I4s", 8 + mdat_size, b"mdat") + bytes(mdat_size)
+    return ftyp + (mdat + moov if moov_at_end else moov + mdat)
+
+
+def _slow_down(storage, counters):
+    get, put = storage.get, storage.put
+
+    async def slow_get(url, start=0, end=None):
+        await asyncio.sleep(ROUND_TRIP)
+        counters["requests"] += 1
+        async for chunk in get(url, start, end):
+            counters["bytes"] += len(chunk)
+            await asyncio.sleep(len(chunk) / BANDWIDTH)
+            yield chunk
+
+    async def slow_put(key, chunks):
+        async def timed():
+            async for chunk in chunks:
+                await asyncio.sleep(len(chunk) / BANDWIDTH)
+                yield chunk
+        await asyncio.sleep(ROUND_TRIP)
+        return await put(key, timed())
+
+    storage.get, storage.put = slow_get, slow_put
+
+
+async def _main(size: int):
+    from app.main import app
+    from app.services import outbox, video
+    from app.services.storage import get_storage
+    from app.utils import mp4
+
+    storage = get_storage()
+    counters = {"requests": 0, "bytes": 0}
+    _slow_down(storage, counters)
+    content = build_mp4(size)
+    url = await storage.put("bench.mp4", _single(content))
+
+    counters.update(requests=0, bytes=0)
+    start = time.perf_counter()
+    info = await video.probe(url)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{len(content) / 1e6:.0f} MB video, moov at the end: {info}")
+    print(f"ranged probe:  {elapsed:8.1f} ms, {counters['requests']} requests, {counters['bytes'] / 1024:.1f} KB read")
+
+    counters.update(requests=0, bytes=0)
+    start = time.perf_counter()
+    data = b"".join([chunk async for chunk in storage.get(url)])
+    mp4.parse_moov(data[data.rindex(b"moov") + 4:], len(data))
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"full download: {elapsed:8.1f} ms, {counters['requests']} requests, {counters['bytes'] / 1024:.1f} KB read")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        queued, inline = [], []
+        for i in range(UPLOADS):
+            for samples, run_inline in ((queued, False), (inline, True)):
+                body = build_mp4(size // 10, seconds=10 + i + run_inline * 0.5)
+                start = time.perf_counter()
+                response = await client.post(
+                    "/media/upload", data={"product_id": "p"},
+                    files={"file": ("clip.mp4", body, "video/mp4")},
+                )
+                if run_inline:
+                    await outbox.drain()
+                samples.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+            await outbox.drain()
+        print(f"upload of a {size / 10e6:.0f} MB video, p50: probe queued {statistics.median(queued):.1f} ms, "
+              f"probe inline {statistics.median(inline):.1f} ms")
+        listing = (await client.get("/media/", params={"id_product": "p", "fields": "id,duration,width,height,video_codec"})).json()
+        print("listing after the worker ran:", listing[0])
+
+
+async def _single(data: bytes):
+    yield data
+
+
+def main():
+    size = int(sys.argv[1]) * 1024 * 1024 if len(sys.argv) > 1 else 200 * 1024 * 1024
+    settings.database_path = os.path.join(tempfile.mkdtemp(), "media.db")
+    settings.storage_backend = "memory"
+    settings.max_file_size = 1024 * 1024 * 1024
+    from app.database import init_db
+
+    init_db()
+    asyncio.run(_main(size))
+
+
+if __name__ == "__main__":
+    main()